@@ -7,7 +7,7 @@ from alembic import context
 
 # Import your models here
 from app.database import Base
-from app.models import User, Document, ChatSession, ChatMessage
+from app.models import User, Document, ChatSession, ChatMessage, IndexVersion
 from app.config import settings
 
 # this is the Alembic Config object, which provides
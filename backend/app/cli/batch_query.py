@@ -0,0 +1,42 @@
+"""
+Answer a file of questions for an evaluation run
+
+Usage:
+    python -m app.cli.batch_query questions.jsonl --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.services.batch_query_service import BatchQueryService, parse_questions
+from app.services.chat_service import ChatService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions without creating chat messages")
+    parser.add_argument("questions", help='JSONL file: {"id": ..., "question": ...} per line, or plain text lines')
+    parser.add_argument("--output", required=True, help="JSONL file to write the results to")
+    parser.add_argument("--concurrency", type=int, help="LLM calls in flight (default BATCH_QUERY_CONCURRENCY)")
+    parser.add_argument("--top-k", type=int, help="Candidates retrieved per question (default TOP_K_RESULTS)")
+    parser.add_argument("--retrieval-only", action="store_true", help="Skip the LLM and write retrieval results only")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = parse_questions(f)
+
+    service = BatchQueryService(ChatService())
+    summary = asyncio.run(service.run_to_file(
+        questions,
+        args.output,
+        generate=not args.retrieval_only,
+        concurrency=args.concurrency,
+        top_k=args.top_k
+    ))
+
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Bulk-ingest a local directory of documents
+
+Usage:
+    python -m app.cli.ingest /path/to/library --email user@example.com
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.database import SessionLocal
+from app.services.auth_service import AuthService
+from app.services.document_service import DocumentService
+from app.services.ingestion_service import BulkIngestionService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of PDF/DOCX files")
+    parser.add_argument("directory", help="Directory to walk recursively")
+    parser.add_argument("--email", required=True, help="Email of the user who will own the documents")
+    parser.add_argument("--manifest", help="Manifest path (reuse it to resume an interrupted run)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user = AuthService.get_user_by_email(db, args.email)
+        if user is None:
+            print(f"User not found: {args.email}", file=sys.stderr)
+            return 1
+
+        # This process is an ingestion worker itself: never hand the files to the queue
+        service = BulkIngestionService(DocumentService(), use_queue=False)
+        result = asyncio.run(service.ingest_directory(db, user, args.directory, args.manifest))
+    finally:
+        db.close()
+
+    print(json.dumps({key: result[key] for key in ("manifest", "total", "skipped", "summary")}, indent=2))
+    for entry in result["files"]:
+        if entry["status"] == "failed":
+            print(f"❌ {entry['path']}: {entry['error']}")
+    return 0 if result["summary"]["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
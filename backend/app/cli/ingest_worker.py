@@ -0,0 +1,70 @@
+"""
+Process documents queued by the API (INGEST_QUEUE_ENABLED=true)
+
+Usage:
+    python -m app.cli.ingest_worker
+    python -m app.cli.ingest_worker --once    # drain the queue and exit
+
+Run as many workers as ingestion needs, on any node that can reach the
+database, ChromaDB and UPLOAD_DIR. SIGTERM lets the current job finish.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.document_service import DocumentService
+from app.services.ingestion_queue import ingestion_queue
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Process queued document uploads")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--status", action="store_true", help="Show job counts per status and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        db = SessionLocal()
+        try:
+            print(json.dumps(ingestion_queue.counts(db), indent=2))
+        finally:
+            db.close()
+        return 0
+
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.append(True))
+
+    service = DocumentService()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    loop = asyncio.new_event_loop()
+    print(f"✅ Ingestion worker {worker} started")
+
+    try:
+        while not stopping:
+            db = SessionLocal()
+            try:
+                job = ingestion_queue.claim(db, worker)
+                if job is not None:
+                    loop.run_until_complete(service.process_job(db, job))
+                    print(f"{job.status:<7} {job.document_id} ({job.kind}, attempt {job.attempts})")
+            finally:
+                db.close()
+
+            if job is None:
+                if args.once:
+                    break
+                time.sleep(settings.INGEST_WORKER_POLL_SECONDS)
+    finally:
+        loop.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Re-embed every document into a new index version and cut over to it
+
+Usage:
+    python -m app.cli.reindex --model sentence-transformers/all-mpnet-base-v2
+    python -m app.cli.reindex --resume
+    python -m app.cli.reindex --status
+    python -m app.cli.reindex --document-index
+"""
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.models.index_version import IndexVersion
+from app.services.index_registry import index_registry
+from app.services.reindex_service import ReindexService
+from app.services.vector_store import VectorStore
+
+
+def print_status(db) -> None:
+    versions = db.query(IndexVersion).order_by(IndexVersion.created_at).all()
+    for version in versions:
+        progress = ""
+        if version.total_chunks:
+            progress = f" {version.processed_chunks}/{version.total_chunks} chunks"
+        print(
+            f"{version.status:<9} {version.collection_name:<32} {version.embedding_model}"
+            f" docs {version.processed_documents or 0}/{version.total_documents or 0}{progress}"
+        )
+        if version.error_message:
+            print(f"          error: {version.error_message}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild the vector index with another embedding model")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--model", help="Embedding model for the new index")
+    group.add_argument("--resume", action="store_true", help="Resume the building or failed version")
+    group.add_argument("--status", action="store_true", help="Show index versions and progress")
+    group.add_argument(
+        "--document-index", action="store_true",
+        help="Compute document vectors of the active index from its chunks (for documents indexed earlier)"
+    )
+    parser.add_argument("--no-cutover", action="store_true", help="Build the index but keep serving the old one")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.status:
+            print_status(db)
+            return 0
+
+        if args.document_index:
+            store = VectorStore(collection_name=index_registry.get_active(db).collection_name)
+            print(f"Wrote {store.build_document_index()} document vectors to {store.collection_name}")
+            return 0
+
+        service = ReindexService()
+        if args.resume:
+            version = db.query(IndexVersion).filter(
+                IndexVersion.status.in_(["building", "failed"])
+            ).order_by(IndexVersion.created_at.desc()).first()
+            if version is None:
+                print("Nothing to resume", file=sys.stderr)
+                return 1
+            version.status = "building"
+            version.error_message = None
+            db.commit()
+        else:
+            version = service.start(db, args.model)
+
+        print(f"Building {version.collection_name} with {version.embedding_model}")
+        service.run(db, version, cutover=not args.no_cutover)
+        print_status(db)
+        return 0
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
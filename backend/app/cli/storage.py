@@ -0,0 +1,42 @@
+"""
+Lifecycle of stored originals
+
+Usage:
+    python -m app.cli.storage --tier-cold
+    python -m app.cli.storage --tier-cold --older-than-days 30 --limit 500 --dry-run
+    python -m app.cli.storage --status
+"""
+import argparse
+import json
+import sys
+
+from app.database import SessionLocal
+from app.services.storage_lifecycle import StorageLifecycleService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Move processed originals to cold storage")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--tier-cold", action="store_true", help="Move due originals to the cold tier")
+    group.add_argument("--status", action="store_true", help="Show documents per storage tier")
+    parser.add_argument("--older-than-days", type=float, help="Minimum document age (default: COLD_STORAGE_AFTER_DAYS)")
+    parser.add_argument("--limit", type=int, help="Maximum number of originals to move")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would move")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = StorageLifecycleService()
+        if args.status:
+            print(json.dumps(service.status(db), indent=2))
+            return 0
+
+        result = service.tier_cold(db, args.older_than_days, args.limit, args.dry_run)
+        print(json.dumps(result, indent=2))
+        return 1 if result["failed"] else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,20 @@
 """
 Application configuration using Pydantic Settings
 """
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from typing import List
+import os
+
+# Storage paths that default to a place under UPLOAD_DIR when left empty
+UPLOAD_SUBPATHS = {
+    "ORIGINALS_DIR": "originals",
+    "INGEST_MANIFEST_DIR": "manifests",
+    "PARENT_STORE_PATH": "parent_sections.db",
+    "CHUNK_STORE_DIR": "chunk_segments",
+    "ARTIFACT_DIR": "artifacts",
+    "MESSAGE_JOURNAL_DIR": "message_journal",
+}
 
 
 class Settings(BaseSettings):
@@ -14,6 +26,11 @@ class Settings(BaseSettings):
     # ChromaDB
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8000
+    CHROMA_TIMEOUT: float = 30.0  # seconds to wait for a response
+    CHROMA_CONNECT_TIMEOUT: float = 3.0
+    CHROMA_MAX_CONNECTIONS: int = 32  # pooled keep-alive connections per process
+    CHROMA_KEEPALIVE_SECONDS: float = 30.0  # idle time before a pooled connection is closed
+    CHROMA_MAX_RETRIES: int = 2  # retries after a connection error, timeout or 502/503/504
     
     # Groq API
     GROQ_API_KEY: str
@@ -26,26 +43,151 @@ class Settings(BaseSettings):
     # Backend
     BACKEND_HOST: str = "0.0.0.0"
     BACKEND_PORT: int = 8000
-    UPLOAD_DIR: str = "./uploads"
+    UPLOAD_DIR: str = "./uploads"  # storage paths below default to places under it
+    LOG_LEVEL: str = "INFO"
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:3001"]
     
     # File Upload
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes per read while streaming uploads
     ALLOWED_EXTENSIONS: List[str] = [".pdf", ".docx"]
     
+    # OCR Fallback (scanned PDF pages; needs tesseract, pytesseract and pypdfium2)
+    OCR_ENABLED: bool = True  # skipped with a warning when the OCR dependencies are missing
+    OCR_LANGUAGES: str = "eng"  # tesseract -l value, e.g. "eng+mon"
+    OCR_MIN_CHARS: int = 50  # PDF pages with less extracted text are OCR'd
+    OCR_DPI: int = 300
+    OCR_WORKERS: int = 2  # OCR processes per API or ingestion worker process
+    OCR_PAGE_TIMEOUT_SECONDS: float = 60.0
+    OCR_DOCUMENT_BUDGET_SECONDS: float = 600.0  # pages not recognized by then are left without text
+    
+    # File Storage (originals; see app/utils/file_storage.py)
+    ORIGINALS_DIR: str = ""  # hot tier, content-addressed; empty = UPLOAD_DIR/originals
+    ORIGINALS_COMPRESSION: bool = False  # gzip hot originals that shrink by at least 10%
+    COLD_STORAGE_BACKEND: str = "local"  # "local" (COLD_STORAGE_DIR) or "s3"
+    COLD_STORAGE_DIR: str = "./cold_storage"
+    COLD_STORAGE_COMPRESSION: bool = True
+    COLD_STORAGE_S3_BUCKET: str = "aerodoc-originals"
+    COLD_STORAGE_S3_PREFIX: str = "originals/"
+    COLD_STORAGE_S3_ENDPOINT_URL: str = ""  # e.g. http://minio:9000 for an S3-compatible server
+    COLD_STORAGE_AFTER_DAYS: float = 7.0  # processed originals older than this move to the cold tier
+    
+    # Bulk Ingestion
+    INGEST_CONCURRENCY: int = 4  # documents parsed in parallel
+    INGEST_DB_BATCH_SIZE: int = 100  # Document rows per INSERT commit
+    INGEST_VECTOR_BATCH_SIZE: int = 2000  # chunks per embedding + ChromaDB write
+    INGEST_MANIFEST_DIR: str = ""  # empty = UPLOAD_DIR/manifests
+    MAX_ARCHIVE_SIZE: int = 1024 * 1024 * 1024  # 1GB uncompressed
+    
     # RAG Configuration
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
-    TOP_K_RESULTS: int = 5
+    CHUNK_UNIT: str = "tokens"  # "tokens" (CHUNK_TOKENS, ...) or "characters" (CHUNK_SIZE, ...)
+    CHUNK_TOKENIZER: str = ""  # model name or tokenizer.json path; empty = the embedding model's tokenizer
+    CHUNK_TOKENS: int = 100  # child chunks: embedded and matched; capped at the model's max sequence length
+    CHUNK_OVERLAP_TOKENS: int = 12
+    PARENT_CHUNK_TOKENS: int = 500  # sections sent to the LLM for matched children; 0 sends the children
+    CHUNK_SIZE: int = 400  # CHUNK_UNIT=characters, or when the tokenizer cannot be loaded
+    CHUNK_OVERLAP: int = 50
+    PARENT_CHUNK_SIZE: int = 2000
+    PARENT_STORE_PATH: str = ""  # empty = UPLOAD_DIR/parent_sections.db
+    CHUNK_STORE_DIR: str = ""  # chunk texts, memory-mapped instead of stored in ChromaDB; empty = UPLOAD_DIR/chunk_segments
+    CHUNK_STORE_MAX_OPEN: int = 256  # segments kept mapped per worker
+    MAX_CONTEXT_CHARS: int = 8000  # prompt context budget after expanding children to sections
+    TOP_K_RESULTS: int = 5  # candidates retrieved per lookup
+    RETRIEVAL_MIN_K: int = 2  # chunks always kept from the candidates
+    RETRIEVAL_MIN_SIMILARITY: float = 0.25  # cosine similarity below which chunks are dropped
+    RETRIEVAL_RELATIVE_CUTOFF: float = 0.15  # drop chunks this much less similar than the best one
+    TWO_STAGE_RETRIEVAL: bool = True  # pick documents by their centroid vector, then search their chunks
+    TWO_STAGE_MIN_DOCUMENTS: int = 50  # below this many indexed documents a flat chunk search is used
+    TWO_STAGE_TOP_DOCUMENTS: int = 10  # documents whose chunks are searched
+    QUERY_ROUTING_ENABLED: bool = True  # answer small talk and follow-ups without retrieval
+    FOLLOW_UP_HISTORY_MESSAGES: int = 4  # previous messages sent with a follow-up
+    
+    # Session Retrieval Cache
+    SESSION_CACHE_ENABLED: bool = True
+    SESSION_CACHE_MIN_SIMILARITY: float = 0.6  # best local similarity needed to skip the vector store
+    SESSION_CACHE_MAX_CHUNKS: int = 30  # working set size per session
+    SESSION_CACHE_MAX_SESSIONS: int = 1000  # sessions kept in memory per worker
+    SESSION_CACHE_TTL_SECONDS: float = 1800.0
+    SESSION_CACHE_QUANTIZATION: str = "int8"  # working set vectors: "none" (float32) or "int8"
+    ARTIFACT_DIR: str = ""  # cached parsed pages and chunk lists; empty = UPLOAD_DIR/artifacts
+    
+    # Chat Message Write-Behind
+    MESSAGE_BUFFER_ENABLED: bool = True  # False writes each message pair synchronously
+    MESSAGE_FLUSH_INTERVAL: float = 0.2  # seconds between batched inserts
+    MESSAGE_FLUSH_BATCH_SIZE: int = 500  # rows per multi-row INSERT
+    MESSAGE_JOURNAL_DIR: str = ""  # replayed on startup after a crash; empty = UPLOAD_DIR/message_journal
+    MESSAGE_JOURNAL_FSYNC: bool = True  # fsync journal writes (survive power loss, not just crashes)
+    
+    # Document Deletion
+    DOCUMENT_PURGE_INTERVAL: float = 5.0  # seconds between background purges of deleted documents
+    DOCUMENT_PURGE_BATCH_SIZE: int = 100  # documents per vector store delete and DB commit
+    TOMBSTONE_REFRESH_SECONDS: float = 5.0  # how often workers re-read deleted-but-not-purged documents
+    
+    # Index Versions / Re-embedding
+    INDEX_REFRESH_SECONDS: float = 30.0  # how often workers re-check the active index
+    REINDEX_BATCH_SIZE: int = 500  # chunks embedded per batch
+    REINDEX_THROTTLE_SECONDS: float = 0.5  # pause between batches to leave room for live traffic
     
     # LLM Configuration
     LLM_MODEL: str = "llama-3.3-70b-versatile"
-    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"  # used for new index versions
     LLM_TEMPERATURE: float = 0.7
     MAX_OUTPUT_TOKENS: int = 2048
     
+    # LLM Admission Control (per worker process)
+    LLM_MAX_CONCURRENCY: int = 8  # provider calls in flight
+    LLM_MAX_QUEUE: int = 32  # requests waiting for a slot; more are rejected with 429
+    LLM_QUEUE_TIMEOUT: float = 30.0  # seconds a request may wait before it is rejected
+    LLM_GLOBAL_RATE: float = 0.5  # provider calls per second (Groq free tier: 30/min); 0 disables
+    LLM_GLOBAL_BURST: int = 10
+    LLM_USER_RATE: float = 0.2  # messages per second per user; 0 disables
+    LLM_USER_BURST: int = 5
+    LLM_MAX_RETRIES: int = 3  # retries after a provider rate-limit error
+    LLM_BACKGROUND_CONCURRENCY: int = 4  # slots batch runs may hold; capped below LLM_MAX_CONCURRENCY
+    
+    # LLM Hedging / Failover
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_MODEL: str = ""  # model raced against slow primary calls; "" = LLM_MODEL
+    LLM_HEDGE_DELAY: float = 3.0  # seconds before hedging, until enough latencies are observed
+    LLM_HEDGE_PERCENTILE: float = 95.0  # primary latency percentile that triggers a hedge
+    LLM_HEDGE_MIN_DELAY: float = 0.5
+    LLM_FALLBACK_MODEL: str = "llama-3.1-8b-instant"  # used when the primary fails; "" disables
+    
+    # Batch Questions (evaluation runs)
+    BATCH_QUERY_MAX_QUESTIONS: int = 5000  # per API request; the CLI has no limit
+    BATCH_QUERY_CONCURRENCY: int = 4  # LLM calls in flight per batch, inside the gateway limits
+    BATCH_QUERY_SEARCH_BATCH_SIZE: int = 256  # query vectors per vector store call
+    
+    # Serving / Scale-out (gunicorn.conf.py)
+    WEB_WORKERS: int = 0  # API worker processes; 0 = one per CPU core
+    WEB_TIMEOUT: int = 120  # seconds before a stuck worker is restarted
+    WEB_MAX_REQUESTS: int = 2000  # requests before a worker is recycled; 0 disables
+    EMBEDDING_THREADS: int = 0  # torch threads per process; 0 = torch default (set per worker by gunicorn)
+    LLM_RATE_SHARDS: int = 1  # processes sharing LLM_GLOBAL_RATE/BURST (set by gunicorn; multiply by API nodes)
+    CREATE_TABLES_ON_STARTUP: bool = True  # gunicorn creates them once in the master instead
+    
+    # Ingestion Queue
+    INGEST_QUEUE_ENABLED: bool = False  # uploads are processed by `python -m app.cli.ingest_worker`, not in the request
+    INGEST_WORKER_POLL_SECONDS: float = 2.0
+    INGEST_JOB_MAX_ATTEMPTS: int = 3
+    INGEST_JOB_TIMEOUT_SECONDS: float = 1800.0  # running jobs older than this are handed to another worker
+    
+    # Load Testing (never enable in production)
+    LOAD_TEST_MODE: bool = False  # fake LLM + in-process ChromaDB instead of Groq and the Chroma server
+    FAKE_LLM_LATENCY: float = 0.3  # seconds before the first token
+    FAKE_LLM_TOKENS_PER_SECOND: float = 80.0
+    FAKE_LLM_OUTPUT_TOKENS: int = 150
+    
+    @model_validator(mode="after")
+    def _storage_under_upload_dir(self) -> "Settings":
+        """Fill in storage paths left empty, so pointing UPLOAD_DIR elsewhere moves all of them"""
+        for field, name in UPLOAD_SUBPATHS.items():
+            if not getattr(self, field):
+                setattr(self, field, os.path.join(self.UPLOAD_DIR, name))
+        return self
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
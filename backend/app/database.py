@@ -1,18 +1,37 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import settings
+import hashlib
 
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+if settings.DATABASE_URL.startswith("sqlite"):
+    # Local stand-in for benchmarks and load tests; production runs on PostgreSQL
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False}
+    )
+
+    # Render the PostgreSQL column types used by the models
+    @compiles(JSONB, "sqlite")
+    def _compile_jsonb_sqlite(type_, compiler, **kw):
+        return "JSON"
+
+    @compiles(UUID, "sqlite")
+    def _compile_uuid_sqlite(type_, compiler, **kw):
+        return "CHAR(32)"
+else:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20
+    )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -33,3 +52,28 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def advisory_lock(db: Session, name: str, wait: bool = True) -> bool:
+    """
+    Lock a name until the session's transaction ends
+    
+    PostgreSQL advisory lock, so processes on every host agree; on the
+    SQLite stand-in there is no other writer to exclude and this always
+    succeeds.
+    
+    Args:
+        db: Database session
+        name: What to lock, e.g. a storage URI
+        wait: Block until the lock is free, instead of giving up
+        
+    Returns:
+        bool: Whether the lock is held
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+    if wait:
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}).scalar())
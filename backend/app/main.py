@@ -1,13 +1,25 @@
 """
 FastAPI main application
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.routers import auth, documents, chat
 from app.database import engine, Base
+from app.middleware import UploadSizeLimitMiddleware, RequestContextMiddleware
+from app.services.message_buffer import message_buffer
+from app.services.document_purger import document_purger
+from app.services.chroma_client import chroma_connection
+from app.utils.request_context import configure_logging
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
 import os
 
+configure_logging(settings.LOG_LEVEL)
+
+# Allowance for multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
 # Create uploads directory if it doesn't exist
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
@@ -20,6 +32,16 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Reject oversized uploads before their bodies are read (added before CORS,
+# so CORS wraps it and browsers can read the 413)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/documents/upload": settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+        "/api/documents/upload/bulk": settings.MAX_ARCHIVE_SIZE + MULTIPART_OVERHEAD,
+    }
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,8 +49,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request IDs and latency metrics (added last so it wraps everything)
+app.add_middleware(RequestContextMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(documents.router)
@@ -47,14 +73,45 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """
+    Health check endpoint
+
+    Reports the vector database heartbeat and its latency. An unreachable
+    vector database makes the API "degraded" rather than failing the
+    check: every worker shares it, so restarting workers would not help.
+    """
+    vector_store = await run_in_threadpool(chroma_connection.health)
+    return {
+        "status": "healthy" if vector_store["status"] == "up" else "degraded",
+        "vector_store": vector_store
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint (aggregated over all workers under gunicorn)"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
     """Create database tables on startup"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully")
+    if settings.CREATE_TABLES_ON_STARTUP:
+        Base.metadata.create_all(bind=engine)
+        print("✅ Database tables created successfully")
     print(f"✅ Uploads directory: {settings.UPLOAD_DIR}")
+    if settings.MESSAGE_BUFFER_ENABLED:
+        message_buffer.start()
+    document_purger.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write chat messages still in the write-behind buffer and stop background purges"""
+    message_buffer.stop()
+    document_purger.stop()
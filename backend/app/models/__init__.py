@@ -4,5 +4,7 @@ Database models
 from app.models.user import User
 from app.models.document import Document
 from app.models.chat import ChatSession, ChatMessage
+from app.models.index_version import IndexVersion
+from app.models.ingestion_job import IngestionJob
 
-__all__ = ["User", "Document", "ChatSession", "ChatMessage"]
+__all__ = ["User", "Document", "ChatSession", "ChatMessage", "IndexVersion", "IngestionJob"]
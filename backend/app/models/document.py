@@ -21,10 +21,12 @@ class Document(Base):
     file_type = Column(String(10), nullable=False)  # 'pdf', 'docx'
     file_path = Column(Text, nullable=False)
     file_size = Column(Integer, nullable=True)  # in bytes
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     processed = Column(Boolean, default=False)
     chunk_count = Column(Integer, default=0)
     error_message = Column(Text, nullable=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)  # tombstone until purged
     
     # Relationships
     user = relationship("User", back_populates="documents")
@@ -0,0 +1,30 @@
+"""
+Vector index version model
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+
+from app.database import Base
+
+
+class IndexVersion(Base):
+    """A ChromaDB collection built with one embedding model"""
+    
+    __tablename__ = "index_versions"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    collection_name = Column(String(63), unique=True, nullable=False)
+    embedding_model = Column(String(255), nullable=False)
+    status = Column(String(20), nullable=False)  # 'building', 'active', 'retired', 'failed'
+    total_documents = Column(Integer, default=0)
+    processed_documents = Column(Integer, default=0)
+    total_chunks = Column(Integer, default=0)  # estimate from documents.chunk_count
+    processed_chunks = Column(Integer, default=0)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<IndexVersion(collection={self.collection_name}, model={self.embedding_model}, status={self.status})>"
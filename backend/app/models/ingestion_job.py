@@ -0,0 +1,29 @@
+"""
+Ingestion job model
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+
+from app.database import Base
+
+
+class IngestionJob(Base):
+    """A document waiting for (or being processed by) an ingestion worker"""
+    
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String(20), nullable=False, default="process")  # 'process', 'reprocess'
+    status = Column(String(20), nullable=False, default="queued", index=True)  # 'queued', 'running', 'done', 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String(255), nullable=True)  # host:pid of the worker that claimed it
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, document_id={self.document_id}, status={self.status})>"
@@ -2,21 +2,26 @@
 Chat API Router
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
+import json
 
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.routers.auth import get_current_user
 from app.services.chat_service import ChatService
+from app.services.batch_query_service import BatchQueryService
 from app.schemas.chat import (
     ChatSessionCreate, 
     ChatSessionResponse, 
     ChatSessionListResponse,
     ChatMessageRequest, 
     ChatMessageResponse,
-    ChatHistoryResponse
+    ChatHistoryResponse,
+    BatchQueryRequest
 )
 
 router = APIRouter(
@@ -26,6 +31,7 @@ router = APIRouter(
 
 # Initialize service
 chat_service = ChatService()
+batch_query_service = BatchQueryService(chat_service)
 
 @router.post("/sessions", response_model=ChatSessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_chat_session(
@@ -56,12 +62,10 @@ async def get_chat_history(
 ):
     """Get chat history for a specific session"""
     session = chat_service.get_session(db, session_id, current_user.id)
-    # Messages are loaded via relationship mechanism in Pydantic schema if set up correctly.
-    # However, strict Pydantic models might need explicit conversion or the relationship to be eager loaded.
-    # Let's ensure schema compatibility.
+    # Includes messages still waiting in the write-behind buffer
     return ChatHistoryResponse(
         session=session,
-        messages=session.messages
+        messages=chat_service.get_messages(db, session)
     )
 
 @router.post("/sessions/{session_id}/messages", response_model=ChatMessageResponse)
@@ -85,3 +89,34 @@ async def send_message(
         session_id, 
         message_data.content
     )
+
+@router.post("/batch")
+async def batch_query(
+    batch: BatchQueryRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Answer many questions at once (evaluation runs)
+    
+    Results are streamed as JSON lines in completion order; no chat
+    sessions or messages are created.
+    """
+    if len(batch.questions) > settings.BATCH_QUERY_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_QUERY_MAX_QUESTIONS} questions per batch"
+        )
+    
+    questions = []
+    for number, question in enumerate(batch.questions, start=1):
+        record = question.model_dump()
+        record["id"] = record["id"] or str(number)
+        questions.append(record)
+    
+    async def lines():
+        async for result in batch_query_service.iter_results(
+            questions, generate=batch.generate, top_k=batch.top_k, user_id=current_user.id
+        ):
+            yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -9,7 +9,13 @@ from uuid import UUID
 from app.database import get_db
 from app.routers.auth import get_current_user
 from app.services.document_service import DocumentService
-from app.schemas.document import DocumentResponse
+from app.services.ingestion_service import BulkIngestionService
+from app.schemas.document import (
+    DocumentResponse,
+    BulkUploadResponse,
+    BulkDeleteRequest,
+    BulkDeleteResponse
+)
 from app.models.user import User
 
 router = APIRouter(
@@ -19,6 +25,7 @@ router = APIRouter(
 
 # Initialize service
 document_service = DocumentService()
+ingestion_service = BulkIngestionService(document_service)
 
 
 @router.post("/upload", response_model=DocumentResponse)
@@ -34,6 +41,19 @@ async def upload_document(
     return await document_service.upload_document(db, current_user, file)
 
 
+@router.post("/upload/bulk", response_model=BulkUploadResponse)
+async def upload_archive(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a ZIP archive of documents and ingest them in bulk.
+    Re-uploading the same archive resumes an interrupted run.
+    """
+    return await ingestion_service.ingest_archive(db, current_user, file)
+
+
 @router.get("", response_model=List[DocumentResponse])
 async def get_documents(
     current_user: User = Depends(get_current_user),
@@ -43,6 +63,33 @@ async def get_documents(
     return document_service.get_user_documents(db, current_user.id)
 
 
+@router.delete("", response_model=BulkDeleteResponse)
+async def delete_all_documents(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete every document of the current user.
+    Documents disappear at once; their embeddings and files are purged in the background.
+    """
+    return BulkDeleteResponse(deleted=document_service.delete_documents(db, current_user.id))
+
+
+@router.post("/bulk-delete", response_model=BulkDeleteResponse)
+async def delete_documents(
+    request: BulkDeleteRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete many documents at once.
+    Unknown IDs and documents of other users are ignored.
+    """
+    return BulkDeleteResponse(
+        deleted=document_service.delete_documents(db, current_user.id, request.doc_ids)
+    )
+
+
 @router.get("/{doc_id}", response_model=DocumentResponse)
 async def get_document(
     doc_id: UUID,
@@ -53,11 +100,21 @@ async def get_document(
     return document_service.get_document_by_id(db, doc_id, current_user.id)
 
 
+@router.post("/{doc_id}/reprocess", response_model=DocumentResponse)
+async def reprocess_document(
+    doc_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Retry processing of a document, reusing its cached parse"""
+    return await document_service.reprocess_document(db, doc_id, current_user.id)
+
+
 @router.delete("/{doc_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_document(
     doc_id: UUID,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a document and its embeddings"""
+    """Delete a document; its embeddings and file are purged in the background"""
     document_service.delete_document(db, doc_id, current_user.id)
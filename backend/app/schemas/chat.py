@@ -30,6 +30,22 @@ class ChatMessageRequest(BaseModel):
     content: str = Field(..., min_length=1, max_length=5000)
 
 
+class BatchQuestion(BaseModel):
+    """One question of a batch; extra fields are copied to its result"""
+    id: Optional[str] = None
+    question: str = Field(..., min_length=1, max_length=5000)
+
+    class Config:
+        extra = "allow"
+
+
+class BatchQueryRequest(BaseModel):
+    """Answer many questions at once (evaluation runs)"""
+    questions: List[BatchQuestion] = Field(..., min_length=1)
+    generate: bool = True
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+
+
 class SourceDocument(BaseModel):
     """Source document chunk"""
     doc_id: str
@@ -37,6 +53,7 @@ class SourceDocument(BaseModel):
     chunk_index: int
     content: str
     page_number: Optional[int] = None
+    section: Optional[str] = None
 
 
 class ChatMessageResponse(BaseModel):
@@ -1,9 +1,9 @@
 """
 Document schemas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict
 from uuid import UUID
 
 
@@ -40,3 +40,30 @@ class DocumentListResponse(BaseModel):
     """List of documents"""
     documents: list[DocumentResponse]
     total: int
+
+
+class BulkUploadFile(BaseModel):
+    """Status of one file in a bulk upload"""
+    path: str
+    status: str
+    doc_id: Optional[UUID] = None
+    error: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    """Bulk upload summary"""
+    manifest: str
+    total: int
+    skipped: int
+    summary: Dict[str, int]
+    files: List[BulkUploadFile]
+
+
+class BulkDeleteRequest(BaseModel):
+    """Documents to delete"""
+    doc_ids: List[UUID] = Field(..., min_length=1, max_length=10000)
+
+
+class BulkDeleteResponse(BaseModel):
+    """Bulk delete result"""
+    deleted: int
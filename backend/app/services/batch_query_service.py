@@ -0,0 +1,208 @@
+"""
+Batch question answering for evaluation runs
+"""
+from fastapi import HTTPException, status
+from app.config import settings
+from app.services.chat_service import ChatService
+from app.services.index_registry import index_registry
+from app.utils.metrics import timed, record_token_usage
+from typing import Any, AsyncIterator, Dict, Hashable, Iterable, List, Optional
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def parse_questions(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Read questions from JSONL lines
+
+    Each line is either a JSON object with a "question" field (other fields,
+    e.g. an expected answer, are copied to the result) or plain question text.
+    Questions without an "id" are numbered by line.
+
+    Args:
+        lines: Input lines
+
+    Returns:
+        List of question records
+    """
+    questions = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line) if line.startswith("{") else {"question": line}
+        if not str(record.get("question", "")).strip():
+            raise ValueError(f"Line {number} has no question")
+        record.setdefault("id", str(number))
+        questions.append(record)
+    return questions
+
+
+class BatchQueryService:
+    """
+    Answer many questions without going through chat sessions.
+
+    All questions are embedded in one batched call and retrieved the way
+    chat retrieves them (``ChatService.search_many``: two-stage search on
+    large indexes, the same similarity cut-off for the prompt). Only the
+    LLM calls run per question, at most ``concurrency`` at a time, as
+    background calls through the chat service's gateway: they are paced
+    by the caller's rate limit and share a lane smaller than the
+    gateway's slots, so batches cannot starve live chat. Nothing is
+    written to ``chat_messages``.
+
+    Args:
+        chat_service: Chat service whose stores, prompts and gateway are reused
+    """
+
+    def __init__(self, chat_service: ChatService):
+        self.chat_service = chat_service
+
+    async def iter_results(
+        self,
+        questions: List[Dict[str, Any]],
+        generate: bool = True,
+        concurrency: Optional[int] = None,
+        top_k: Optional[int] = None,
+        user_id: Optional[Hashable] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer questions, yielding each result as soon as it is ready
+
+        Args:
+            questions: Question records with "id" and "question"
+            generate: Call the LLM; False returns retrieval results only
+            concurrency: LLM calls in flight (defaults to BATCH_QUERY_CONCURRENCY)
+            top_k: Candidates retrieved per question (defaults to TOP_K_RESULTS)
+            user_id: Caller whose LLM rate limit paces the batch (None for the CLI)
+
+        Yields:
+            Result records in completion order (not input order)
+        """
+        if not questions:
+            return
+
+        service = self.chat_service
+        loop = asyncio.get_running_loop()
+        embedder = index_registry.bind(service.vector_store, service.embeddings)
+        texts = [record["question"] for record in questions]
+
+        with timed("batch", "embed_query"):
+            vectors = await loop.run_in_executor(None, embedder.embed_batch, texts)
+        with timed("batch", "vector_search"):
+            search_results = await loop.run_in_executor(None, service.search_many, vectors, top_k)
+
+        prepared = []
+        for record, results in zip(questions, search_results):
+            context_str, sources = service.build_context(results)
+            depth = service.router.select_depth(results["distances"])
+            result = {
+                **record,
+                "sources": sources,
+                "retrieved": [
+                    {
+                        "id": chunk_id,
+                        "doc_id": meta.get("doc_id"),
+                        "chunk_index": meta.get("chunk_index"),
+                        "distance": distance,
+                        "in_context": rank < depth  # kept by chat's similarity cut-off
+                    }
+                    for rank, (chunk_id, meta, distance) in enumerate(zip(
+                        results["ids"], results["metadatas"], results["distances"]
+                    ))
+                ]
+            }
+            prepared.append((result, context_str))
+
+        if not generate:
+            for result, _ in prepared:
+                yield result
+            return
+
+        semaphore = asyncio.Semaphore(concurrency or settings.BATCH_QUERY_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(self._answer(semaphore, result, context_str, user_id))
+            for result, context_str in prepared
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _answer(
+        self,
+        semaphore: asyncio.Semaphore,
+        result: Dict[str, Any],
+        context_str: str,
+        user_id: Optional[Hashable] = None
+    ) -> Dict[str, Any]:
+        """Generate one answer; failures are recorded on the result, not raised"""
+        messages = self.chat_service.rag_messages(context_str, result["question"])
+        async with semaphore:
+            started = time.perf_counter()
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                try:
+                    with timed("batch", "llm"):
+                        response = await self.chat_service.gateway.invoke(
+                            messages, user_id=user_id, background=True
+                        )
+                    break
+                except HTTPException as e:
+                    # Admission control is protecting live traffic: wait our turn
+                    retry_after = float((e.headers or {}).get("Retry-After", 1))
+                    if e.status_code != status.HTTP_429_TOO_MANY_REQUESTS or attempt == settings.LLM_MAX_RETRIES:
+                        return {**result, "answer": None, "error": e.detail}
+                    await asyncio.sleep(retry_after)
+                except Exception as e:
+                    logger.warning("Batch question %s failed: %s", result.get("id"), e)
+                    return {**result, "answer": None, "error": str(e)}
+
+        model_name = (getattr(response, "response_metadata", None) or {}).get("model_name")
+        record_token_usage(model_name or settings.LLM_MODEL, response)
+        return {
+            **result,
+            "answer": response.content,
+            "model": model_name or settings.LLM_MODEL,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    async def run_to_file(
+        self,
+        questions: List[Dict[str, Any]],
+        output_path: str,
+        generate: bool = True,
+        concurrency: Optional[int] = None,
+        top_k: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Answer questions and write one JSON line per result
+
+        Args:
+            questions: Question records with "id" and "question"
+            output_path: JSONL file to write
+            generate: Call the LLM; False writes retrieval results only
+            concurrency: LLM calls in flight
+            top_k: Candidates retrieved per question
+
+        Returns:
+            Summary with total, failed and elapsed_seconds
+        """
+        started = time.perf_counter()
+        failed = 0
+        with open(output_path, "w", encoding="utf-8") as output:
+            async for result in self.iter_results(questions, generate, concurrency, top_k):
+                failed += 1 if result.get("error") else 0
+                output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                output.flush()
+        return {
+            "output": output_path,
+            "total": len(questions),
+            "failed": failed,
+            "elapsed_seconds": round(time.perf_counter() - started, 2)
+        }
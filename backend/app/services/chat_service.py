@@ -6,28 +6,55 @@ from fastapi import HTTPException, status
 from app.models.chat import ChatSession, ChatMessage
 from app.models.user import User
 from app.services.vector_store import VectorStore
+from app.services.index_registry import index_registry
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_gateway import LLMGateway
+from app.services.llm_hedging import HedgedChatModel
+from app.services.query_router import QueryRouter, SMALL_TALK, FOLLOW_UP, LOOKUP
+from app.services.session_cache import session_retrieval_cache, WorkingSet
+from app.services.document_purger import document_purger
+from app.services.message_buffer import message_buffer, utc_now, as_utc
 from app.utils.embeddings import GeminiEmbeddings
+from app.utils.parent_store import parent_store
+from app.utils.chunk_store import chunk_store
 from app.config import settings
 from langchain_groq import ChatGroq
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from typing import List, Dict, Any, Optional
+from app.utils.metrics import timed, record_cache, record_token_usage, QUERY_ROUTES, CONTEXT_CHUNKS
+from typing import List, Dict, Any, Optional, Tuple, Union
 from uuid import UUID
+import asyncio
 import json
+import logging
+import uuid
 
-# ...
+logger = logging.getLogger(__name__)
 
 class ChatService:
     """Service for chat and RAG operations"""
     
-    def __init__(self):
-        self.vector_store = VectorStore()
-        self.embeddings = GeminiEmbeddings() # Will rename this later to GenericEmbeddings
+    def __init__(
+        self,
+        vector_store: Optional[VectorStore] = None,
+        embeddings: Optional[GeminiEmbeddings] = None,
+        llm: Optional[Union[BaseChatModel, HedgedChatModel]] = None
+    ):
+        self.vector_store = vector_store or VectorStore()
+        self.embeddings = embeddings or GeminiEmbeddings() # Will rename this later to GenericEmbeddings
         
-        self.llm = ChatGroq(
-            model=settings.LLM_MODEL,
-            api_key=settings.GROQ_API_KEY,
-            temperature=0.7
-        )
+        if llm is not None:
+            self.llm = llm
+        else:
+            self.llm = HedgedChatModel(
+                primary=self._build_llm(settings.LLM_MODEL),
+                hedge=self._build_llm(settings.LLM_HEDGE_MODEL or settings.LLM_MODEL)
+                if settings.LLM_HEDGE_ENABLED else None,
+                fallback=self._build_llm(settings.LLM_FALLBACK_MODEL)
+                if settings.LLM_FALLBACK_MODEL else None
+            )
+        self.gateway = LLMGateway(self.llm)
+        self.router = QueryRouter()
         self.system_prompt = """You are Aero-Doc AI, an intelligent assistant designed to help users understand their technical documents.
         Use the following pieces of retrieved context to answer the user's question.
         
@@ -40,6 +67,293 @@ class ChatService:
         Context:
         {context}
         """
+        self.follow_up_prompt = """You are Aero-Doc AI, an assistant for technical documents.
+        The user is asking you to rework your previous answer (simplify, expand, rephrase or give an example).
+        Use ONLY the information in the conversation so far. Do not add new technical facts; if the user needs
+        information that is not in the conversation, ask them to ask a new question about the documents.
+        """
+        self.small_talk_prompt = """You are Aero-Doc AI, an assistant that answers questions about the user's technical documents.
+        Reply to the user's message briefly and politely in one or two sentences, in the user's language,
+        and invite them to ask about their documents. Do not state any technical facts.
+        """
+
+    @staticmethod
+    def _build_llm(model: str) -> BaseChatModel:
+        """Create the chat model client for a model name"""
+        if settings.LOAD_TEST_MODE:
+            return FakeChatModel(
+                latency=settings.FAKE_LLM_LATENCY,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+                output_tokens=settings.FAKE_LLM_OUTPUT_TOKENS
+            )
+        return ChatGroq(
+            model=model,
+            api_key=settings.GROQ_API_KEY,
+            temperature=0.7
+        )
+
+    def _retrieve_context(self, content: str, session: ChatSession) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Retrieve the chunks relevant to a question
+        
+        The session's working set of recently retrieved chunks is tried
+        first; the vector store is searched only when nothing there is
+        similar enough.
+        
+        Args:
+            content: User question
+            session: Chat session the question belongs to
+            
+        Returns:
+            Tuple of (prompt context, source entries)
+        """
+        embedder = index_registry.bind(self.vector_store, self.embeddings)
+        with timed("chat", "embed_query"):
+            query_embedding = embedder.embed_query(content)
+        
+        search_results = None
+        if settings.SESSION_CACHE_ENABLED:
+            working_set = self._working_set(session)
+            if working_set is not None:
+                with timed("chat", "session_cache_search"):
+                    local = document_purger.visible(session_retrieval_cache.search(
+                        working_set, query_embedding, settings.TOP_K_RESULTS
+                    ))
+                if local["distances"] and 1 - local["distances"][0] >= settings.SESSION_CACHE_MIN_SIMILARITY:
+                    search_results = local
+            record_cache("session_retrieval", search_results is not None)
+        
+        if search_results is None:
+            search_results = self._search(query_embedding)
+            if settings.SESSION_CACHE_ENABLED:
+                session.retrieval_chunk_ids = session_retrieval_cache.add(
+                    session.id,
+                    self.vector_store.collection_name,
+                    search_results["ids"],
+                    search_results["documents"],
+                    search_results["metadatas"],
+                    search_results["embeddings"]
+                )
+        
+        return self.build_context(search_results)
+
+    def _search(self, query_embedding: Any, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Search the vector store for a query's chunks
+        
+        Once the document index holds TWO_STAGE_MIN_DOCUMENTS documents,
+        the TWO_STAGE_TOP_DOCUMENTS documents closest to the query are
+        picked by their centroid vector first and only their chunks are
+        searched, so the chunk search does not grow with the corpus and
+        its results come from the few most relevant manuals.
+        
+        Args:
+            query_embedding: Query embedding vector
+            top_k: Chunks to return (defaults to TOP_K_RESULTS)
+            
+        Returns:
+            Search results shaped like VectorStore.search output
+        """
+        filter_metadata = document_purger.search_filter()
+        if self._two_stage():
+            with timed("chat", "document_search"):
+                documents = self.vector_store.search_documents(
+                    query_embedding,
+                    top_k=settings.TWO_STAGE_TOP_DOCUMENTS,
+                    filter_metadata=filter_metadata
+                )
+            # Tombstones were already left out of the documents
+            if documents["ids"]:
+                filter_metadata = {"doc_id": {"$in": documents["ids"]}}
+        
+        with timed("chat", "vector_search"):
+            return self.vector_store.search(
+                query_embedding=query_embedding,
+                top_k=top_k or settings.TOP_K_RESULTS,
+                filter_metadata=filter_metadata,
+                include_embeddings=settings.SESSION_CACHE_ENABLED
+            )
+
+    def search_many(self, query_embeddings: Any, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search the chunks of many queries the way chat retrieval does
+        
+        With two-stage retrieval each query gets its own document and
+        chunk search, as in chat; otherwise all queries go out in
+        multi-query vector store calls.
+        
+        Args:
+            query_embeddings: Query embedding vectors
+            top_k: Chunks per query (defaults to TOP_K_RESULTS)
+            
+        Returns:
+            One result per query, in input order, shaped like VectorStore.search output
+        """
+        if self._two_stage():
+            return [self._search(vector, top_k) for vector in query_embeddings]
+        return self.vector_store.search_many(
+            query_embeddings, top_k or settings.TOP_K_RESULTS, document_purger.search_filter()
+        )
+
+    def _two_stage(self) -> bool:
+        """Whether the index is large enough to pick documents before chunks"""
+        return settings.TWO_STAGE_RETRIEVAL and self.vector_store.document_count() >= settings.TWO_STAGE_MIN_DOCUMENTS
+
+    def build_context(self, search_results: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Turn search results into prompt context and source entries
+        
+        Matched chunks are expanded to the parent section they were cut
+        from; a section matched by several chunks (or several documents'
+        chunks sharing one) is sent once. Sections stop being added once
+        MAX_CONTEXT_CHARS is reached, falling back to the matched chunk
+        itself when only that still fits. Chunk texts not returned by the
+        vector store are read from the chunk store, only for chunks that
+        end up in the prompt.
+        
+        Args:
+            search_results: Results shaped like VectorStore.search output
+            
+        Returns:
+            Tuple of (prompt context, source entries)
+        """
+        # Keep only the results before the similarity drop-off
+        depth = self.router.select_depth(search_results.get("distances", []))
+        docs = search_results.get("documents", [])[:depth]
+        metas = list(search_results.get("metadatas", [])[:len(docs)])
+        metas += [{}] * (len(docs) - len(metas))
+        CONTEXT_CHUNKS.observe(len(docs))
+        
+        with timed("chat", "parent_lookup"):
+            parents = self._parent_sections(metas)
+        
+        context_parts = []
+        sources = []
+        included = set()
+        used = 0
+        for doc_text, meta, parent in zip(docs, metas, parents):
+            filename = meta.get("filename", "Unknown")
+            section_key = (meta.get("doc_id"), meta.get("chunker"), parent[0]) if parent else None
+            
+            if section_key is None or section_key not in included:
+                text = parent[1] if parent else self._chunk_text(doc_text, meta)
+                if context_parts and used + len(text) > settings.MAX_CONTEXT_CHARS:
+                    text = self._chunk_text(doc_text, meta)
+                    section_key = None
+                if context_parts and used + len(text) > settings.MAX_CONTEXT_CHARS:
+                    break
+                if not text:
+                    continue  # text not available on this host
+                included.add(section_key)
+                used += len(text)
+                context_parts.append(f"Source: {filename}\nContent: {text}")
+            
+            # Add unique source to list
+            source_entry = {
+                "doc_id": meta.get("doc_id"),
+                "filename": filename,
+                "chunk_index": meta.get("chunk_index"),
+                "page_number": meta.get("page_number"),
+                "section": meta.get("section")
+            }
+            if source_entry not in sources:
+                sources.append(source_entry)
+        
+        return "\n\n".join(context_parts), sources
+
+    @staticmethod
+    def _chunk_text(doc_text: Optional[str], meta: Dict[str, Any]) -> str:
+        """Text of a matched chunk, from the search result or the chunk store"""
+        if doc_text is not None:
+            return doc_text
+        text = None
+        if meta.get("chunker") and meta.get("chunk_index") is not None:
+            text = chunk_store.text(meta.get("doc_id"), meta["chunker"], meta["chunk_index"])
+        return text or ""
+
+    @staticmethod
+    def _parent_sections(metas: List[Dict[str, Any]]) -> List[Optional[Tuple[int, str]]]:
+        """(section start, section text) for each matched chunk, or None when it has no section"""
+        keyed = [
+            i for i, meta in enumerate(metas)
+            if meta.get("chunker") and meta.get("doc_id") and meta.get("chunk_index") is not None
+        ]
+        parents: List[Optional[Tuple[int, str]]] = [None] * len(metas)
+        if keyed:
+            found = parent_store.get_many(
+                (metas[i]["doc_id"], metas[i]["chunker"], metas[i]["chunk_index"]) for i in keyed
+            )
+            for i, parent in zip(keyed, found):
+                parents[i] = parent
+        return parents
+
+    def rag_messages(self, context_str: str, content: str) -> List[Any]:
+        """Prompt messages for answering a question from retrieved context"""
+        return [
+            SystemMessage(content=self.system_prompt.format(context=context_str)),
+            HumanMessage(content=content)
+        ]
+
+    def _working_set(self, session: ChatSession) -> Optional[WorkingSet]:
+        """Get the session's working set, rebuilding it from the stored chunk IDs if needed"""
+        collection_name = self.vector_store.collection_name
+        working_set = session_retrieval_cache.get(session.id, collection_name)
+        if working_set is None and session.retrieval_chunk_ids:
+            # Built by another worker or before a restart: one lookup by ID instead of a search
+            with timed("chat", "session_cache_load"):
+                chunks = self.vector_store.get_chunks(session.retrieval_chunk_ids)
+            session_retrieval_cache.add(
+                session.id,
+                collection_name,
+                chunks["ids"],
+                chunks["documents"],
+                chunks["metadatas"],
+                chunks["embeddings"]
+            )
+            working_set = session_retrieval_cache.get(session.id, collection_name)
+        return working_set
+
+    def _recent_history(self, db: Session, session_id: UUID) -> List[ChatMessage]:
+        """
+        Messages a follow-up refers to, oldest first
+        
+        Returns an empty list unless the latest message is a successful
+        assistant answer.
+        """
+        limit = settings.FOLLOW_UP_HISTORY_MESSAGES
+        stored = db.query(ChatMessage).filter(
+            ChatMessage.session_id == session_id
+        ).order_by(ChatMessage.created_at.desc()).limit(limit).all()
+        recent = self._merge_pending(session_id, stored)[-limit:]
+        
+        if not recent or recent[-1].role != "assistant":
+            return []
+        if any("error" in source for source in recent[-1].sources or []):
+            return []
+        return recent
+
+    @staticmethod
+    def _merge_pending(session_id: UUID, stored: List[ChatMessage]) -> List[ChatMessage]:
+        """Stored messages plus those still in the write-behind buffer, oldest first"""
+        merged = {message.id: message for message in stored}
+        for message in message_buffer.pending_messages(session_id):
+            merged.setdefault(message.id, message)
+        return sorted(merged.values(), key=lambda message: as_utc(message.created_at))
+
+    @staticmethod
+    def _apply_pending(session: ChatSession) -> ChatSession:
+        """Show session values that are still in the write-behind buffer"""
+        pending = message_buffer.pending_session(session.id)
+        if pending:
+            session.title = pending["title"]
+            session.retrieval_chunk_ids = pending["retrieval_chunk_ids"]
+            session.updated_at = pending["updated_at"]
+        return session
+
+    def get_messages(self, db: Session, session: ChatSession) -> List[ChatMessage]:
+        """Get all messages of a session, including ones not yet written, oldest first"""
+        stored = db.query(ChatMessage).filter(ChatMessage.session_id == session.id).all()
+        return self._merge_pending(session.id, stored)
 
     def create_session(self, db: Session, user: User, title: str = "New Chat") -> ChatSession:
         """Create a new chat session"""
@@ -51,9 +365,11 @@ class ChatService:
 
     def get_user_sessions(self, db: Session, user: User) -> List[ChatSession]:
         """Get all chat sessions for a user"""
-        return db.query(ChatSession).filter(
+        sessions = db.query(ChatSession).filter(
             ChatSession.user_id == user.id
         ).order_by(ChatSession.updated_at.desc()).all()
+        sessions = [self._apply_pending(session) for session in sessions]
+        return sorted(sessions, key=lambda session: as_utc(session.updated_at), reverse=True)
 
     def get_session(self, db: Session, session_id: UUID, user_id: UUID) -> ChatSession:
         """Get a specific session"""
@@ -67,7 +383,7 @@ class ChatService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Chat session not found"
             )
-        return session
+        return self._apply_pending(session)
 
     async def send_message(
         self, 
@@ -78,96 +394,102 @@ class ChatService:
     ) -> ChatMessage:
         """
         Process user message and generate RAG response
+        
+        The question is stored together with its answer (or the error
+        reply) through the write-behind message buffer, so no database
+        write sits on the request path. A request rejected by admission
+        control stores nothing and can simply be resent.
         """
         # 1. Validate session
         session = self.get_session(db, session_id, user_id)
         
-        # 2. Save user message
+        # 2. Build the user message; it is saved with the answer
         user_msg = ChatMessage(
+            id=uuid.uuid4(),
             session_id=session_id,
             role="user",
-            content=content
+            content=content,
+            created_at=utc_now()
         )
-        db.add(user_msg)
-        db.commit()
         
         try:
-            # 3. Retrieve relevant documents (RAG)
-            query_embedding = self.embeddings.embed_query(content)
-            search_results = self.vector_store.search(
-                query_embedding=query_embedding,
-                top_k=5
-            )
-            
-            # Format context from results
-            context_parts = []
-            sources = []
+            # 3. Route the message and build the prompt
+            route = self.router.classify(content) if settings.QUERY_ROUTING_ENABLED else LOOKUP
+            history = []
+            if route == FOLLOW_UP:
+                history = self._recent_history(db, session_id)
+                if not history:
+                    route = LOOKUP
+            QUERY_ROUTES.labels(route=route).inc()
             
-            # Helper to safely access result lists
-            docs = search_results.get("documents", [])
-            metas = search_results.get("metadatas", [])
-            
-            for i, doc_text in enumerate(docs):
-                meta = metas[i] if i < len(metas) else {}
-                filename = meta.get("filename", "Unknown")
-                context_parts.append(f"Source: {filename}\nContent: {doc_text}")
-                
-                # Add unique source to list
-                source_entry = {
-                    "doc_id": meta.get("doc_id"),
-                    "filename": filename,
-                    "chunk_index": meta.get("chunk_index"),
-                    "page_number": meta.get("page_number")
-                }
-                if source_entry not in sources:
-                    sources.append(source_entry)
-            
-            context_str = "\n\n".join(context_parts)
+            if route == SMALL_TALK:
+                sources = []
+                messages = [
+                    SystemMessage(content=self.small_talk_prompt),
+                    HumanMessage(content=content)
+                ]
+            elif route == FOLLOW_UP:
+                # Rework the previous answer; it keeps its sources
+                sources = history[-1].sources or []
+                messages = [SystemMessage(content=self.follow_up_prompt)]
+                for message in history:
+                    message_class = AIMessage if message.role == "assistant" else HumanMessage
+                    messages.append(message_class(content=message.content))
+                messages.append(HumanMessage(content=content))
+            else:
+                context_str, sources = self._retrieve_context(content, session)
+                messages = self.rag_messages(context_str, content)
             
             # 4. Generate response with LLM
-            # Fetch recent history (optional, for context)
-            # history = db.query(ChatMessage).filter(
-            #     ChatMessage.session_id == session_id
-            # ).order_by(ChatMessage.created_at.desc()).limit(10).all()
-            
-            messages = [
-                SystemMessage(content=self.system_prompt.format(context=context_str)),
-                HumanMessage(content=content)
-            ]
-            
-            response = self.llm.invoke(messages)
+            with timed("chat", "llm"):
+                response = await self.gateway.invoke(messages, user_id=user_id)
+            # The hedge or fallback model may have answered instead of LLM_MODEL
+            model_name = (getattr(response, "response_metadata", None) or {}).get("model_name")
+            record_token_usage(model_name or settings.LLM_MODEL, response)
             answer_text = response.content
             
-            # 5. Save assistant response
-            assistant_msg = ChatMessage(
-                session_id=session_id,
-                role="assistant",
-                content=answer_text,
-                sources=sources
-            )
-            db.add(assistant_msg)
-            
-            # Update session timestamp
-            session.title = content[:30] + "..." if session.title == "New Chat" else session.title
-            
-            db.commit()
-            db.refresh(assistant_msg)
-            
-            return assistant_msg
-            
+        except HTTPException:
+            # Rejected by admission control: nothing was stored, the client can resend the question
+            raise
         except Exception as e:
-            # Log error?
+            logger.exception("Error generating response for session %s", session_id)
             error_msg = f"Error generating response: {str(e)}"
             # Create an error message from assistant?
             assistant_msg = ChatMessage(
+                id=uuid.uuid4(),
                 session_id=session_id,
                 role="assistant",
                 content="I encountered an error while processing your request.",
-                sources=[{"error": str(e)}]
+                sources=[{"error": str(e)}],
+                created_at=utc_now()
             )
-            db.add(assistant_msg)
-            db.commit()
+            await self._save(session, [user_msg, assistant_msg])
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=error_msg
             )
+        
+        # 5. Save the question and the assistant response
+        assistant_msg = ChatMessage(
+            id=uuid.uuid4(),
+            session_id=session_id,
+            role="assistant",
+            content=answer_text,
+            sources=sources,
+            created_at=utc_now()
+        )
+        
+        # Update session title
+        session.title = content[:30] + "..." if session.title == "New Chat" else session.title
+        
+        with timed("chat", "db_save"):
+            await self._save(session, [user_msg, assistant_msg])
+        
+        return assistant_msg
+
+    async def _save(self, session: ChatSession, messages: List[ChatMessage]) -> None:
+        """Hand messages and the session's new values to the write-behind buffer"""
+        session.updated_at = utc_now()
+        # The journal write may fsync; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, message_buffer.add, messages, session)
@@ -0,0 +1,223 @@
+"""
+Shared connection to the ChromaDB server
+"""
+import chromadb
+import httpx
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
+from chromadb.config import Settings
+from fastapi import HTTPException, status
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from app.config import settings
+from app.utils.metrics import CHROMA_FAILURES, CHROMA_REQUEST_SECONDS, CHROMA_RETRIES
+from typing import Any, Callable, Dict, Optional, TypeVar
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Gateway errors from a proxy in front of ChromaDB or a restarting server
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether a vector database call failed for a reason worth retrying"""
+    if isinstance(error, httpx.TransportError):
+        return True  # connect errors, timeouts, dropped keep-alive connections
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUS_CODES
+    return False
+
+
+def raise_gateway_error(response: httpx.Response) -> None:
+    """
+    Response hook raising ``httpx.HTTPStatusError`` for gateway errors
+
+    chromadb turns every error response into a ChromaError or a plain
+    Exception carrying only the body, so retryable statuses are raised
+    here, before it sees them.
+    """
+    if response.status_code in RETRY_STATUS_CODES:
+        response.raise_for_status()
+
+
+def pooled_session(
+    headers: Optional[Any] = None,
+    verify: bool = True,
+    transport: Optional[httpx.BaseTransport] = None
+) -> httpx.Client:
+    """
+    HTTP session for the ChromaDB client: pooled keep-alive connections,
+    CHROMA_* timeouts and gateway errors raised for retries
+
+    Args:
+        headers: Default headers (e.g. auth) of the session it replaces
+        verify: TLS verification
+        transport: Custom transport (tests)
+
+    Returns:
+        httpx.Client
+    """
+    return httpx.Client(
+        headers=headers,
+        timeout=httpx.Timeout(settings.CHROMA_TIMEOUT, connect=settings.CHROMA_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.CHROMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.CHROMA_MAX_CONNECTIONS,
+            keepalive_expiry=settings.CHROMA_KEEPALIVE_SECONDS
+        ),
+        verify=verify,
+        transport=transport,
+        event_hooks={"response": [raise_gateway_error]}
+    )
+
+
+class ChromaConnection:
+    """
+    One ChromaDB client and its collection handles for the whole process.
+
+    ``chromadb.HttpClient`` validates the tenant and database on every
+    construction and ships an HTTP session without timeouts; every
+    ``VectorStore`` used to build its own and look its collection up
+    again. The shared connection builds the client once, on first use,
+    and swaps in a pooled keep-alive session with ``CHROMA_TIMEOUT`` /
+    ``CHROMA_CONNECT_TIMEOUT``, so queries reuse open connections and a
+    hung server fails fast instead of holding request threads.
+
+    ``call`` retries transient errors (connection errors, timeouts,
+    502/503/504) up to ``CHROMA_MAX_RETRIES`` times with jittered backoff,
+    then raises ``503``. Latency, retries and failures are recorded per
+    operation.
+
+    Args:
+        client: Existing client, e.g. an in-process one (defaults to the
+            HTTP server, or an in-memory client in load test mode)
+    """
+
+    def __init__(self, client: Optional[ClientAPI] = None):
+        self._client = client
+        self._collections: Dict[str, Collection] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> ClientAPI:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def collection(self, name: str) -> Collection:
+        """
+        Cached handle of a collection, created (cosine space) if it does not exist
+
+        Args:
+            name: Collection name
+
+        Returns:
+            Collection handle
+        """
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self.call(
+                "get_or_create_collection",
+                self.client.get_or_create_collection,
+                name=name,
+                metadata={"hnsw:space": "cosine"}
+            )
+            self._collections[name] = collection
+        return collection
+
+    def forget(self, name: str) -> None:
+        """Drop the cached handle of a collection, e.g. after it was deleted"""
+        self._collections.pop(name, None)
+
+    def call(self, operation: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a vector database call with retries and metrics
+
+        Args:
+            operation: Label for metrics and logs (e.g. "query")
+            fn: Client or collection method
+            *args, **kwargs: Passed to fn
+
+        Returns:
+            Whatever fn returns
+
+        Raises:
+            HTTPException: 503 when the server stays unreachable
+        """
+        def before_sleep(retry_state: Any) -> None:
+            CHROMA_RETRIES.labels(operation=operation).inc()
+            logger.warning(
+                "ChromaDB %s failed (attempt %d): %s",
+                operation, retry_state.attempt_number, retry_state.outcome.exception()
+            )
+
+        started = time.perf_counter()
+        try:
+            for attempt in Retrying(
+                retry=retry_if_exception(is_transient_error),
+                wait=wait_random_exponential(multiplier=0.2, max=2),
+                stop=stop_after_attempt(settings.CHROMA_MAX_RETRIES + 1),
+                before_sleep=before_sleep,
+                reraise=True
+            ):
+                with attempt:
+                    return fn(*args, **kwargs)
+        except Exception as e:
+            CHROMA_FAILURES.labels(operation=operation).inc()
+            if not is_transient_error(e):
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The vector database is unavailable, please try again shortly",
+                headers={"Retry-After": "5"}
+            )
+        finally:
+            CHROMA_REQUEST_SECONDS.labels(operation=operation).observe(time.perf_counter() - started)
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Heartbeat the server once, without retries
+
+        Returns:
+            Dict with status ("up" or "down"), latency_ms and, when down, error
+        """
+        started = time.perf_counter()
+        try:
+            self.client.heartbeat()
+        except Exception as e:
+            return {"status": "down", "error": str(e) or type(e).__name__}
+        finally:
+            CHROMA_REQUEST_SECONDS.labels(operation="heartbeat").observe(time.perf_counter() - started)
+        return {"status": "up", "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    @staticmethod
+    def _create_client() -> ClientAPI:
+        if settings.LOAD_TEST_MODE:
+            # In-memory and per process: every store in this process shares it
+            return chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+
+        client = chromadb.HttpClient(
+            host=settings.CHROMA_HOST,
+            port=settings.CHROMA_PORT,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # chromadb has no option for these; replace its session, keeping its headers (auth)
+        server = client._server
+        previous = server._session
+        server._session = pooled_session(
+            headers=previous.headers,
+            verify=server._settings.chroma_server_ssl_verify
+            if server._settings.chroma_server_ssl_verify is not None else True
+        )
+        previous.close()
+        return client
+
+
+# Shared by every service in this process
+chroma_connection = ChromaConnection()
@@ -0,0 +1,301 @@
+"""
+Background purging of deleted documents
+"""
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, advisory_lock
+from app.models.document import Document
+from app.models.index_version import IndexVersion
+from app.models.ingestion_job import IngestionJob
+from app.services.vector_store import VectorStore
+from app.services.index_registry import index_registry
+from app.services.session_cache import session_retrieval_cache
+from app.utils.parent_store import parent_store
+from app.utils.chunk_store import chunk_store
+from app.utils.file_storage import file_storage
+from app.utils.metrics import DOCUMENTS_PURGED, DOCUMENT_PURGE_FAILURES
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+from uuid import UUID
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between retries while ChromaDB or the database is unavailable
+MAX_RETRY_DELAY = 60.0
+
+
+class DocumentPurger:
+    """
+    Removes deleted documents off the request path.
+
+    Deleting a document only sets ``documents.deleted_at``. From then on
+    the document is a tombstone: it is left out of listings, and
+    ``search_filter`` / ``visible`` keep its chunks out of retrieval. A
+    background thread purges tombstones every ``DOCUMENT_PURGE_INTERVAL``
+    seconds, ``DOCUMENT_PURGE_BATCH_SIZE`` documents at a time: their
+    chunks are deleted from the active and building collections with one
+    metadata-matched delete per batch, then their chunk texts, parent
+    sections, files and rows. Documents with a queued or running
+    ingestion job wait until it finishes, so a job cannot add chunks
+    after its document was purged.
+
+    Tombstones live in the database, so documents a process did not get
+    to are purged by whichever worker runs next. Every step is
+    idempotent; on PostgreSQL a batch is also locked with SKIP LOCKED so
+    workers do not purge the same documents at once.
+
+    Workers re-read the tombstoned IDs every ``TOMBSTONE_REFRESH_SECONDS``;
+    the worker that deleted a document hides it immediately. Working-set
+    hits are checked against the document rows, so a worker that missed
+    the tombstone before the purge still stops serving the document. When the
+    purger is not running (CLI tools), ``mark_deleted`` purges
+    synchronously.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        vector_store_factory: Optional[Callable[[str], VectorStore]] = None
+    ):
+        self.session_factory = session_factory
+        self.interval = settings.DOCUMENT_PURGE_INTERVAL if interval is None else interval
+        self.batch_size = settings.DOCUMENT_PURGE_BATCH_SIZE if batch_size is None else batch_size
+        self.vector_store_factory = vector_store_factory or (
+            lambda collection_name: VectorStore(collection_name=collection_name)
+        )
+
+        self._lock = threading.Lock()
+        self._purge_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._stores: Dict[str, VectorStore] = {}
+        self._tombstones: FrozenSet[str] = frozenset()
+        self._checked_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background purge thread"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="document-purger", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the background purge thread; remaining tombstones are purged on the next start"""
+        if not self.running:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def mark_deleted(self, doc_ids: Iterable[UUID]) -> None:
+        """
+        Hide documents whose tombstones were just committed and schedule their purge
+
+        Args:
+            doc_ids: Document UUIDs with ``deleted_at`` set
+        """
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        if not doc_ids:
+            return
+
+        with self._lock:
+            self._tombstones = self._tombstones | frozenset(doc_ids)
+        for doc_id in doc_ids:
+            session_retrieval_cache.evict_document(doc_id)
+
+        if self.running:
+            self._wake.set()
+        else:
+            while self.purge() == self.batch_size:
+                pass
+
+    def tombstones(self) -> FrozenSet[str]:
+        """IDs (as strings) of documents that are deleted but may still have chunks"""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at > settings.TOMBSTONE_REFRESH_SECONDS:
+                db = self.session_factory()
+                try:
+                    rows = db.query(Document.id).filter(Document.deleted_at.isnot(None)).all()
+                finally:
+                    db.close()
+                self._tombstones = frozenset(str(doc_id) for (doc_id,) in rows)
+                self._checked_at = now
+            return self._tombstones
+
+    def search_filter(self) -> Optional[Dict[str, Any]]:
+        """
+        Vector store ``where`` filter that excludes tombstoned documents
+
+        Returns:
+            Filter dict, or None when nothing is waiting to be purged
+        """
+        tombstones = self.tombstones()
+        if not tombstones:
+            return None
+        return {"doc_id": {"$nin": sorted(tombstones)}}
+
+    def visible(self, search_results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Drop chunks of tombstoned documents from search results
+
+        For results that did not come from a filtered vector store query,
+        e.g. a session's working set. Tombstones alone are not enough for
+        those: a worker that missed a document's tombstone before it was
+        purged would keep serving it from memory, so the documents are
+        also checked against their rows, and purged ones are evicted from
+        this process's working sets.
+
+        Args:
+            search_results: Results shaped like VectorStore.search output
+
+        Returns:
+            The same results without chunks of deleted documents
+        """
+        metadatas = search_results.get("metadatas", [])
+        doc_ids = {meta.get("doc_id") for meta in metadatas}
+        live = self.live_documents(doc_ids - self.tombstones())
+        keep = [i for i, meta in enumerate(metadatas) if meta.get("doc_id") in live]
+        if len(keep) == len(metadatas):
+            return search_results
+        for doc_id in doc_ids - live:
+            session_retrieval_cache.evict_document(doc_id)
+        return {key: [values[i] for i in keep] for key, values in search_results.items()}
+
+    def live_documents(self, doc_ids: Set[str]) -> Set[str]:
+        """
+        Which of some documents still exist and are not deleted
+
+        Args:
+            doc_ids: Document IDs as strings
+
+        Returns:
+            The IDs (as strings) of those that are live
+        """
+        doc_ids = {doc_id for doc_id in doc_ids if doc_id}
+        if not doc_ids:
+            return set()
+        db = self.session_factory()
+        try:
+            rows = db.query(Document.id).filter(
+                Document.id.in_([UUID(doc_id) for doc_id in doc_ids]),
+                Document.deleted_at.is_(None)
+            ).all()
+        finally:
+            db.close()
+        return {str(doc_id) for (doc_id,) in rows}
+
+    def purge(self) -> int:
+        """
+        Purge one batch of tombstoned documents
+
+        Returns:
+            int: Number of documents purged
+        """
+        with self._purge_lock:
+            db = self.session_factory()
+            try:
+                stores = self._serving_stores(db)
+                documents = db.query(Document).filter(
+                    Document.deleted_at.isnot(None),
+                    ~exists().where(
+                        IngestionJob.document_id == Document.id,
+                        IngestionJob.status.in_(["queued", "running"])
+                    )
+                ).order_by(Document.deleted_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+                if not documents:
+                    db.rollback()
+                    return 0
+
+                doc_ids = [document.id for document in documents]
+                for store in stores:
+                    store.delete_documents(doc_ids, self.batch_size)
+                parent_store.delete(doc_ids)
+                chunk_store.delete(doc_ids)
+
+                paths = {document.file_path for document in documents}
+                db.query(Document).filter(Document.id.in_(doc_ids)).delete(synchronize_session=False)
+                self._remove_files(db, paths)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        with self._lock:
+            self._tombstones = self._tombstones - {str(doc_id) for doc_id in doc_ids}
+        for doc_id in doc_ids:
+            session_retrieval_cache.evict_document(doc_id)
+        DOCUMENTS_PURGED.inc(len(doc_ids))
+        logger.info("Purged %d deleted documents", len(doc_ids))
+        return len(doc_ids)
+
+    def _run(self) -> None:
+        delay = self.interval
+        while not self._stop.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                while self.purge() == self.batch_size and not self._stop.is_set():
+                    pass
+                delay = self.interval
+            except Exception:
+                DOCUMENT_PURGE_FAILURES.inc()
+                logger.exception("Purging deleted documents failed; will retry")
+                delay = min(max(delay, 1.0) * 2, MAX_RETRY_DELAY)
+
+    def _serving_stores(self, db: Session) -> List[VectorStore]:
+        """Stores for the active collection and any collection being built"""
+        names = [index_registry.get_active(db).collection_name]
+        names += [
+            name for (name,) in db.query(IndexVersion.collection_name).filter(
+                IndexVersion.status == "building"
+            ).all()
+        ]
+        stores = []
+        for name in names:
+            if name not in self._stores:
+                self._stores[name] = self.vector_store_factory(name)
+            stores.append(self._stores[name])
+        return stores
+
+    @staticmethod
+    def _remove_files(db: Session, paths: Set[str]) -> None:
+        """
+        Delete stored originals, except those a live document shares (same content)
+
+        Each original is checked under its storage lock, which an upload
+        of the same content holds from storing it until its row is
+        committed. A busy lock means such an upload is in flight and will
+        use the original, so it is kept; not waiting also means the purge
+        cannot deadlock with a bulk ingest holding several locks.
+        """
+        for path in paths:
+            if not advisory_lock(db, path, wait=False):
+                continue
+            in_use = db.query(Document.id).filter(
+                Document.file_path == path,
+                Document.deleted_at.is_(None)
+            ).first() is not None
+            if not in_use:
+                file_storage.delete(path)
+
+
+# Shared by every service in this process
+document_purger = DocumentPurger()
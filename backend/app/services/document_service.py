@@ -2,32 +2,111 @@
 Document processing service
 """
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
 from fastapi import UploadFile, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from app.database import advisory_lock
 from app.models.document import Document
+from app.models.ingestion_job import IngestionJob
 from app.models.user import User
 from app.utils.parsers import DocumentParser
+from app.utils.uploads import stream_to_disk, UploadTooLarge, UnexpectedFileType
+from app.utils.file_storage import file_storage
+from app.utils.ocr import page_ocr
+from app.utils.artifacts import ArtifactCache
+from app.utils.chunking import CHUNKER_VERSION, TokenChunker, load_tokenizer
+from app.utils.parent_store import parent_store
+from app.utils.chunk_store import chunk_store
+from app.utils.metrics import timed, record_cache, INGESTED_CHUNKS
 from app.utils.embeddings import GeminiEmbeddings
 from app.services.vector_store import VectorStore
+from app.services.index_registry import index_registry
+from app.services.session_cache import session_retrieval_cache
+from app.services.document_purger import document_purger
+from app.services.ingestion_queue import ingestion_queue
 from app.config import settings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
+from bisect import bisect_right
+import logging
 import os
-import shutil
+
+logger = logging.getLogger(__name__)
 
 
 class DocumentService:
     """Service for document processing"""
     
-    def __init__(self):
-        self.embeddings = GeminiEmbeddings()
-        self.vector_store = VectorStore()
+    SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.doc']
+    
+    def __init__(
+        self,
+        embeddings: Optional[GeminiEmbeddings] = None,
+        vector_store: Optional[VectorStore] = None
+    ):
+        self.embeddings = embeddings or GeminiEmbeddings()
+        self.vector_store = vector_store or VectorStore()
+        # Stores of collections being built, see mirror_chunks
+        self._mirror_stores: Dict[str, VectorStore] = {}
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.CHUNK_SIZE,
             chunk_overlap=settings.CHUNK_OVERLAP,
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        # Larger sections the children are cut from; matched children are
+        # expanded to their section when the prompt is built
+        self.section_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.PARENT_CHUNK_SIZE,
+            chunk_overlap=0,
+            length_function=len,
+            separators=["\n\n", "\n", " ", ""]
+        ) if settings.PARENT_CHUNK_SIZE > 0 else None
+        self.artifacts = ArtifactCache()
+        # Parsed pages depend on the OCR configuration when OCR is in use
+        self.parser_key = (
+            f"{DocumentParser.PARSER_VERSION}-ocr{page_ocr.key}"
+            if page_ocr.enabled else DocumentParser.PARSER_VERSION
+        )
+        self.tokenizer_name = settings.CHUNK_TOKENIZER or self.embeddings.model_name
+        self.token_chunker = self._load_token_chunker() if settings.CHUNK_UNIT == "tokens" else None
+        # Identifies everything that shapes the chunk list, so changing any
+        # of these settings invalidates cached chunks but not parsed pages
+        if self.token_chunker is not None:
+            self.chunker_key = ArtifactCache.make_key(
+                parser_version=self.parser_key,
+                splitter="tokens",
+                chunker_version=CHUNKER_VERSION,
+                tokenizer=self.tokenizer_name,
+                chunk_tokens=self.token_chunker.chunk_tokens,
+                chunk_overlap=self.token_chunker.overlap_tokens,
+                parent_chunk_tokens=self.token_chunker.section_tokens
+            )
+        else:
+            self.chunker_key = ArtifactCache.make_key(
+                parser_version=self.parser_key,
+                splitter="recursive_character",
+                chunk_size=settings.CHUNK_SIZE,
+                chunk_overlap=settings.CHUNK_OVERLAP,
+                parent_chunk_size=settings.PARENT_CHUNK_SIZE
+            )
+    
+    def _load_token_chunker(self) -> Optional[TokenChunker]:
+        """Token chunker for the embedding model, or None (with a warning) when its tokenizer is unavailable"""
+        model = getattr(self.embeddings, "client", None)
+        try:
+            tokenizer = load_tokenizer(self.tokenizer_name, model)
+        except Exception as e:
+            logger.warning("Tokenizer %s unavailable, chunking by characters: %s", self.tokenizer_name, e)
+            return None
+        return TokenChunker(
+            tokenizer,
+            chunk_tokens=settings.CHUNK_TOKENS,
+            overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+            section_tokens=settings.PARENT_CHUNK_TOKENS,
+            max_tokens=getattr(model, "max_seq_length", None)
+        )
     
     async def upload_document(
         self,
@@ -48,35 +127,56 @@ class DocumentService:
         """
         # Validate file type
         file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in ['.pdf', '.docx', '.doc']:
+        if file_ext not in self.SUPPORTED_EXTENSIONS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Unsupported file type: {file_ext}"
             )
         
-        # Validate file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
+        # Reject early when the spooled size is already known to be too large
+        if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE} bytes"
+            )
         
-        if file_size > settings.MAX_UPLOAD_SIZE:
+        # Stream to staging, enforcing size and type on the same pass
+        filename = os.path.basename(file.filename)
+        file_type = file_ext.replace('.', '')
+        staging_path = file_storage.staging_path(file_type)
+        try:
+            stored = await run_in_threadpool(
+                stream_to_disk,
+                file.file,
+                staging_path,
+                settings.MAX_UPLOAD_SIZE,
+                file_type,
+                settings.UPLOAD_CHUNK_SIZE
+            )
+        except UploadTooLarge as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+        except UnexpectedFileType as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE} bytes"
+                detail=str(e)
             )
         
-        # Save file
-        file_path = os.path.join(settings.UPLOAD_DIR, f"{user.id}_{file.filename}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Identical files share one stored original; the lock keeps the
+        # purger from removing it before the row below is committed
+        advisory_lock(db, file_storage.uri(stored.sha256, file_type))
+        file_path = await run_in_threadpool(file_storage.save, staging_path, stored.sha256, file_type)
         
         # Create document record
         document = Document(
             user_id=user.id,
-            filename=file.filename,
-            file_type=file_ext.replace('.', ''),
+            filename=filename,
+            file_type=file_type,
             file_path=file_path,
-            file_size=file_size,
+            file_size=stored.size,
+            content_hash=stored.sha256,
             processed=False
         )
         
@@ -84,6 +184,12 @@ class DocumentService:
         db.commit()
         db.refresh(document)
         
+        # An ingestion worker picks it up; the client polls the document
+        if settings.INGEST_QUEUE_ENABLED:
+            ingestion_queue.enqueue(db, [document.id])
+            db.refresh(document)
+            return document
+        
         # Process document asynchronously (in background)
         try:
             await self.process_document(db, document)
@@ -107,49 +213,67 @@ class DocumentService:
             document: Document object
         """
         try:
-            # Extract text
-            text, page_count = DocumentParser.parse_document(
+            # Backfill the hash for documents uploaded before it was recorded
+            if not document.content_hash:
+                document.content_hash = await run_in_threadpool(file_storage.sha256, document.file_path)
+            
+            # Extract text and split into chunks (served from cache on retries);
+            # off the event loop, since parsing and OCR can take minutes
+            chunks, locations = await run_in_threadpool(
+                self.chunk_document,
+                document.id,
                 document.file_path,
-                document.file_type
+                document.file_type,
+                document.content_hash
             )
             
-            if not text.strip():
-                raise Exception("No text extracted from document")
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            if not chunks:
-                raise Exception("No chunks created from document")
-            
-            # Generate embeddings
-            embeddings = self.embeddings.embed_batch(chunks)
+            # Generate embeddings with the model of the active index
+            embedder = index_registry.bind(self.vector_store, self.embeddings)
+            with timed("ingest", "embed"):
+                embeddings = embedder.embed_batch(chunks)
             
             # Prepare metadata
-            metadatas = [
-                {
-                    "doc_id": str(document.id),
-                    "filename": document.filename,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "user_id": str(document.user_id)
-                }
-                for i in range(len(chunks))
-            ]
+            metadatas = self.build_metadatas(
+                document.id,
+                document.filename,
+                document.user_id,
+                len(chunks),
+                self.chunker_key,
+                locations
+            )
             
             # Store in vector database
-            self.vector_store.add_documents(
-                doc_id=document.id,
-                chunks=chunks,
-                embeddings=embeddings,
-                metadatas=metadatas
-            )
+            with timed("ingest", "vector_add"):
+                self.vector_store.add_documents(
+                    doc_id=document.id,
+                    chunks=chunks,
+                    embeddings=embeddings,
+                    metadatas=metadatas
+                )
+                # And into any index being built, so the re-index does not miss it
+                self.mirror_chunks(
+                    [f"{document.id}_{i}" for i in range(len(chunks))],
+                    chunks,
+                    embeddings,
+                    metadatas,
+                    embedder.model_name
+                )
+            INGESTED_CHUNKS.inc(len(chunks))
             
             # Update document status
             document.processed = True
             document.chunk_count = len(chunks)
             document.error_message = None
-            db.commit()
+            doc_id = document.id
+            with timed("ingest", "db_commit"):
+                try:
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    if not self._document_exists(db, doc_id):
+                        # Deleted and purged while processing: take back the chunks just added
+                        self.clear_index(doc_id)
+                    raise
             
         except Exception as e:
             document.processed = False
@@ -157,15 +281,234 @@ class DocumentService:
             db.commit()
             raise
     
+    @staticmethod
+    def _document_exists(db: Session, doc_id: UUID) -> bool:
+        """Whether a document row is still there and not deleted"""
+        return db.query(Document.id).filter(
+            Document.id == doc_id,
+            Document.deleted_at.is_(None)
+        ).first() is not None
+    
+    def chunk_file(
+        self,
+        file_path: str,
+        file_type: str,
+        content_hash: Optional[str] = None
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Extract text from a stored file and split it into chunks.
+        
+        Parsed pages and chunk lists are cached on disk by content hash, so
+        retries and re-chunking skip the parser. Touches neither the
+        database nor the vector store, so it is safe to run in a worker
+        thread.
+        
+        Args:
+            file_path: Storage URI (or legacy path) of the stored file
+            file_type: File extension without the dot ('pdf', 'docx')
+            content_hash: SHA-256 of the file (computed if omitted)
+            
+        Returns:
+            Tuple of (child chunk texts, parent sections, location of each
+            chunk: its 'page_number' or heading path 'section')
+        """
+        if content_hash is None:
+            content_hash = file_storage.sha256(file_path)
+        
+        cached = self.artifacts.load_chunks(content_hash, self.chunker_key)
+        record_cache("artifact_chunks", cached is not None)
+        if cached is not None:
+            return cached
+        
+        pages, page_count, complete = self.parse_pages(file_path, file_type, content_hash)
+        text, page_locations = DocumentParser.join_pages_located(pages)
+        
+        if not text.strip():
+            raise Exception("No text extracted from document")
+        
+        with timed("ingest", "split"):
+            chunks, sections = self.split_text(text)
+        
+        if not chunks:
+            raise Exception("No chunks created from document")
+        
+        locations = self.locate_chunks(text, chunks, page_locations)
+        if complete:
+            self.artifacts.save_chunks(content_hash, self.chunker_key, chunks, sections, locations)
+        return chunks, sections, locations
+    
+    @staticmethod
+    def locate_chunks(
+        text: str,
+        chunks: List[str],
+        page_locations: List[Tuple[int, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Location of each chunk: that of the page or Word section it starts in
+        
+        Chunks are slices of the text in document order, so each is looked
+        up from where the previous one started.
+        
+        Args:
+            text: Document text the chunks were split from
+            chunks: Chunk texts in document order
+            page_locations: (offset, location) pairs from DocumentParser.join_pages_located
+            
+        Returns:
+            Location dict of each chunk (empty when unknown)
+        """
+        starts = [offset for offset, _ in page_locations]
+        locations = []
+        position = 0
+        for chunk in chunks:
+            index = text.find(chunk, position)
+            if index < 0:
+                locations.append({})
+                continue
+            position = index + 1
+            page = bisect_right(starts, index) - 1
+            locations.append(dict(page_locations[page][1]) if page >= 0 else {})
+        return locations
+    
+    def split_text(self, text: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Split text into parent sections and each section into child chunks
+        
+        Args:
+            text: Document text
+            
+        Returns:
+            Tuple of (child chunk texts in document order, sections with
+            the range of child indexes [start, end) and text of each);
+            no sections when PARENT_CHUNK_TOKENS / PARENT_CHUNK_SIZE is 0
+        """
+        if self.token_chunker is not None:
+            return self.token_chunker.split(text)
+        if self.section_splitter is None:
+            return self.text_splitter.split_text(text), []
+        
+        chunks, sections = [], []
+        for section in self.section_splitter.split_text(text):
+            children = self.text_splitter.split_text(section)
+            if not children:
+                continue
+            sections.append({"start": len(chunks), "end": len(chunks) + len(children), "text": section})
+            chunks.extend(children)
+        return chunks, sections
+    
+    def chunk_document(
+        self,
+        doc_id: UUID,
+        file_path: str,
+        file_type: str,
+        content_hash: Optional[str] = None
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Chunk a document's file and store its chunk texts and parent sections
+        
+        Chunk texts go to the local chunk store instead of the vector
+        store. Safe to run in a worker thread, like chunk_file.
+        
+        Args:
+            doc_id: Document UUID
+            file_path: Storage URI (or legacy path) of the stored file
+            file_type: File extension without the dot
+            content_hash: SHA-256 of the file (computed if omitted)
+            
+        Returns:
+            Tuple of (child chunk texts to embed, location of each chunk)
+        """
+        chunks, sections, locations = self.chunk_file(file_path, file_type, content_hash)
+        chunk_store.put(doc_id, self.chunker_key, chunks)
+        if sections:
+            parent_store.put(doc_id, self.chunker_key, sections)
+        return chunks, locations
+    
+    def parse_pages(
+        self,
+        file_path: str,
+        file_type: str,
+        content_hash: str
+    ) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """
+        Parse a file into pages, reusing the cached parse when available
+        
+        PDF pages with little or no text layer are OCR'd when OCR is
+        enabled. A parse whose OCR ran out of time is returned but not
+        cached, so the next attempt OCRs the remaining pages.
+        
+        Args:
+            file_path: Storage URI (or legacy path) of the stored file
+            file_type: File extension without the dot
+            content_hash: SHA-256 of the file
+            
+        Returns:
+            Tuple of (pages, page_or_paragraph_count, whether the parse is complete)
+        """
+        cached = self.artifacts.load_pages(content_hash, self.parser_key)
+        record_cache("artifact_pages", cached is not None)
+        if cached is not None:
+            return cached[0], cached[1], True
+        
+        complete = True
+        with file_storage.local_copy(file_path) as local_path:
+            with timed("ingest", "parse"):
+                pages, page_count = DocumentParser.parse_document_pages(local_path, file_type)
+            if file_type == "pdf" and page_ocr.enabled:
+                with timed("ingest", "ocr"):
+                    pages, complete = page_ocr.recognize(local_path, pages, page_count)
+        if complete:
+            self.artifacts.save_pages(content_hash, self.parser_key, pages, page_count)
+        return pages, page_count, complete
+    
+    @staticmethod
+    def build_metadatas(
+        doc_id: UUID,
+        filename: str,
+        user_id: UUID,
+        chunk_count: int,
+        chunker_key: Optional[str] = None,
+        locations: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build the vector store metadata for each chunk of a document
+        
+        The chunker key lets retrieval find the chunk's text in the chunk
+        store and its parent section; chunks without one keep their text
+        in the vector store and are sent to the LLM as they are. Locations
+        add the chunk's 'page_number' (PDF) or heading path 'section' (Word).
+        """
+        metadatas = [
+            {
+                "doc_id": str(doc_id),
+                "filename": filename,
+                "chunk_index": i,
+                "total_chunks": chunk_count,
+                "user_id": str(user_id)
+            }
+            for i in range(chunk_count)
+        ]
+        if chunker_key:
+            for metadata in metadatas:
+                metadata["chunker"] = chunker_key
+        if locations:
+            for metadata, location in zip(metadatas, locations):
+                metadata.update(location)
+        return metadatas
+    
     def get_user_documents(self, db: Session, user_id: UUID) -> List[Document]:
         """Get all documents for a user"""
-        return db.query(Document).filter(Document.user_id == user_id).all()
+        return db.query(Document).filter(
+            Document.user_id == user_id,
+            Document.deleted_at.is_(None)
+        ).all()
     
     def get_document_by_id(self, db: Session, doc_id: UUID, user_id: UUID) -> Document:
         """Get document by ID (with user validation)"""
         document = db.query(Document).filter(
             Document.id == doc_id,
-            Document.user_id == user_id
+            Document.user_id == user_id,
+            Document.deleted_at.is_(None)
         ).first()
         
         if not document:
@@ -176,20 +519,159 @@ class DocumentService:
         
         return document
     
-    def delete_document(self, db: Session, doc_id: UUID, user_id: UUID) -> None:
-        """Delete document and its vectors"""
+    async def reprocess_document(self, db: Session, doc_id: UUID, user_id: UUID) -> Document:
+        """
+        Re-run chunking and embedding for an existing document
+        
+        Used to retry failed documents and to apply new chunking or
+        embedding settings; cached artifacts mean the file is not re-parsed.
+        
+        Args:
+            db: Database session
+            doc_id: Document UUID
+            user_id: Owner UUID
+            
+        Returns:
+            Document: Updated document object
+        """
         document = self.get_document_by_id(db, doc_id, user_id)
         
-        # Delete from vector store
+        if settings.INGEST_QUEUE_ENABLED:
+            ingestion_queue.enqueue(db, [doc_id], kind="reprocess")
+            db.refresh(document)
+            return document
+        
         try:
-            self.vector_store.delete_document(doc_id)
+            self.clear_index(doc_id)
+            await self.process_document(db, document)
         except Exception as e:
-            print(f"Error deleting from vector store: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error processing document: {str(e)}"
+            )
         
-        # Delete file
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        return document
+    
+    async def process_job(self, db: Session, job: IngestionJob) -> None:
+        """
+        Run a claimed ingestion job (in an ingestion worker)
         
-        # Delete from database
-        db.delete(document)
+        Args:
+            db: Database session
+            job: Job in 'running' status
+        """
+        document = db.query(Document).filter(
+            Document.id == job.document_id,
+            Document.deleted_at.is_(None)
+        ).first()
+        if document is None:
+            ingestion_queue.complete(db, job)  # deleted while it was queued
+            return
+        
+        try:
+            if job.kind == "reprocess":
+                self.clear_index(document.id)
+            await self.process_document(db, document)
+        except Exception as e:
+            logger.warning("Ingestion job %s for %s failed: %s", job.id, document.id, e)
+            ingestion_queue.fail(db, job, str(e))
+            return
+        ingestion_queue.complete(db, job)
+    
+    def index_mirrors(self) -> List[Tuple[VectorStore, str]]:
+        """
+        Stores of the other collections writes must reach (see
+        IndexRegistry.write_targets), with the embedding model of each
+        """
+        mirrors = []
+        for collection_name, model_name in index_registry.write_targets(self.vector_store.collection_name):
+            store = self._mirror_stores.get(collection_name)
+            if store is None:
+                store = VectorStore(collection_name=collection_name, client=self.vector_store.client)
+                self._mirror_stores[collection_name] = store
+            mirrors.append((store, model_name))
+        return mirrors
+    
+    def mirror_chunks(
+        self,
+        ids: List[str],
+        chunks: List[str],
+        embeddings: Any,
+        metadatas: List[Dict[str, Any]],
+        bound_model: str
+    ) -> None:
+        """
+        Write chunks just added to the bound collection to the other
+        collections too, re-embedding them for versions built with
+        another model
+        
+        Args:
+            ids, chunks, metadatas: As passed to VectorStore.add_chunks
+            embeddings: Vectors from the bound model
+            bound_model: Model the vectors came from
+        """
+        for store, model_name in self.index_mirrors():
+            if model_name != bound_model:
+                vectors = index_registry.embedder(model_name, self.embeddings).embed_batch(chunks)
+            else:
+                vectors = embeddings
+            store.add_chunks(ids, chunks, vectors, metadatas)
+    
+    def clear_index(self, doc_id: UUID) -> None:
+        """Remove a document's chunks, texts and sections before it is processed again"""
+        index_registry.bind(self.vector_store, self.embeddings)
+        self.vector_store.delete_document(doc_id)
+        for store, _ in self.index_mirrors():
+            store.delete_document(doc_id)
+        parent_store.delete([doc_id])
+        chunk_store.delete([doc_id])
+        session_retrieval_cache.evict_document(doc_id)
+    
+    def delete_document(self, db: Session, doc_id: UUID, user_id: UUID) -> None:
+        """
+        Delete a document
+        
+        The document disappears from listings and retrieval at once; its
+        vectors, file and row are purged in the background.
+        """
+        self.get_document_by_id(db, doc_id, user_id)
+        self.delete_documents(db, user_id, [doc_id])
+    
+    def delete_documents(
+        self,
+        db: Session,
+        user_id: UUID,
+        doc_ids: Optional[List[UUID]] = None
+    ) -> int:
+        """
+        Delete many documents of a user, or all of them, with one UPDATE
+        
+        Args:
+            db: Database session
+            user_id: Owner UUID
+            doc_ids: Documents to delete (None deletes every document of the user);
+                IDs that are unknown or belong to someone else are ignored
+            
+        Returns:
+            int: Number of documents deleted
+        """
+        query = db.query(Document.id).filter(
+            Document.user_id == user_id,
+            Document.deleted_at.is_(None)
+        )
+        if doc_ids is not None:
+            if not doc_ids:
+                return 0
+            query = query.filter(Document.id.in_(doc_ids))
+        deleted_ids = [doc_id for (doc_id,) in query.all()]
+        if not deleted_ids:
+            return 0
+        
+        db.query(Document).filter(
+            Document.id.in_(deleted_ids),
+            Document.deleted_at.is_(None)
+        ).update({"deleted_at": func.now()}, synchronize_session=False)
         db.commit()
+        
+        document_purger.mark_deleted(deleted_ids)
+        return len(deleted_ids)
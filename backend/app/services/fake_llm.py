@@ -0,0 +1,112 @@
+"""
+Local stand-in for the Groq chat model, used in load-test mode
+"""
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+import asyncio
+import re
+import time
+
+SOURCE_PATTERN = re.compile(r"Source: (.+)")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers without calling a provider.
+
+    Responses take ``latency`` seconds to the first token and then
+    stream ``output_tokens`` tokens at ``tokens_per_second``, so the
+    request timing is close to a hosted model's without the cost or the
+    rate limits.
+    """
+
+    latency: float = 0.3
+    tokens_per_second: float = 80.0
+    output_tokens: int = 150
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        """Build the answer tokens, citing the first source in the prompt"""
+        prompt = "\n".join(str(m.content) for m in messages)
+        match = SOURCE_PATTERN.search(prompt)
+        source = match.group(1).strip() if match else "the provided documents"
+        words = f"According to {source}, the procedure is described in the retrieved context.".split()
+        return [
+            (" " if i else "") + words[i % len(words)]
+            for i in range(max(1, self.output_tokens))
+        ]
+
+    def _usage(self, messages: List[BaseMessage], completion_tokens: int) -> dict:
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        return {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + len(tokens) * self._token_delay())
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + len(tokens) * self._token_delay())
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency)
+        for i, token in enumerate(tokens):
+            time.sleep(self._token_delay())
+            usage = self._usage(messages, len(tokens)) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self._token_delay())
+            usage = self._usage(messages, len(tokens)) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,197 @@
+"""
+Registry of vector index versions
+"""
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.database import SessionLocal
+from app.models.index_version import IndexVersion
+from app.services.vector_store import VectorStore
+from app.utils.embeddings import GeminiEmbeddings
+from app.config import settings
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IndexRegistry:
+    """
+    Knows which collection and embedding model currently serve queries.
+
+    Exactly one ``IndexVersion`` row is ``active`` at a time. Services call
+    ``bind`` before embedding or searching so they always pair the active
+    collection with the model its vectors came from. The active pair and
+    the versions being built are re-read from the database together every
+    ``INDEX_REFRESH_SECONDS``, so a cutover performed by the re-index job
+    reaches every worker process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Optional[Tuple[str, str]] = None
+        self._versions: List[Tuple[str, str]] = []
+        self._checked_at = 0.0
+        self._warned = False
+        # One embedder per model, shared by the services of this process
+        self._embedders: Dict[str, Any] = {}
+
+    def get_active(self, db: Session) -> IndexVersion:
+        """
+        Get the active index version, registering the original collection
+        on first use
+
+        Args:
+            db: Database session
+
+        Returns:
+            IndexVersion: Active version
+        """
+        active = db.query(IndexVersion).filter(IndexVersion.status == "active").first()
+        if active is not None:
+            return active
+
+        active = IndexVersion(
+            collection_name=VectorStore.DEFAULT_COLLECTION,
+            embedding_model=settings.EMBEDDING_MODEL,
+            status="active",
+            activated_at=func.now()
+        )
+        db.add(active)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker registered it first
+            db.rollback()
+            return db.query(IndexVersion).filter(IndexVersion.status == "active").one()
+        db.refresh(active)
+        return active
+
+    def active(self) -> Tuple[str, str]:
+        """
+        Get the (collection_name, embedding_model) pair serving queries
+
+        Returns:
+            Tuple of collection name and embedding model name
+        """
+        with self._lock:
+            self._refresh()
+            return self._active
+
+    def _refresh(self) -> None:
+        """Re-read the active and building versions once the cached ones are stale (lock held)"""
+        now = time.monotonic()
+        if self._active is not None and now - self._checked_at <= settings.INDEX_REFRESH_SECONDS:
+            return
+
+        db = SessionLocal()
+        try:
+            version = self.get_active(db)
+            self._active = (version.collection_name, version.embedding_model)
+            # Read with the active pair, so a worker that has not seen a
+            # cutover yet still finds the new version among the building ones
+            rows = db.query(IndexVersion.collection_name, IndexVersion.embedding_model).filter(
+                IndexVersion.status.in_(["active", "building"])
+            ).all()
+            self._versions = [(name, model) for name, model in rows]
+        finally:
+            db.close()
+        self._checked_at = now
+
+        if self._active[1] != settings.EMBEDDING_MODEL and not self._warned:
+            logger.warning(
+                "EMBEDDING_MODEL is %s but the active index was built with %s; queries keep "
+                "using %s until `python -m app.cli.reindex` completes",
+                settings.EMBEDDING_MODEL, self._active[1], self._active[1]
+            )
+            self._warned = True
+
+    def embedder(self, model_name: str, embeddings: Any) -> Any:
+        """
+        Get the embedder for a model, creating it like ``embeddings`` the
+        first time another model is asked for
+
+        Args:
+            model_name: Embedding model
+            embeddings: Embedder the caller already has
+
+        Returns:
+            Embedder for ``model_name``
+        """
+        if embeddings.model_name == model_name:
+            return embeddings
+        with self._lock:
+            embedder = self._embedders.get(model_name)
+            if embedder is None:
+                embedder = type(embeddings)(model_name=model_name)
+                self._embedders[model_name] = embedder
+            return embedder
+
+    def bind(self, vector_store: VectorStore, embeddings: GeminiEmbeddings) -> GeminiEmbeddings:
+        """
+        Point a vector store at the active index and get the embedder to use
+
+        The caller's embedder is never reloaded, since concurrent requests
+        may be using it; another model gets its own embedder instead.
+
+        Args:
+            vector_store: Store to switch to the active collection
+            embeddings: Embedder the caller was configured with
+
+        Returns:
+            Embedder for the active model
+        """
+        collection_name, model_name = self.active()
+        if vector_store.collection_name != collection_name:
+            vector_store.use_collection(collection_name)
+        return self.embedder(model_name, embeddings)
+
+    def write_targets(self, collection_name: str) -> List[Tuple[str, str]]:
+        """
+        Other collections that index writes must also reach
+
+        Versions being built get every write, so documents processed,
+        reprocessed or cleared while the re-index job runs (or after its
+        last pass) are not missing or stale in the new index. The list is
+        cached with the active pair, and the re-index job waits
+        ``INDEX_REFRESH_SECONDS`` before copying so every worker has seen
+        the new version by then.
+
+        Args:
+            collection_name: Collection the caller is bound to
+
+        Returns:
+            List of (collection_name, embedding_model) pairs
+        """
+        with self._lock:
+            self._refresh()
+            versions = self._versions
+        return [(name, model) for name, model in versions if name != collection_name]
+
+    def cutover(self, db: Session, version: IndexVersion) -> None:
+        """
+        Make a fully built version the active one
+
+        The previous active version is retired in the same transaction, so
+        readers always find exactly one active version.
+
+        Args:
+            db: Database session
+            version: Version to activate
+        """
+        db.query(IndexVersion).filter(
+            IndexVersion.status == "active",
+            IndexVersion.id != version.id
+        ).update({"status": "retired"}, synchronize_session=False)
+        version.status = "active"
+        version.activated_at = func.now()
+        db.commit()
+
+        with self._lock:
+            self._active = None
+
+
+# Shared by every service in this process
+index_registry = IndexRegistry()
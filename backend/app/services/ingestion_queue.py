@@ -0,0 +1,140 @@
+"""
+Database-backed queue of documents waiting for ingestion workers
+"""
+from sqlalchemy import and_, func, insert, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.document import Document
+from app.models.ingestion_job import IngestionJob
+from app.services.message_buffer import utc_now
+from app.utils.metrics import INGESTION_JOBS
+from datetime import timedelta
+from typing import Dict, List, Optional
+from uuid import UUID
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueue:
+    """
+    Ingestion jobs shared by every API and worker process.
+
+    With ``INGEST_QUEUE_ENABLED`` the API only stores an upload and
+    enqueues it; ``python -m app.cli.ingest_worker`` processes (any number
+    of) them, so ingestion capacity scales separately from the API.
+
+    Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+    concurrent workers never take the same job. A job still running after
+    ``INGEST_JOB_TIMEOUT_SECONDS`` (its worker died) is handed to the next
+    worker; failed jobs are retried until ``INGEST_JOB_MAX_ATTEMPTS``.
+    """
+
+    def enqueue(self, db: Session, document_ids: List[UUID], kind: str = "process") -> int:
+        """
+        Queue documents for a worker
+
+        Documents that already have a queued or running job are skipped,
+        as are already processed ones unless they are queued for
+        reprocessing.
+
+        Args:
+            db: Database session
+            document_ids: Documents to process
+            kind: 'process' or 'reprocess' (clears the document's index first)
+
+        Returns:
+            int: Number of jobs created
+        """
+        if not document_ids:
+            return 0
+
+        active = {
+            document_id for (document_id,) in db.query(IngestionJob.document_id).filter(
+                IngestionJob.document_id.in_(document_ids),
+                IngestionJob.status.in_(["queued", "running"])
+            ).all()
+        }
+        if kind == "process":
+            active |= {
+                document_id for (document_id,) in db.query(Document.id).filter(
+                    Document.id.in_(document_ids),
+                    Document.processed == True  # noqa: E712
+                ).all()
+            }
+
+        rows = [
+            {"document_id": document_id, "kind": kind, "status": "queued", "attempts": 0}
+            for document_id in document_ids
+            if document_id not in active
+        ]
+        if rows:
+            db.execute(insert(IngestionJob), rows)
+        db.commit()
+        INGESTION_JOBS.labels(status="queued").inc(len(rows))
+        return len(rows)
+
+    def claim(self, db: Session, worker: str) -> Optional[IngestionJob]:
+        """
+        Take the oldest waiting job
+
+        Args:
+            db: Database session
+            worker: Identifier of the claiming worker (host:pid)
+
+        Returns:
+            IngestionJob in 'running' status, or None when the queue is empty
+        """
+        while True:
+            stale = utc_now() - timedelta(seconds=settings.INGEST_JOB_TIMEOUT_SECONDS)
+            job = db.query(IngestionJob).filter(or_(
+                IngestionJob.status == "queued",
+                and_(IngestionJob.status == "running", IngestionJob.started_at < stale)
+            )).order_by(IngestionJob.created_at).limit(1).with_for_update(skip_locked=True).first()
+            if job is None:
+                db.rollback()
+                return None
+
+            if job.status == "running":
+                logger.warning("Ingestion job %s timed out on %s; retrying", job.id, job.worker)
+                if job.attempts >= settings.INGEST_JOB_MAX_ATTEMPTS:
+                    self._finish(db, job, "failed", "Timed out")
+                    continue
+
+            job.status = "running"
+            job.attempts += 1
+            job.worker = worker
+            job.started_at = utc_now()
+            db.commit()
+            return job
+
+    def complete(self, db: Session, job: IngestionJob) -> None:
+        """Mark a claimed job as done"""
+        self._finish(db, job, "done", None)
+
+    def fail(self, db: Session, job: IngestionJob, error: str) -> None:
+        """Put a claimed job back in the queue, or fail it after its last attempt"""
+        if job.attempts < settings.INGEST_JOB_MAX_ATTEMPTS:
+            job.status = "queued"
+            job.error_message = error
+            db.commit()
+            return
+        self._finish(db, job, "failed", error)
+
+    def counts(self, db: Session) -> Dict[str, int]:
+        """Number of jobs per status"""
+        return dict(
+            db.query(IngestionJob.status, func.count()).group_by(IngestionJob.status).all()
+        )
+
+    @staticmethod
+    def _finish(db: Session, job: IngestionJob, status: str, error: Optional[str]) -> None:
+        job.status = status
+        job.error_message = error
+        job.finished_at = utc_now()
+        db.commit()
+        INGESTION_JOBS.labels(status=status).inc()
+
+
+# Shared by every service in this process
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,454 @@
+"""
+Bulk ingestion service for whole document libraries
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from fastapi import UploadFile, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from app.database import advisory_lock
+from app.models.document import Document
+from app.models.user import User
+from app.services.document_service import DocumentService
+from app.services.index_registry import index_registry
+from app.services.ingestion_queue import ingestion_queue
+from app.utils.manifest import IngestManifest
+from app.utils.uploads import stream_to_disk, StoredUpload
+from app.utils.file_storage import file_storage
+from app.utils.metrics import timed, INGESTED_CHUNKS
+from app.config import settings
+from typing import List, Dict, Any, Callable, BinaryIO, NamedTuple, Optional, Tuple
+from uuid import UUID
+import asyncio
+import hashlib
+import os
+import uuid
+import zipfile
+
+
+class IngestSource(NamedTuple):
+    """A file waiting to be ingested"""
+    key: str  # path relative to the folder or archive root
+    size: int
+    open: Callable[[], BinaryIO]
+
+
+class IngestJob(NamedTuple):
+    """A registered document waiting to be chunked and embedded"""
+    key: str
+    doc_id: UUID
+    filename: str
+    user_id: UUID
+    file_path: str
+    file_type: str
+    content_hash: Optional[str]
+
+
+class BulkIngestionService:
+    """
+    Ingest many documents at once.
+
+    Files are registered with batched ``Document`` inserts, parsed with
+    bounded concurrency in worker threads, and their chunks are embedded
+    and written to ChromaDB in large cross-document batches. Progress is
+    recorded in an ``IngestManifest`` so an interrupted run can be resumed.
+
+    With the ingestion queue enabled, registered documents are handed to
+    the ingestion workers instead and stay 'uploaded' in the manifest.
+    """
+
+    def __init__(self, document_service: DocumentService, use_queue: Optional[bool] = None):
+        self.document_service = document_service
+        self.use_queue = settings.INGEST_QUEUE_ENABLED if use_queue is None else use_queue
+
+    async def ingest_archive(
+        self,
+        db: Session,
+        user: User,
+        file: UploadFile
+    ) -> Dict[str, Any]:
+        """
+        Ingest every supported document inside an uploaded ZIP archive
+
+        Re-uploading the same archive resumes the previous run.
+
+        Args:
+            db: Database session
+            user: Current user
+            file: Uploaded ZIP archive
+
+        Returns:
+            Dict: Ingestion summary
+        """
+        if os.path.splitext(file.filename)[1].lower() != ".zip":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Bulk upload expects a .zip archive"
+            )
+
+        # Hashing a multi-GB archive takes seconds: keep it off the event loop
+        archive, archive_hash = await run_in_threadpool(self._open_archive, file.file)
+
+        with archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+            ]
+            if sum(info.file_size for info in members) > settings.MAX_ARCHIVE_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Archive too large. Max uncompressed size: {settings.MAX_ARCHIVE_SIZE} bytes"
+                )
+
+            sources = [
+                IngestSource(
+                    key=info.filename,
+                    size=info.file_size,
+                    open=lambda info=info: archive.open(info)
+                )
+                for info in members
+                if self._is_supported(info.filename)
+            ]
+            manifest_path = os.path.join(
+                settings.INGEST_MANIFEST_DIR,
+                f"{user.id}_{archive_hash[:16]}.json"
+            )
+            return await self.ingest(db, user, sources, IngestManifest.load(manifest_path))
+
+    @staticmethod
+    def _open_archive(stream: BinaryIO) -> Tuple[zipfile.ZipFile, str]:
+        """
+        Hash an uploaded archive and open it
+
+        Returns:
+            Tuple of (open archive, hex SHA-256 of the archive)
+        """
+        archive_hash = hashlib.sha256()
+        for block in iter(lambda: stream.read(1024 * 1024), b""):
+            archive_hash.update(block)
+        stream.seek(0)
+
+        try:
+            return zipfile.ZipFile(stream), archive_hash.hexdigest()
+        except zipfile.BadZipFile:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid ZIP archive"
+            )
+
+    async def ingest_directory(
+        self,
+        db: Session,
+        user: User,
+        directory: str,
+        manifest_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Ingest every supported document below a local directory
+
+        Args:
+            db: Database session
+            user: Owner of the ingested documents
+            directory: Root directory to walk
+            manifest_path: Manifest location (derived from the directory if omitted)
+
+        Returns:
+            Dict: Ingestion summary
+        """
+        root = os.path.abspath(directory)
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Directory not found: {directory}")
+
+        sources = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not self._is_supported(name):
+                    continue
+                path = os.path.join(dirpath, name)
+                sources.append(IngestSource(
+                    key=os.path.relpath(path, root),
+                    size=os.path.getsize(path),
+                    open=lambda path=path: open(path, "rb")
+                ))
+
+        if manifest_path is None:
+            root_hash = hashlib.sha256(root.encode()).hexdigest()[:16]
+            manifest_path = os.path.join(settings.INGEST_MANIFEST_DIR, f"{user.id}_{root_hash}.json")
+
+        return await self.ingest(db, user, sources, IngestManifest.load(manifest_path))
+
+    async def ingest(
+        self,
+        db: Session,
+        user: User,
+        sources: List[IngestSource],
+        manifest: IngestManifest
+    ) -> Dict[str, Any]:
+        """
+        Register, chunk, embed and index a set of files
+
+        Args:
+            db: Database session
+            user: Owner of the ingested documents
+            sources: Files to ingest
+            manifest: Manifest tracking progress of this run
+
+        Returns:
+            Dict: Ingestion summary
+        """
+        pending = []
+        skipped = 0
+        for source in sources:
+            if manifest.is_done(source.key, source.size):
+                skipped += 1
+            elif source.size > settings.MAX_UPLOAD_SIZE:
+                manifest.mark(
+                    source.key,
+                    IngestManifest.FAILED,
+                    size=source.size,
+                    error=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE} bytes"
+                )
+            else:
+                pending.append(source)
+
+        jobs = await self._register_documents(db, user, pending, manifest)
+        if self.use_queue:
+            ingestion_queue.enqueue(db, [job.doc_id for job in jobs])
+        else:
+            await self._process_jobs(db, jobs, manifest)
+        manifest.save()
+
+        keys = {source.key for source in sources}
+        return {
+            "manifest": os.path.basename(manifest.path),
+            "total": len(sources),
+            "skipped": skipped,
+            "summary": manifest.summary(),
+            "files": [
+                {
+                    "path": key,
+                    "status": entry["status"],
+                    "doc_id": entry.get("doc_id"),
+                    "error": entry.get("error")
+                }
+                for key, entry in manifest.entries.items()
+                if key in keys
+            ]
+        }
+
+    async def _register_documents(
+        self,
+        db: Session,
+        user: User,
+        sources: List[IngestSource],
+        manifest: IngestManifest
+    ) -> List[IngestJob]:
+        """Copy files into the upload directory and insert their rows in batches"""
+        loop = asyncio.get_running_loop()
+        user_id = user.id  # read once; commits below expire the instance
+
+        # Rows left behind by an interrupted run are reused instead of duplicated
+        previous_ids = [
+            UUID(manifest.entries[source.key]["doc_id"])
+            for source in sources
+            if manifest.entries.get(source.key, {}).get("doc_id")
+        ]
+        existing = {
+            document.id: document
+            for document in db.query(Document).filter(
+                Document.id.in_(previous_ids),
+                Document.deleted_at.is_(None)
+            ).all()
+        } if previous_ids else {}
+
+        jobs = []
+        batch = []
+        for source in sources:
+            filename = os.path.basename(source.key)
+            file_type = os.path.splitext(filename)[1].lower().replace('.', '')
+            previous_id = manifest.entries.get(source.key, {}).get("doc_id")
+            document = existing.get(UUID(previous_id)) if previous_id else None
+
+            if document is not None and file_storage.exists(document.file_path):
+                jobs.append(IngestJob(
+                    source.key, document.id, filename, user_id,
+                    document.file_path, file_type, document.content_hash
+                ))
+                continue
+
+            doc_id = uuid.uuid4()
+            try:
+                stored, staging_path = await loop.run_in_executor(
+                    None, self._stage_source, source, file_type
+                )
+                # Held until the batch is committed, so the purger keeps a shared original
+                advisory_lock(db, file_storage.uri(stored.sha256, file_type))
+                file_path = await loop.run_in_executor(
+                    None, file_storage.save, staging_path, stored.sha256, file_type
+                )
+            except Exception as e:
+                manifest.mark(source.key, IngestManifest.FAILED, size=source.size, error=str(e))
+                continue
+
+            batch.append(Document(
+                id=doc_id,
+                user_id=user_id,
+                filename=filename,
+                file_type=file_type,
+                file_path=file_path,
+                file_size=stored.size,
+                content_hash=stored.sha256,
+                processed=False
+            ))
+            jobs.append(IngestJob(
+                source.key, doc_id, filename, user_id, file_path, file_type, stored.sha256
+            ))
+            manifest.mark(source.key, IngestManifest.UPLOADED, size=source.size, doc_id=str(doc_id))
+
+            if len(batch) >= settings.INGEST_DB_BATCH_SIZE:
+                self._commit_batch(db, batch, manifest)
+                batch = []
+
+        if batch:
+            self._commit_batch(db, batch, manifest)
+
+        return jobs
+
+    async def _process_jobs(
+        self,
+        db: Session,
+        jobs: List[IngestJob],
+        manifest: IngestManifest
+    ) -> None:
+        """Chunk documents concurrently and feed them to a single batching writer"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_CONCURRENCY * 2)
+
+        async def chunk_job(job: IngestJob) -> None:
+            async with semaphore:
+                try:
+                    chunks, locations = await loop.run_in_executor(
+                        None,
+                        self.document_service.chunk_document,
+                        job.doc_id,
+                        job.file_path,
+                        job.file_type,
+                        job.content_hash
+                    )
+                    await queue.put((job, chunks, locations, None))
+                except Exception as e:
+                    await queue.put((job, None, None, e))
+
+        async def write_batches() -> None:
+            batch = []
+            buffered = 0
+            for _ in range(len(jobs)):
+                job, chunks, locations, error = await queue.get()
+                if error is not None:
+                    self._record_results(db, [], [(job, error)], manifest)
+                    continue
+
+                batch.append((job, chunks, locations))
+                buffered += len(chunks)
+                if buffered >= settings.INGEST_VECTOR_BATCH_SIZE:
+                    await self._flush(db, batch, manifest)
+                    batch = []
+                    buffered = 0
+
+            if batch:
+                await self._flush(db, batch, manifest)
+
+        await asyncio.gather(write_batches(), *(chunk_job(job) for job in jobs))
+
+    async def _flush(
+        self,
+        db: Session,
+        batch: List[tuple],
+        manifest: IngestManifest
+    ) -> None:
+        """Embed and index the chunks of several documents in one pass"""
+        loop = asyncio.get_running_loop()
+        ids, texts, metadatas = [], [], []
+        for job, chunks, locations in batch:
+            ids.extend(f"{job.doc_id}_{i}" for i in range(len(chunks)))
+            texts.extend(chunks)
+            metadatas.extend(DocumentService.build_metadatas(
+                job.doc_id, job.filename, job.user_id, len(chunks),
+                self.document_service.chunker_key, locations
+            ))
+
+        try:
+            embedder = index_registry.bind(self.document_service.vector_store, self.document_service.embeddings)
+            with timed("ingest", "embed"):
+                embeddings = await loop.run_in_executor(None, embedder.embed_batch, texts)
+            with timed("ingest", "vector_add"):
+                await loop.run_in_executor(
+                    None, self.document_service.vector_store.add_chunks, ids, texts, embeddings, metadatas
+                )
+                await loop.run_in_executor(
+                    None, self.document_service.mirror_chunks,
+                    ids, texts, embeddings, metadatas, embedder.model_name
+                )
+        except Exception as e:
+            self._record_results(db, [], [(job, e) for job, _, _ in batch], manifest)
+            return
+        INGESTED_CHUNKS.inc(len(ids))
+
+        self._record_results(db, batch, [], manifest)
+
+    @staticmethod
+    def _record_results(
+        db: Session,
+        succeeded: List[tuple],
+        failed: List[tuple],
+        manifest: IngestManifest
+    ) -> None:
+        """Bulk update document rows and the manifest after a batch"""
+        rows = [
+            {"id": job.doc_id, "processed": True, "chunk_count": len(chunks), "error_message": None}
+            for job, chunks, _ in succeeded
+        ] + [
+            {"id": job.doc_id, "processed": False, "chunk_count": 0, "error_message": str(error)}
+            for job, error in failed
+        ]
+        with timed("ingest", "db_commit"):
+            db.execute(update(Document), rows)
+            db.commit()
+
+        for job, *_ in succeeded:
+            manifest.mark(job.key, IngestManifest.DONE)
+        for job, error in failed:
+            manifest.mark(job.key, IngestManifest.FAILED, error=str(error))
+        manifest.save()
+
+    @staticmethod
+    def _commit_batch(db: Session, batch: List[Document], manifest: IngestManifest) -> None:
+        """Insert a batch of document rows with a single commit"""
+        db.add_all(batch)
+        db.commit()
+        manifest.save()
+
+    @staticmethod
+    def _stage_source(source: IngestSource, file_type: str) -> Tuple[StoredUpload, str]:
+        """
+        Stream a source file to staging, hashing and sniffing it
+
+        Returns:
+            Tuple of (size and hash, staging path for file_storage.save)
+        """
+        staging_path = file_storage.staging_path(file_type)
+        with source.open() as src:
+            stored = stream_to_disk(
+                src,
+                staging_path,
+                settings.MAX_UPLOAD_SIZE,
+                file_type,
+                settings.UPLOAD_CHUNK_SIZE
+            )
+        return stored, staging_path
+
+    @staticmethod
+    def _is_supported(filename: str) -> bool:
+        """Check whether a file has an extension the parser understands"""
+        return os.path.splitext(filename)[1].lower() in DocumentService.SUPPORTED_EXTENSIONS
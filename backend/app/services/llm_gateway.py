@@ -0,0 +1,262 @@
+"""
+Admission control in front of the chat model
+"""
+from fastapi import HTTPException, status
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from app.config import settings
+from app.services.llm_hedging import HedgedChatModel
+from app.utils.metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_REJECTIONS, LLM_RETRIES
+from typing import Any, Dict, Hashable, List, Optional, Union
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket
+
+    Args:
+        rate: Tokens added per second; 0 or less disables the limit
+        capacity: Maximum tokens held, i.e. the allowed burst
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether a provider error means 'too many requests'"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+class LLMGateway:
+    """
+    Concurrency-limited, rate-limited access to the chat model.
+
+    A call passes three gates:
+
+    1. The caller's per-user token bucket; when it is empty the request is
+       rejected immediately with 429.
+    2. A bounded wait queue; when ``max_queue`` requests are already
+       waiting, new ones are rejected immediately with 429.
+    3. While queued, the global token bucket (the provider's request rate)
+       and a free concurrency slot; a request that cannot get both within
+       ``queue_timeout`` is rejected with 429.
+
+    Provider rate-limit errors are retried with jittered exponential
+    backoff; if they persist the request fails with 503. All limits apply
+    per worker process.
+
+    Background calls (batch evaluation runs) wait for their user's bucket
+    instead of being rejected, and first take one of
+    ``LLM_BACKGROUND_CONCURRENCY`` lane slots, always fewer than
+    ``max_concurrency``, so live chat keeps at least one slot to itself.
+    """
+
+    # Idle, full per-user buckets are dropped once this many are tracked
+    MAX_TRACKED_USERS = 10000
+
+    def __init__(
+        self,
+        llm: Union[BaseChatModel, HedgedChatModel],
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        global_rate: Optional[float] = None,
+        global_burst: Optional[int] = None,
+        user_rate: Optional[float] = None,
+        user_burst: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.llm = llm
+        self.max_queue = settings.LLM_MAX_QUEUE if max_queue is None else max_queue
+        self.queue_timeout = settings.LLM_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.user_rate = settings.LLM_USER_RATE if user_rate is None else user_rate
+        self.user_burst = settings.LLM_USER_BURST if user_burst is None else user_burst
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+
+        max_concurrency = settings.LLM_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._background_slots = asyncio.Semaphore(
+            max(1, min(settings.LLM_BACKGROUND_CONCURRENCY, max_concurrency - 1))
+        )
+        # The provider limit is shared by every worker process on the host
+        shards = max(1, settings.LLM_RATE_SHARDS)
+        self._global_bucket = TokenBucket(
+            settings.LLM_GLOBAL_RATE / shards if global_rate is None else global_rate,
+            max(1, settings.LLM_GLOBAL_BURST // shards) if global_burst is None else global_burst
+        )
+        self._user_buckets: Dict[Hashable, TokenBucket] = {}
+        self._waiting = 0
+
+    def _user_bucket(self, user_id: Hashable) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            if len(self._user_buckets) >= self.MAX_TRACKED_USERS:
+                self._user_buckets = {
+                    key: b for key, b in self._user_buckets.items() if not b.is_full()
+                }
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    @staticmethod
+    def _reject(reason: str, detail: str, retry_after: float) -> HTTPException:
+        LLM_REJECTIONS.labels(reason=reason).inc()
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def _wait_for_rate(self, deadline: float) -> None:
+        """Wait for a global token, giving up at the queue deadline"""
+        while True:
+            wait = self._global_bucket.try_acquire()
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise self._reject(
+                    "queue_timeout", "The assistant is busy, please try again shortly", wait
+                )
+            await asyncio.sleep(wait)
+
+    async def _queue_for_slot(self) -> None:
+        """Wait in the bounded queue for a global token and a concurrency slot"""
+        if self._waiting >= self.max_queue:
+            raise self._reject(
+                "queue_full", "The assistant is busy, please try again shortly", self.queue_timeout / 2
+            )
+
+        deadline = time.monotonic() + self.queue_timeout
+        self._waiting += 1
+        LLM_QUEUE_DEPTH.inc()
+        try:
+            await self._wait_for_rate(deadline)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise self._reject(
+                    "queue_timeout", "The assistant is busy, please try again shortly", self.queue_timeout / 2
+                )
+        finally:
+            self._waiting -= 1
+            LLM_QUEUE_DEPTH.dec()
+
+    async def invoke(
+        self,
+        messages: List[BaseMessage],
+        user_id: Optional[Hashable] = None,
+        background: bool = False
+    ) -> Any:
+        """
+        Call the chat model once admission control lets the request through
+
+        Args:
+            messages: Prompt messages
+            user_id: Caller, for the per-user rate limit
+            background: Not a live request: wait for the user's rate limit
+                and use the background lane
+
+        Returns:
+            The model response message
+
+        Raises:
+            HTTPException: 429 when the request is rejected by a limit,
+                503 when the provider keeps rate limiting after retries
+        """
+        if user_id is not None:
+            bucket = self._user_bucket(user_id)
+            wait = bucket.try_acquire()
+            while wait and background:
+                await asyncio.sleep(wait)
+                wait = bucket.try_acquire()
+            if wait:
+                raise self._reject(
+                    "user_rate", "You are sending messages too quickly, please slow down", wait
+                )
+
+        if background:
+            async with self._background_slots:
+                return await self._admit(messages)
+        return await self._admit(messages)
+
+    async def _admit(self, messages: List[BaseMessage]) -> Any:
+        """Take a concurrency slot and a global token, then call the model"""
+        if not self._slots.locked() and not self._global_bucket.try_acquire():
+            # Free slot and rate budget: go straight through without queueing
+            await self._slots.acquire()
+        else:
+            await self._queue_for_slot()
+
+        LLM_IN_FLIGHT.inc()
+        try:
+            return await self._call(messages)
+        finally:
+            LLM_IN_FLIGHT.dec()
+            self._slots.release()
+
+    async def _call(self, messages: List[BaseMessage]) -> Any:
+        """Invoke the model, retrying provider rate-limit errors with jittered backoff"""
+        def before_sleep(retry_state: Any) -> None:
+            LLM_RETRIES.inc()
+            logger.warning(
+                "LLM rate limited (attempt %d), backing off", retry_state.attempt_number
+            )
+
+        try:
+            async for attempt in AsyncRetrying(
+                retry=retry_if_exception(is_rate_limit_error),
+                wait=wait_random_exponential(multiplier=0.5, max=10),
+                stop=stop_after_attempt(self.max_retries + 1),
+                before_sleep=before_sleep,
+                reraise=True
+            ):
+                with attempt:
+                    return await self.llm.ainvoke(messages)
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            LLM_REJECTIONS.labels(reason="provider_rate_limit").inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The language model provider is rate limiting requests, please try again shortly",
+                headers={"Retry-After": "10"}
+            )
@@ -0,0 +1,110 @@
+"""
+Hedged LLM generation with failover to a fallback model
+"""
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from app.config import settings
+from app.utils.metrics import LLM_FALLBACKS, LLM_HEDGES
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedChatModel:
+    """
+    Bound the tail latency of chat completions.
+
+    If the primary model has not answered after the hedge delay, the same
+    prompt is sent to the hedge model and whichever answers first wins;
+    the other call is cancelled. The delay tracks the primary's observed
+    latency percentile (``LLM_HEDGE_PERCENTILE``), so only the slowest few
+    percent of requests are duplicated. Hedge calls run inside the
+    gateway slot of the request they duplicate and are not counted against
+    the global rate limit.
+
+    If the primary fails (and the hedge, when one was sent, fails too), the
+    request is retried once on the fallback model.
+
+    Args:
+        primary: Main chat model
+        hedge: Model raced against a slow primary; None disables hedging
+        fallback: Model used when the primary fails; None disables failover
+    """
+
+    # Primary latencies kept for the percentile estimate
+    WINDOW = 200
+    # Observations needed before the percentile replaces LLM_HEDGE_DELAY
+    MIN_SAMPLES = 20
+
+    def __init__(
+        self,
+        primary: BaseChatModel,
+        hedge: Optional[BaseChatModel] = None,
+        fallback: Optional[BaseChatModel] = None
+    ):
+        self.primary = primary
+        self.hedge = hedge
+        self.fallback = fallback
+        self._latencies: Deque[float] = deque(maxlen=self.WINDOW)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before sending the hedge request"""
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return settings.LLM_HEDGE_DELAY
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * settings.LLM_HEDGE_PERCENTILE / 100))
+        return max(settings.LLM_HEDGE_MIN_DELAY, ordered[index])
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs: Any) -> Any:
+        """
+        Generate a response, hedging slow calls and failing over on errors
+
+        Args:
+            messages: Prompt messages
+
+        Returns:
+            The first successful response message
+        """
+        try:
+            return await self._hedged(messages, **kwargs)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            LLM_FALLBACKS.inc()
+            logger.warning("Primary LLM failed (%s: %s), using the fallback model", type(e).__name__, e)
+            return await self.fallback.ainvoke(messages, **kwargs)
+
+    async def _hedged(self, messages: List[BaseMessage], **kwargs: Any) -> Any:
+        started = time.monotonic()
+        primary = asyncio.create_task(self.primary.ainvoke(messages, **kwargs))
+        tasks: Dict[asyncio.Task, str] = {primary: "primary"}
+        hedged = False
+        try:
+            if self.hedge is not None:
+                done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+                if not done:
+                    tasks[asyncio.create_task(self.hedge.ainvoke(messages, **kwargs))] = "hedge"
+                    hedged = True
+
+            errors = []
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    kind = tasks.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if hedged:
+                        LLM_HEDGES.labels(winner=kind).inc()
+                    if kind == "primary" or not primary.done():
+                        # A primary that lost the race took at least this long
+                        self._latencies.append(time.monotonic() - started)
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
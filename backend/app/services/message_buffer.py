@@ -0,0 +1,374 @@
+"""
+Write-behind persistence of chat messages
+"""
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.chat import ChatMessage, ChatSession
+from app.utils.metrics import (
+    MESSAGE_BUFFER_PENDING, MESSAGE_FLUSH_FAILURES, MESSAGE_FLUSH_ROWS, MESSAGE_REPLAY_FAILURES
+)
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+from uuid import UUID
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COLUMNS = ("id", "session_id", "role", "content", "sources", "created_at")
+SESSION_COLUMNS = ("id", "title", "retrieval_chunk_ids", "updated_at")
+UUID_FIELDS = ("id", "session_id")
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+# Longest pause between retries while the database is unavailable
+MAX_RETRY_DELAY = 30.0
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: Optional[datetime]) -> datetime:
+    """Comparable timestamp for rows from the database (naive on SQLite) and the buffer"""
+    if value is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _encode(row: Dict[str, Any]) -> Dict[str, Any]:
+    encoded = dict(row)
+    for field in UUID_FIELDS:
+        if encoded.get(field) is not None:
+            encoded[field] = str(encoded[field])
+    for field in DATETIME_FIELDS:
+        if encoded.get(field) is not None:
+            encoded[field] = encoded[field].isoformat()
+    return encoded
+
+
+def _decode(row: Dict[str, Any]) -> Dict[str, Any]:
+    decoded = dict(row)
+    for field in UUID_FIELDS:
+        if decoded.get(field) is not None:
+            decoded[field] = UUID(decoded[field])
+    for field in DATETIME_FIELDS:
+        if decoded.get(field) is not None:
+            decoded[field] = datetime.fromisoformat(decoded[field])
+    return decoded
+
+
+class MessageWriteBuffer:
+    """
+    Batches chat message inserts off the request path.
+
+    ``add`` appends a question/answer pair (and the session's new title,
+    working set and timestamp) to a per-process journal file and returns;
+    a background thread writes everything pending every
+    ``MESSAGE_FLUSH_INTERVAL`` seconds as multi-row INSERTs plus one bulk
+    UPDATE of the sessions, in a single transaction.
+
+    Durability:
+
+    - Journal entries are written (and fsynced with
+      ``MESSAGE_JOURNAL_FSYNC``) before ``add`` returns; a journal is
+      deleted only once all of its entries are committed.
+    - A failed flush keeps its rows pending and is retried with backoff.
+    - ``stop`` flushes what is left on shutdown.
+    - Journals whose process died (their file lock is free) are replayed
+      by the next process that starts; rows already in the database are
+      skipped. A journal that cannot be written yet (database down) is
+      kept and retried by the background writer, so startup never fails
+      on it.
+
+    Rows that are accepted but not yet committed are served by
+    ``pending_messages`` and ``pending_session`` so readers in this process
+    see their own writes immediately. When the buffer is not running (CLI
+    tools, benchmarks) ``add`` writes synchronously.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        journal_dir: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.journal_dir = journal_dir or settings.MESSAGE_JOURNAL_DIR
+        self.flush_interval = settings.MESSAGE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.batch_size = settings.MESSAGE_FLUSH_BATCH_SIZE if batch_size is None else batch_size
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._messages: List[Dict[str, Any]] = []
+        self._sessions: Dict[UUID, Dict[str, Any]] = {}
+        # Taken by the running flush; still visible to readers until committed
+        self._flushing: List[Dict[str, Any]] = []
+        self._flushing_sessions: Dict[UUID, Dict[str, Any]] = {}
+
+        self._journal: Optional[IO[str]] = None
+        # Rotated journals whose entries are not committed yet (kept open and locked)
+        self._sealed: List[IO[str]] = []
+        # Whether an orphaned journal failed to replay and must be retried
+        self._orphans_left = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Replay orphaned journals and start the background writer"""
+        if self.running:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.replay_orphaned_journals()
+        self._journal = self._open_journal()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="message-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the background writer and flush everything still pending"""
+        if not self.running:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+        if self.flush() and self._journal is not None:
+            # Everything is committed: the open journal holds nothing that needs replaying
+            self._discard_journal(self._journal)
+            self._journal = None
+        else:
+            logger.error(
+                "%d chat messages could not be written on shutdown; they will be replayed on the next start",
+                len(self._messages)
+            )
+
+    def add(self, messages: List[ChatMessage], session: Optional[ChatSession] = None) -> None:
+        """
+        Accept messages (and the session's new values) for writing
+
+        Args:
+            messages: Messages with id and created_at already set
+            session: Session whose title, retrieval_chunk_ids and
+                updated_at should be written along with the messages
+        """
+        rows = [{column: getattr(message, column) for column in MESSAGE_COLUMNS} for message in messages]
+        session_row = {column: getattr(session, column) for column in SESSION_COLUMNS} if session else None
+
+        if not self.running:
+            self._write(self.session_factory, rows, [session_row] if session_row else [])
+            return
+
+        entry = json.dumps({
+            "messages": [_encode(row) for row in rows],
+            "session": _encode(session_row) if session_row else None
+        }, ensure_ascii=False)
+
+        with self._lock:
+            self._journal.write(entry + "\n")
+            self._journal.flush()
+            if settings.MESSAGE_JOURNAL_FSYNC:
+                os.fsync(self._journal.fileno())
+            self._messages.extend(rows)
+            if session_row:
+                self._sessions[session_row["id"]] = session_row
+            MESSAGE_BUFFER_PENDING.set(len(self._messages) + len(self._flushing))
+            if len(self._messages) >= self.batch_size:
+                self._wake.set()
+
+    def pending_messages(self, session_id: UUID) -> List[ChatMessage]:
+        """
+        Messages of a session that may not be committed yet, oldest first
+
+        Some of them may already be in the database; callers merge by ID.
+        """
+        with self._lock:
+            rows = [row for row in self._flushing + self._messages if row["session_id"] == session_id]
+        return [ChatMessage(**row) for row in rows]
+
+    def pending_session(self, session_id: UUID) -> Optional[Dict[str, Any]]:
+        """Session values that may not be committed yet, or None"""
+        with self._lock:
+            row = self._sessions.get(session_id) or self._flushing_sessions.get(session_id)
+            return dict(row) if row else None
+
+    def flush(self) -> bool:
+        """
+        Write everything pending in one transaction
+
+        Returns:
+            bool: False if the write failed (the rows stay pending)
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._messages and not self._sessions:
+                    return True
+                self._flushing, self._messages = self._messages, []
+                self._flushing_sessions, self._sessions = self._sessions, {}
+                if self._journal is not None and self.running:
+                    # New entries go to a fresh journal; this one can go once the flush commits
+                    self._sealed.append(self._journal)
+                    self._journal = self._open_journal()
+                sealed = list(self._sealed)
+
+            try:
+                self._write(self.session_factory, self._flushing, list(self._flushing_sessions.values()))
+            except Exception:
+                MESSAGE_FLUSH_FAILURES.inc()
+                logger.exception("Writing %d buffered chat messages failed; will retry", len(self._flushing))
+                with self._lock:
+                    self._messages[:0] = self._flushing
+                    for session_id, row in self._flushing_sessions.items():
+                        self._sessions.setdefault(session_id, row)  # newer values win
+                    self._flushing, self._flushing_sessions = [], {}
+                return False
+
+            with self._lock:
+                MESSAGE_FLUSH_ROWS.observe(len(self._flushing))
+                self._flushing, self._flushing_sessions = [], {}
+                MESSAGE_BUFFER_PENDING.set(len(self._messages))
+                for journal in sealed:
+                    self._sealed.remove(journal)
+                    self._discard_journal(journal)
+            return True
+
+    def replay_orphaned_journals(self) -> int:
+        """
+        Write the entries of journals left behind by processes that died
+
+        Returns:
+            int: Number of messages replayed from orphaned journals
+        """
+        replayed = 0
+        failed = False
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "messages-*.jsonl"))):
+            journal = open(path, "r+", encoding="utf-8")
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                journal.close()  # owned by a live process
+                continue
+
+            # Closing releases the lock; a journal that fails is kept for the next replay
+            with journal:
+                try:
+                    messages, sessions = self._read_journal(journal)
+                    self._write(self.session_factory, messages, list(sessions.values()))
+                except Exception:
+                    MESSAGE_REPLAY_FAILURES.inc()
+                    logger.exception("Replaying chat messages from %s failed; will retry", path)
+                    failed = True
+                    continue
+                self._discard_journal(journal)
+            replayed += len(messages)
+            logger.warning("Replayed %d chat messages from %s", len(messages), path)
+        self._orphans_left = failed
+        return replayed
+
+    def _run(self) -> None:
+        delay = self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            written = self.flush()
+            if self._orphans_left:
+                self.replay_orphaned_journals()
+                written = written and not self._orphans_left
+            delay = self.flush_interval if written else min(max(delay, 0.5) * 2, MAX_RETRY_DELAY)
+
+    def _open_journal(self) -> IO[str]:
+        path = os.path.join(self.journal_dir, f"messages-{os.getpid()}-{uuid.uuid4().hex}.jsonl")
+        journal = open(path, "a", encoding="utf-8")
+        fcntl.flock(journal, fcntl.LOCK_EX)
+        return journal
+
+    @staticmethod
+    def _discard_journal(journal: IO[str]) -> None:
+        try:
+            os.remove(journal.name)
+        except FileNotFoundError:
+            pass
+        journal.close()
+
+    @staticmethod
+    def _read_journal(journal: IO[str]) -> Tuple[List[Dict[str, Any]], Dict[UUID, Dict[str, Any]]]:
+        """Entries of a journal; a torn last line from a crash is skipped"""
+        messages: List[Dict[str, Any]] = []
+        sessions: Dict[UUID, Dict[str, Any]] = {}
+        journal.seek(0)
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            messages.extend(_decode(row) for row in entry["messages"])
+            if entry.get("session"):
+                row = _decode(entry["session"])
+                sessions[row["id"]] = row
+        return messages, sessions
+
+    def _write(
+        self,
+        session_factory: Callable[[], Session],
+        messages: List[Dict[str, Any]],
+        sessions: List[Dict[str, Any]]
+    ) -> None:
+        """Insert messages and update sessions in one transaction"""
+        db = session_factory()
+        try:
+            try:
+                self._execute(db, messages, sessions)
+            except IntegrityError:
+                # A replayed row is already there, or a session was deleted meanwhile
+                db.rollback()
+                messages, sessions = self._writable(db, messages, sessions)
+                self._execute(db, messages, sessions)
+        finally:
+            db.close()
+
+    def _execute(self, db: Session, messages: List[Dict[str, Any]], sessions: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(messages), self.batch_size):
+            db.execute(insert(ChatMessage), messages[start:start + self.batch_size])
+        if sessions:
+            # ORM bulk UPDATE by primary key
+            db.execute(update(ChatSession), sessions)
+        db.commit()
+
+    @staticmethod
+    def _writable(
+        db: Session,
+        messages: List[Dict[str, Any]],
+        sessions: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Drop rows that are already written and rows of sessions that no longer exist"""
+        message_ids = [row["id"] for row in messages]
+        written = set(db.scalars(select(ChatMessage.id).where(ChatMessage.id.in_(message_ids)))) if message_ids else set()
+        session_ids = {row["session_id"] for row in messages} | {row["id"] for row in sessions}
+        existing = set(db.scalars(select(ChatSession.id).where(ChatSession.id.in_(session_ids)))) if session_ids else set()
+
+        kept = [row for row in messages if row["id"] not in written and row["session_id"] in existing]
+        dropped = len(messages) - len(kept) - len(written)
+        if dropped:
+            logger.warning("Dropping %d buffered chat messages of deleted sessions", dropped)
+        return kept, [row for row in sessions if row["id"] in existing]
+
+
+# Shared by every request in this process
+message_buffer = MessageWriteBuffer()
@@ -0,0 +1,98 @@
+"""
+Query routing and adaptive retrieval depth
+"""
+from app.config import settings
+from typing import List
+import re
+
+# Routes
+SMALL_TALK = "small_talk"   # greetings, thanks: no retrieval, short prompt
+FOLLOW_UP = "follow_up"     # rephrase the previous answer: chat history, no retrieval
+LOOKUP = "lookup"           # needs the documents: full RAG
+
+SMALL_TALK_PATTERN = re.compile(
+    r"^(hi|hello|hey|yo|good (morning|afternoon|evening)|thanks?( you)?( so much| a lot)?|"
+    r"thx|ty|ok(ay)?|cool|great|nice|perfect|got it|bye|goodbye|see you|"
+    r"сайн байна уу|сайн уу|баярлалаа|баяртай|за|ойлголоо)"
+    r"[\s!.,?🙂😊👍]*$",
+    re.IGNORECASE
+)
+
+# Whole-message match only: "more detail on the fuel pump" is a new lookup
+FOLLOW_UP_PATTERN = re.compile(
+    r"^((can|could) you |please |ok(ay)?,? |and )*"
+    r"(explain( it| that| this)?( again| further| more| more simply| simpler| in simpler terms)?|"
+    r"(say|put) (it|that) (again|more simply|in simpler terms|differently)|"
+    r"(in )?simpler( terms)?|more simply|simplify( it| that| this)?|"
+    r"elaborate( on (it|that|this))?|(tell me )?more( about (it|that|this))?|(give )?more details?|"
+    r"what do(es)? (you|it|that) mean|in other words|rephrase( it| that| this)?|"
+    r"summari[sz]e( it| that| this)?|(make it )?shorter|"
+    r"give (me )?an example|(for )?example\??|clarify( it| that| this)?|why( is that)?|tl;?dr|"
+    r"энгийнээр( тайлбарлана уу)?|дэлгэрэнгүй( тайлбарлана уу)?|дахиад тайлбарлана уу)"
+    r"( please)?[\s!.,?]*$",
+    re.IGNORECASE
+)
+
+# Longer messages almost always carry a new question, whatever they start with
+MAX_SMALL_TALK_WORDS = 6
+MAX_FOLLOW_UP_WORDS = 12
+
+
+class QueryRouter:
+    """
+    Decide how much retrieval a chat message needs.
+
+    Classification is deliberately conservative: anything that is not
+    clearly small talk or a request to rework the previous answer is a
+    document lookup, so a misroute costs a retrieval, not an answer.
+    """
+
+    def classify(self, content: str) -> str:
+        """
+        Classify a user message
+
+        Args:
+            content: Message text
+
+        Returns:
+            str: SMALL_TALK, FOLLOW_UP or LOOKUP. FOLLOW_UP only means the
+            message reads like one; the caller still needs a previous answer.
+        """
+        text = content.strip()
+        words = len(text.split())
+
+        if words <= MAX_SMALL_TALK_WORDS and SMALL_TALK_PATTERN.match(text):
+            return SMALL_TALK
+        if words <= MAX_FOLLOW_UP_WORDS and FOLLOW_UP_PATTERN.match(text):
+            return FOLLOW_UP
+        return LOOKUP
+
+    @staticmethod
+    def select_depth(distances: List[float]) -> int:
+        """
+        Number of top results worth putting in the prompt
+
+        Results are kept while their cosine similarity stays above
+        RETRIEVAL_MIN_SIMILARITY and within RETRIEVAL_RELATIVE_CUTOFF of
+        the best hit; at least RETRIEVAL_MIN_K are kept so the model can
+        still say the answer is not in the documents.
+
+        Args:
+            distances: Cosine distances of the results, best first
+
+        Returns:
+            int: How many leading results to keep
+        """
+        if not distances:
+            return 0
+
+        best = 1 - distances[0]
+        keep = 0
+        for distance in distances:
+            similarity = 1 - distance
+            if similarity < settings.RETRIEVAL_MIN_SIMILARITY:
+                break
+            if best - similarity > settings.RETRIEVAL_RELATIVE_CUTOFF:
+                break
+            keep += 1
+        return max(keep, min(settings.RETRIEVAL_MIN_K, len(distances)))
@@ -0,0 +1,214 @@
+"""
+Re-embedding job for embedding model migrations
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.document import Document
+from app.models.index_version import IndexVersion
+from app.services.document_service import DocumentService
+from app.services.index_registry import index_registry
+from app.services.vector_store import VectorStore
+from app.utils.embeddings import GeminiEmbeddings
+from app.utils.chunk_store import chunk_store
+from app.utils.file_storage import file_storage
+from app.config import settings
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+import time
+
+
+class ReindexService:
+    """
+    Rebuild the vector index with a new embedding model without downtime.
+
+    Chunks are re-embedded into a new versioned collection in throttled
+    batches while queries keep being served from the active collection.
+    Documents added during the run are picked up by catch-up passes, and
+    once the new collection holds every document it is activated in a
+    single transaction. Ingestion also writes (and clears) documents in a
+    version being built, so documents processed or reprocessed after
+    their copy or the last pass are current in it too.
+    """
+
+    def __init__(self, document_service: Optional[DocumentService] = None):
+        self.document_service = document_service or DocumentService()
+
+    def start(self, db: Session, embedding_model: str) -> IndexVersion:
+        """
+        Register a new index version to build
+
+        Args:
+            db: Database session
+            embedding_model: Embedding model for the new index
+
+        Returns:
+            IndexVersion: Version in 'building' status
+        """
+        building = db.query(IndexVersion).filter(IndexVersion.status == "building").first()
+        if building is not None:
+            raise ValueError(
+                f"Re-index into {building.collection_name} is already in progress; resume it instead"
+            )
+
+        index_registry.get_active(db)
+        version_number = db.query(func.count(IndexVersion.id)).scalar() + 1
+        version = IndexVersion(
+            collection_name=f"{VectorStore.DEFAULT_COLLECTION}_v{version_number}",
+            embedding_model=embedding_model,
+            status="building"
+        )
+        db.add(version)
+        db.commit()
+        db.refresh(version)
+        return version
+
+    def run(self, db: Session, version: IndexVersion, cutover: bool = True) -> IndexVersion:
+        """
+        Build (or resume building) a version and optionally activate it
+
+        Args:
+            db: Database session
+            version: Version in 'building' status
+            cutover: Activate the version once it is complete
+
+        Returns:
+            IndexVersion: Updated version
+        """
+        active = index_registry.get_active(db)
+        source = VectorStore(collection_name=active.collection_name)
+        target = VectorStore(collection_name=version.collection_name)
+        embeddings = GeminiEmbeddings(model_name=version.embedding_model)
+
+        done: Set[UUID] = set()
+        version.processed_documents = 0
+        version.processed_chunks = 0
+        db.commit()
+        try:
+            # Workers re-read the index versions every INDEX_REFRESH_SECONDS;
+            # once that has passed they all dual-write to the new collection,
+            # so documents changed after being copied stay current there
+            time.sleep(settings.INDEX_REFRESH_SECONDS)
+
+            # Keep passing over the table until a pass finds nothing new, so
+            # documents uploaded while the job runs are included too
+            while True:
+                documents = [
+                    document for document in self._processed_documents(db)
+                    if document.id not in done
+                ]
+                if not documents:
+                    break
+
+                version.total_documents = len(done) + len(documents)
+                version.total_chunks = (version.processed_chunks or 0) + sum(
+                    document.chunk_count or 0 for document in documents
+                )
+                db.commit()
+
+                self._copy_documents(db, version, documents, source, target, embeddings, done)
+
+            # Drop documents deleted while the job was running
+            live_ids = {document.id for document in self._processed_documents(db)}
+            for doc_id in done - live_ids:
+                target.delete_document(doc_id)
+
+            if cutover:
+                index_registry.cutover(db, version)
+                print(f"✅ {version.collection_name} is now active ({version.embedding_model})")
+        except Exception as e:
+            db.rollback()
+            version.status = "failed"
+            version.error_message = str(e)
+            db.commit()
+            raise
+
+        return version
+
+    def _copy_documents(
+        self,
+        db: Session,
+        version: IndexVersion,
+        documents: List[Document],
+        source: VectorStore,
+        target: VectorStore,
+        embeddings: GeminiEmbeddings,
+        done: Set[UUID]
+    ) -> None:
+        """Re-embed documents into the target collection in throttled batches"""
+        ids, texts, metadatas, batch_docs = [], [], [], []
+
+        def flush() -> None:
+            if ids:
+                target.add_chunks(ids, texts, embeddings.embed_batch(texts), metadatas)
+            version.processed_chunks = (version.processed_chunks or 0) + len(ids)
+            version.processed_documents = (version.processed_documents or 0) + len(batch_docs)
+            db.commit()
+            done.update(batch_docs)
+            ids.clear()
+            texts.clear()
+            metadatas.clear()
+            batch_docs.clear()
+            time.sleep(settings.REINDEX_THROTTLE_SECONDS)
+
+        for document in documents:
+            # Resuming: documents copied by an earlier run are already there
+            if target.has_document(document.id):
+                version.processed_documents = (version.processed_documents or 0) + 1
+                done.add(document.id)
+                continue
+
+            chunks, chunker_key, locations = self._document_chunks(document, source)
+            ids.extend(f"{document.id}_{i}" for i in range(len(chunks)))
+            texts.extend(chunks)
+            metadatas.extend(DocumentService.build_metadatas(
+                document.id, document.filename, document.user_id, len(chunks), chunker_key, locations
+            ))
+            batch_docs.append(document.id)
+
+            if len(ids) >= settings.REINDEX_BATCH_SIZE:
+                flush()
+
+        flush()
+
+    def _document_chunks(
+        self,
+        document: Document,
+        source: VectorStore
+    ) -> Tuple[List[str], Optional[str], List[Dict[str, Any]]]:
+        """
+        Get a document's chunk texts without re-parsing when possible
+
+        Returns:
+            Tuple of (chunk texts, chunker key of their sections and stored
+            texts or None, page or section location of each chunk)
+        """
+        if file_storage.exists(document.file_path):
+            # Served from the chunk artifact cache unless chunk settings changed
+            chunks, locations = self.document_service.chunk_document(
+                document.id,
+                document.file_path,
+                document.file_type,
+                document.content_hash
+            )
+            return chunks, self.document_service.chunker_key, locations
+
+        # Copied from the serving collection, keeping their layout (and so their sections)
+        texts, metadatas = source.get_document_chunks(document.id)
+        chunker_key = metadatas[0].get("chunker") if metadatas else None
+        if chunker_key and any(text is None for text in texts):
+            stored = chunk_store.texts(document.id, chunker_key)
+            if stored is None or len(stored) != len(texts):
+                raise Exception(f"Chunk texts of {document.id} are missing and its file is gone")
+            texts = stored
+        locations = [
+            {key: meta[key] for key in ("page_number", "section") if key in meta}
+            for meta in metadatas
+        ]
+        return texts, chunker_key, locations
+
+    @staticmethod
+    def _processed_documents(db: Session) -> List[Document]:
+        return db.query(Document).filter(
+            Document.processed == True,  # noqa: E712
+            Document.deleted_at.is_(None)
+        ).all()
@@ -0,0 +1,182 @@
+"""
+Per-session working set of retrieved chunks
+"""
+from app.config import settings
+from app.utils.quantization import BINARY, QuantizedVectors, top_indices
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+import threading
+import time
+
+
+class WorkingSet:
+    """Chunks recently retrieved in one chat session, most recent first"""
+
+    def __init__(self, collection_name: str, dimension: int, quantization: str):
+        self.collection_name = collection_name
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.vectors = QuantizedVectors(quantization, dimension)
+        self.touched = time.monotonic()
+
+
+class SessionRetrievalCache:
+    """
+    Small in-memory working sets of chunks, one per chat session.
+
+    Turns of the same conversation tend to need the same few chunks. A
+    query is first scored against its session's working set with a single
+    matrix-vector product; the vector store is only searched when the best
+    local similarity is below ``SESSION_CACHE_MIN_SIMILARITY``.
+
+    Working sets live in this process (LRU over sessions, TTL per set).
+    Their chunk IDs are also stored on the ChatSession row, so another
+    worker can rebuild a set with one lookup by ID instead of a search.
+
+    Vectors are held as int8 codes by default (``SESSION_CACHE_QUANTIZATION``),
+    a quarter of the float32 size, with scores within about 1% of exact.
+    Binary codes are rejected: their Hamming estimates are too coarse to
+    rank a working set or compare to the similarity threshold, and
+    rescoring them would need the float vectors they replace.
+    """
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        max_chunks: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        quantization: Optional[str] = None
+    ):
+        self.max_sessions = settings.SESSION_CACHE_MAX_SESSIONS if max_sessions is None else max_sessions
+        self.max_chunks = settings.SESSION_CACHE_MAX_CHUNKS if max_chunks is None else max_chunks
+        self.ttl_seconds = settings.SESSION_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.quantization = quantization or settings.SESSION_CACHE_QUANTIZATION
+        if self.quantization == BINARY:
+            raise ValueError("SESSION_CACHE_QUANTIZATION must be 'none' or 'int8', binary scores are too coarse")
+        self._sets: "OrderedDict[Hashable, WorkingSet]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Hashable, collection_name: str) -> Optional[WorkingSet]:
+        """
+        Get a session's working set
+
+        Sets that expired or were built on another collection (before an
+        index cutover) are dropped.
+        """
+        with self._lock:
+            working_set = self._sets.get(session_id)
+            if working_set is None:
+                return None
+            if (
+                working_set.collection_name != collection_name
+                or time.monotonic() - working_set.touched > self.ttl_seconds
+            ):
+                del self._sets[session_id]
+                return None
+            self._sets.move_to_end(session_id)
+            return working_set
+
+    def search(
+        self,
+        working_set: WorkingSet,
+        query_embedding: Sequence[float],
+        top_k: int
+    ) -> Dict[str, Any]:
+        """
+        Score a query against a working set
+
+        Args:
+            working_set: Session working set
+            query_embedding: Query vector
+            top_k: Maximum results
+
+        Returns:
+            Dictionary shaped like VectorStore.search results, with cosine
+            distances, best first
+        """
+        with self._lock:
+            if not working_set.ids:
+                return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            similarities = working_set.vectors.scores(query_embedding)
+            top = top_indices(similarities, top_k)
+            working_set.touched = time.monotonic()
+            return {
+                "ids": [working_set.ids[i] for i in top],
+                "documents": [working_set.documents[i] for i in top],
+                "metadatas": [working_set.metadatas[i] for i in top],
+                "distances": [float(1 - similarities[i]) for i in top]
+            }
+
+    def add(
+        self,
+        session_id: Hashable,
+        collection_name: str,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]]
+    ) -> List[str]:
+        """
+        Put retrieved chunks at the front of a session's working set
+
+        Args:
+            session_id: Chat session ID
+            collection_name: Collection the chunks came from
+            ids: Chunk IDs
+            documents: Chunk texts
+            metadatas: Chunk metadata
+            embeddings: Chunk vectors
+
+        Returns:
+            List of chunk IDs now in the working set, most recent first
+        """
+        if not ids:
+            working_set = self.get(session_id, collection_name)
+            return list(working_set.ids) if working_set else []
+
+        vectors = QuantizedVectors.encode(embeddings, self.quantization)
+
+        with self._lock:
+            working_set = self._sets.get(session_id)
+            if (
+                working_set is None
+                or working_set.collection_name != collection_name
+                or working_set.vectors.method != self.quantization
+            ):
+                working_set = WorkingSet(collection_name, vectors.dimension, self.quantization)
+
+            new_ids = set(ids)
+            keep = [i for i, chunk_id in enumerate(working_set.ids) if chunk_id not in new_ids]
+            keep = keep[:max(0, self.max_chunks - len(ids))]
+
+            working_set.ids = list(ids)[:self.max_chunks] + [working_set.ids[i] for i in keep]
+            working_set.documents = list(documents)[:self.max_chunks] + [working_set.documents[i] for i in keep]
+            working_set.metadatas = list(metadatas)[:self.max_chunks] + [working_set.metadatas[i] for i in keep]
+            working_set.vectors = vectors.take(range(min(len(ids), self.max_chunks))).concat(
+                working_set.vectors.take(keep)
+            )
+            working_set.touched = time.monotonic()
+
+            self._sets[session_id] = working_set
+            self._sets.move_to_end(session_id)
+            while len(self._sets) > self.max_sessions:
+                self._sets.popitem(last=False)
+            return list(working_set.ids)
+
+    def evict_document(self, doc_id: Hashable) -> None:
+        """Drop a deleted document's chunks from every working set"""
+        doc_id = str(doc_id)
+        with self._lock:
+            for working_set in self._sets.values():
+                keep = [i for i, meta in enumerate(working_set.metadatas) if meta.get("doc_id") != doc_id]
+                if len(keep) == len(working_set.ids):
+                    continue
+                working_set.ids = [working_set.ids[i] for i in keep]
+                working_set.documents = [working_set.documents[i] for i in keep]
+                working_set.metadatas = [working_set.metadatas[i] for i in keep]
+                working_set.vectors = working_set.vectors.take(keep)
+
+
+# Shared by every service in this process
+session_retrieval_cache = SessionRetrievalCache()
@@ -0,0 +1,125 @@
+"""
+Lifecycle policy for stored originals
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import advisory_lock
+from app.models.document import Document
+from app.services.message_buffer import utc_now
+from app.utils.file_storage import COLD, FileStorage, file_storage
+from datetime import timedelta
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StorageLifecycleService:
+    """
+    Moves processed originals off the API nodes.
+
+    Once a document is processed its original is only read to re-parse
+    it, so originals of processed documents uploaded more than
+    ``COLD_STORAGE_AFTER_DAYS`` ago are copied to the cold tier, every row
+    pointing at them is updated, and only then is the hot copy removed.
+    An original shared with a document that is not processed yet stays
+    hot. Running it again after an interruption is safe: copies are
+    content-addressed and rows are only switched after the copy exists.
+    """
+
+    def __init__(self, storage: Optional[FileStorage] = None):
+        self.storage = storage or file_storage
+
+    def candidates(self, db: Session, older_than_days: float, limit: Optional[int] = None) -> List[str]:
+        """
+        Stored originals due for the cold tier
+
+        Args:
+            db: Database session
+            older_than_days: Minimum age of the documents (by upload date)
+            limit: Maximum number of originals
+
+        Returns:
+            File paths / storage URIs, oldest first
+        """
+        cutoff = utc_now() - timedelta(days=older_than_days)
+        rows = db.query(Document.file_path).filter(
+            Document.processed == True,  # noqa: E712
+            Document.deleted_at.is_(None),
+            Document.upload_date <= cutoff,
+            ~Document.file_path.like(f"{COLD}://%")
+        ).group_by(Document.file_path).order_by(func.min(Document.upload_date)).all()
+        paths = [path for (path,) in rows]
+        if not paths:
+            return []
+
+        # Still needed for ingestion by another document with the same content
+        pending = {
+            path for (path,) in db.query(Document.file_path).filter(
+                Document.file_path.in_(paths),
+                Document.processed == False,  # noqa: E712
+                Document.deleted_at.is_(None)
+            ).all()
+        }
+        paths = [path for path in paths if path not in pending]
+        return paths[:limit] if limit else paths
+
+    def tier_cold(
+        self,
+        db: Session,
+        older_than_days: Optional[float] = None,
+        limit: Optional[int] = None,
+        dry_run: bool = False
+    ) -> Dict[str, int]:
+        """
+        Move due originals to the cold tier
+
+        Args:
+            db: Database session
+            older_than_days: Minimum age (defaults to COLD_STORAGE_AFTER_DAYS)
+            limit: Maximum number of originals to move
+            dry_run: Only count what would move
+
+        Returns:
+            Dict with moved, failed and missing counts
+        """
+        if older_than_days is None:
+            older_than_days = settings.COLD_STORAGE_AFTER_DAYS
+        paths = self.candidates(db, older_than_days, limit)
+        result = {"due": len(paths), "moved": 0, "missing": 0, "failed": 0}
+        if dry_run:
+            return result
+
+        for path in paths:
+            if not self.storage.exists(path):
+                result["missing"] += 1
+                continue
+            try:
+                cold_uri = self.storage.copy_to_cold(path)
+                db.query(Document).filter(Document.file_path == path).update(
+                    {Document.file_path: cold_uri}, synchronize_session=False
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                result["failed"] += 1
+                logger.exception("Moving %s to cold storage failed", path)
+                continue
+            # A new upload of the same content may have been pointed at it
+            # meanwhile; its storage lock is held until that row is committed
+            advisory_lock(db, path)
+            if db.query(Document.id).filter(Document.file_path == path).first() is None:
+                self.storage.delete(path)
+            db.commit()
+            result["moved"] += 1
+        return result
+
+    def status(self, db: Session) -> Dict[str, int]:
+        """Number of live documents per storage tier ('legacy' for plain file paths)"""
+        counts: Dict[str, int] = {}
+        rows = db.query(Document.file_path).filter(Document.deleted_at.is_(None)).all()
+        for (path,) in rows:
+            tier = self.storage.tier(path) or "legacy"
+            counts[tier] = counts.get(tier, 0) + 1
+        return counts
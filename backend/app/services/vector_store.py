@@ -1,42 +1,122 @@
 """
 ChromaDB vector store service
 """
-import chromadb
-from chromadb.config import Settings
+from chromadb.api import ClientAPI
 from app.config import settings
-from typing import List, Dict, Any, Optional
+from app.services.chroma_client import ChromaConnection, chroma_connection
+from typing import List, Dict, Any, Optional, Tuple, Union
 from uuid import UUID
+import time
+
+import numpy as np
+
+# float32 matrix from the embedding model (lists of floats are accepted too)
+Vectors = Union[np.ndarray, List[List[float]]]
+
+# Chunk metadata that is not copied to the document index
+CHUNK_ONLY_METADATA = ("chunk_index", "chunker", "page_number", "section")
+# How long a document index count is reused before it is read again
+DOCUMENT_COUNT_TTL = 60.0
+
+
+def document_centroids(
+    embeddings: Vectors,
+    metadatas: List[Dict[str, Any]]
+) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+    """
+    Average the normalized chunk vectors of each document
+
+    Args:
+        embeddings: Chunk embedding matrix
+        metadatas: Chunk metadata, each with a doc_id
+
+    Returns:
+        Tuple of (document IDs, unit-length centroid matrix, document metadata)
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    doc_ids, first, inverse = np.unique(
+        [metadata["doc_id"] for metadata in metadatas], return_index=True, return_inverse=True
+    )
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    centroids = np.zeros((len(doc_ids), vectors.shape[1]), dtype=np.float32)
+    np.add.at(centroids, inverse, vectors / np.maximum(norms, 1e-12))
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    document_metadatas = [
+        {key: value for key, value in metadatas[i].items() if key not in CHUNK_ONLY_METADATA}
+        for i in first
+    ]
+    return [str(doc_id) for doc_id in doc_ids], centroids, document_metadatas
 
 
 class VectorStore:
-    """ChromaDB vector store wrapper"""
-    
-    def __init__(self):
-        """Initialize ChromaDB client"""
-        self.client = chromadb.HttpClient(
-            host=settings.CHROMA_HOST,
-            port=settings.CHROMA_PORT,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        self.collection_name = "technical_documents"
+    """
+    ChromaDB vector store wrapper
+
+    Stores built without a client share the process-wide connection
+    (pooled HTTP client and cached collection handles), so constructing
+    one is cheap; every call goes through its retries and metrics.
+
+    Next to each chunk collection a small document index
+    (``{collection}_docs``) holds one vector per document: the centroid
+    of its chunk vectors. Chat retrieval searches it first and then only
+    the chunks of the closest documents.
+    """
+    
+    DOCUMENT_INDEX_SUFFIX = "_docs"
+    
+    DEFAULT_COLLECTION = "technical_documents"
+    
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        client: Optional[ClientAPI] = None
+    ):
+        """
+        Initialize ChromaDB client
+        
+        Args:
+            collection_name: Collection to use (defaults to the original collection)
+            client: Existing client, e.g. an in-process one (defaults to the HTTP server)
+        """
+        self.connection = chroma_connection if client is None else ChromaConnection(client)
+        self.client = self.connection.client
+        self.collection_name = collection_name or self.DEFAULT_COLLECTION
         self.collection = self._get_or_create_collection()
+        self._document_counts: Dict[str, Tuple[float, int]] = {}
+    
+    def use_collection(self, collection_name: str) -> None:
+        """
+        Point this store at another collection
+        
+        The handle is resolved before it is swapped in, so concurrent
+        readers see either the old or the new collection, never neither.
+        
+        Args:
+            collection_name: Collection to switch to
+        """
+        previous_name = self.collection_name
+        self.collection_name = collection_name
+        try:
+            self.collection = self._get_or_create_collection()
+        except Exception:
+            self.collection_name = previous_name
+            raise
     
     def _get_or_create_collection(self):
         """Get or create the documents collection"""
-        try:
-            collection = self.client.get_collection(name=self.collection_name)
-        except:
-            collection = self.client.create_collection(
-                name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
-        return collection
+        return self.connection.collection(self.collection_name)
+    
+    @property
+    def document_collection(self):
+        """Document index of the current collection"""
+        return self.connection.collection(f"{self.collection_name}{self.DOCUMENT_INDEX_SUFFIX}")
     
     def add_documents(
         self,
         doc_id: UUID,
         chunks: List[str],
-        embeddings: List[List[float]],
+        embeddings: Vectors,
         metadatas: List[Dict[str, Any]]
     ) -> None:
         """
@@ -45,24 +125,185 @@ class VectorStore:
         Args:
             doc_id: Document UUID
             chunks: List of text chunks
-            embeddings: List of embeddings for each chunk
+            embeddings: Embedding matrix, one row per chunk
             metadatas: List of metadata dicts for each chunk
         """
         # Generate unique IDs for each chunk
         ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
         
-        self.collection.add(
+        self.add_chunks(
             ids=ids,
-            documents=chunks,
+            chunks=chunks,
             embeddings=embeddings,
             metadatas=metadatas
         )
     
+    def add_chunks(
+        self,
+        ids: List[str],
+        chunks: List[str],
+        embeddings: Vectors,
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Add chunks from any number of documents in as few calls as possible
+        
+        Writes are split only where the server's maximum batch size
+        requires it. Upserts keep retried ingestion runs idempotent.
+        
+        Chunks whose metadata has a chunker key keep their text in the
+        local chunk store (written by DocumentService.chunk_document), so
+        only their IDs, vectors and metadata are sent; search results then
+        have None in place of their text.
+        
+        The centroid of each document's chunks is written to the document
+        index, so every call must contain all chunks of its documents.
+        
+        Args:
+            ids: Unique chunk IDs
+            chunks: List of text chunks
+            embeddings: Embedding matrix, one row per chunk
+            metadatas: List of metadata dicts for each chunk
+        """
+        batch_size = self.client.get_max_batch_size()
+        documents = [
+            None if metadata.get("chunker") else chunk
+            for chunk, metadata in zip(chunks, metadatas)
+        ]
+        
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.connection.call(
+                "upsert",
+                self.collection.upsert,
+                ids=ids[start:end],
+                documents=documents[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end]
+            )
+        
+        if ids:
+            self.add_document_vectors(*document_centroids(embeddings, metadatas))
+    
+    def add_document_vectors(
+        self,
+        doc_ids: List[str],
+        embeddings: Vectors,
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Write document vectors to the document index
+        
+        Args:
+            doc_ids: Document UUIDs (as strings)
+            embeddings: One vector per document
+            metadatas: Document metadata (doc_id, filename, user_id, ...)
+        """
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(doc_ids), batch_size):
+            end = start + batch_size
+            self.connection.call(
+                "upsert",
+                self.document_collection.upsert,
+                ids=doc_ids[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end]
+            )
+    
+    def search_documents(
+        self,
+        query_embedding: Union[np.ndarray, List[float]],
+        top_k: int = 10,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Find the documents closest to a query by their centroid vector
+        
+        Args:
+            query_embedding: Query embedding vector
+            top_k: Number of documents to return
+            filter_metadata: Optional metadata filter (e.g. excluding tombstones)
+            
+        Returns:
+            Dictionary with ids (document UUIDs), metadatas and distances
+        """
+        results = self.connection.call(
+            "query",
+            self.document_collection.query,
+            query_embeddings=[query_embedding],
+            n_results=top_k,
+            where=filter_metadata,
+            include=["metadatas", "distances"]
+        )
+        return {
+            "ids": results['ids'][0] if results['ids'] else [],
+            "metadatas": results['metadatas'][0] if results['metadatas'] else [],
+            "distances": results['distances'][0] if results['distances'] else []
+        }
+    
+    def document_count(self) -> int:
+        """Number of documents in the document index, re-read at most every minute"""
+        now = time.monotonic()
+        cached = self._document_counts.get(self.collection_name)
+        if cached is None or now - cached[0] > DOCUMENT_COUNT_TTL:
+            cached = (now, self.connection.call("count", self.document_collection.count))
+            self._document_counts[self.collection_name] = cached
+        return cached[1]
+    
+    def build_document_index(self, page_size: int = 1000) -> int:
+        """
+        Compute the document vectors of every document from its stored chunks
+        
+        For collections indexed before the document index existed; one
+        pass over the collection, holding one running sum per document.
+        
+        Args:
+            page_size: Chunks fetched per call
+            
+        Returns:
+            int: Number of documents written
+        """
+        sums: Dict[str, np.ndarray] = {}
+        metadatas: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        while True:
+            page = self.connection.call(
+                "get",
+                self.collection.get,
+                include=["embeddings", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            
+            vectors = np.asarray(page['embeddings'], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            for vector, metadata in zip(vectors, page['metadatas']):
+                doc_id = metadata["doc_id"]
+                if doc_id in sums:
+                    sums[doc_id] += vector
+                else:
+                    sums[doc_id] = vector.copy()
+                    metadatas[doc_id] = {
+                        key: value for key, value in metadata.items() if key not in CHUNK_ONLY_METADATA
+                    }
+        
+        if not sums:
+            return 0
+        doc_ids = list(sums)
+        vectors = np.stack([sums[doc_id] for doc_id in doc_ids])
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.add_document_vectors(doc_ids, vectors, [metadatas[doc_id] for doc_id in doc_ids])
+        return len(doc_ids)
+    
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = 5,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False
     ) -> Dict[str, Any]:
         """
         Search for similar documents
@@ -71,22 +312,96 @@ class VectorStore:
             query_embedding: Query embedding vector
             top_k: Number of results to return
             filter_metadata: Optional metadata filter
+            include_embeddings: Also return the stored chunk vectors
             
         Returns:
             Dictionary with ids, documents, metadatas, and distances
+            (and embeddings when requested)
         """
-        results = self.collection.query(
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        
+        results = self.connection.call(
+            "query",
+            self.collection.query,
             query_embeddings=[query_embedding],
             n_results=top_k,
-            where=filter_metadata
+            where=filter_metadata,
+            include=include
         )
         
-        return {
+        output = {
             "ids": results['ids'][0] if results['ids'] else [],
             "documents": results['documents'][0] if results['documents'] else [],
             "metadatas": results['metadatas'][0] if results['metadatas'] else [],
             "distances": results['distances'][0] if results['distances'] else []
         }
+        if include_embeddings:
+            embeddings = results.get('embeddings')
+            output["embeddings"] = embeddings[0] if embeddings is not None and len(embeddings) else []
+        return output
+
+    def search_many(
+        self,
+        query_embeddings: Vectors,
+        top_k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for many queries with one query call per batch
+
+        Args:
+            query_embeddings: Query embedding vectors
+            top_k: Number of results to return per query
+            filter_metadata: Optional metadata filter applied to every query
+
+        Returns:
+            One dictionary per query, in input order, shaped like search()
+        """
+        batch_size = min(self.client.get_max_batch_size(), settings.BATCH_QUERY_SEARCH_BATCH_SIZE)
+        outputs = []
+
+        for start in range(0, len(query_embeddings), batch_size):
+            results = self.connection.call(
+                "query",
+                self.collection.query,
+                query_embeddings=query_embeddings[start:start + batch_size],
+                n_results=top_k,
+                where=filter_metadata,
+                include=["documents", "metadatas", "distances"]
+            )
+            for i in range(len(results['ids'])):
+                outputs.append({
+                    "ids": results['ids'][i],
+                    "documents": results['documents'][i] if results['documents'] else [],
+                    "metadatas": results['metadatas'][i] if results['metadatas'] else [],
+                    "distances": results['distances'][i] if results['distances'] else []
+                })
+        return outputs
+
+    def get_chunks(self, ids: List[str]) -> Dict[str, Any]:
+        """
+        Fetch stored chunks by ID, with their vectors
+        
+        IDs that no longer exist are left out of the result.
+        
+        Args:
+            ids: Chunk IDs
+            
+        Returns:
+            Dictionary with ids, documents, metadatas and embeddings
+        """
+        results = self.connection.call(
+            "get", self.collection.get, ids=ids, include=["documents", "metadatas", "embeddings"]
+        )
+        embeddings = results.get('embeddings')
+        return {
+            "ids": results['ids'],
+            "documents": results['documents'],
+            "metadatas": results['metadatas'],
+            "embeddings": embeddings if embeddings is not None else []
+        }
     
     def delete_document(self, doc_id: UUID) -> None:
         """
@@ -95,18 +410,62 @@ class VectorStore:
         Args:
             doc_id: Document UUID
         """
-        # Get all chunk IDs for this document
-        results = self.collection.get(
-            where={"doc_id": str(doc_id)}
-        )
+        self.delete_documents([doc_id])
+    
+    def delete_documents(self, doc_ids: List[UUID], batch_size: Optional[int] = None) -> None:
+        """
+        Delete all chunks (and document vectors) for many documents
         
-        if results['ids']:
-            self.collection.delete(ids=results['ids'])
+        Chunks are matched by metadata on the server, so their IDs are
+        never fetched; each call covers ``batch_size`` documents.
+        
+        Args:
+            doc_ids: Document UUIDs
+            batch_size: Documents per delete call (defaults to DOCUMENT_PURGE_BATCH_SIZE)
+        """
+        batch_size = batch_size or settings.DOCUMENT_PURGE_BATCH_SIZE
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        
+        for start in range(0, len(doc_ids), batch_size):
+            batch = doc_ids[start:start + batch_size]
+            self.connection.call("delete", self.collection.delete, where={"doc_id": {"$in": batch}})
+            self.connection.call("delete", self.document_collection.delete, ids=batch)
+    
+    def get_document_chunks(self, doc_id: UUID) -> Tuple[List[Optional[str]], List[Dict[str, Any]]]:
+        """
+        Get the stored chunks of a document in chunk order
+        
+        Args:
+            doc_id: Document UUID
+            
+        Returns:
+            Tuple of (chunk texts, None for chunks whose text is in the
+            chunk store; chunk metadata)
+        """
+        results = self.connection.call(
+            "get",
+            self.collection.get,
+            where={"doc_id": str(doc_id)},
+            include=["documents", "metadatas"]
+        )
+        ordered = sorted(
+            zip(results['metadatas'], results['documents']),
+            key=lambda pair: pair[0].get("chunk_index", 0)
+        )
+        return [text for _, text in ordered], [meta for meta, _ in ordered]
+    
+    def has_document(self, doc_id: UUID) -> bool:
+        """Check whether any chunk of a document is stored"""
+        results = self.connection.call(
+            "get", self.collection.get, where={"doc_id": str(doc_id)}, limit=1, include=[]
+        )
+        return bool(results['ids'])
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get collection statistics"""
-        count = self.collection.count()
+        count = self.connection.call("count", self.collection.count)
         return {
             "collection_name": self.collection_name,
-            "total_chunks": count
+            "total_chunks": count,
+            "total_documents": self.connection.call("count", self.document_collection.count)
         }
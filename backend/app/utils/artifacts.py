@@ -0,0 +1,195 @@
+"""
+On-disk cache of parsed text and chunk lists
+"""
+from app.config import settings
+from typing import List, Dict, Any, Optional, Tuple, Union
+import gzip
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactCache:
+    """
+    Gzip-compressed JSONL artifacts keyed by file content hash.
+
+    Layout::
+
+        {ARTIFACT_DIR}/{hash[:2]}/{hash}/pages-v{parser_version}.jsonl.gz
+        {ARTIFACT_DIR}/{hash[:2]}/{hash}/chunks-{chunker_key}.jsonl.gz
+        {ARTIFACT_DIR}/{hash[:2]}/{hash}/ocr-{ocr_key}.jsonl.gz   (hash of a rendered page)
+
+    The first line of every artifact is a header describing how it was
+    produced; the remaining lines hold one page or chunk each, and chunk
+    artifacts end with the parent sections the chunks were split from.
+    Because the key is the content hash, identical files uploaded twice
+    share their artifacts.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.ARTIFACT_DIR
+
+    @staticmethod
+    def make_key(**config: Any) -> str:
+        """
+        Derive a short stable key from the settings that produced an artifact
+
+        Args:
+            **config: Settings that influence the artifact content
+
+        Returns:
+            str: 12 character hex key
+        """
+        payload = json.dumps(config, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+    def load_pages(
+        self,
+        content_hash: str,
+        parser_version: Union[int, str]
+    ) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Load cached parser output
+
+        Args:
+            content_hash: SHA-256 of the source file
+            parser_version: Parser version (and OCR key) the pages must come from
+
+        Returns:
+            Tuple of (pages, page_count), or None on a cache miss
+        """
+        loaded = self._read(self._pages_path(content_hash, parser_version))
+        if loaded is None:
+            return None
+        header, records = loaded
+        return records, header["page_count"]
+
+    def save_pages(
+        self,
+        content_hash: str,
+        parser_version: Union[int, str],
+        pages: List[Dict[str, Any]],
+        page_count: int
+    ) -> None:
+        """Persist parser output"""
+        self._write(
+            self._pages_path(content_hash, parser_version),
+            {"parser_version": parser_version, "page_count": page_count},
+            pages
+        )
+
+    def load_chunks(
+        self,
+        content_hash: str,
+        chunker_key: str
+    ) -> Optional[Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Load a cached chunk list
+
+        Args:
+            content_hash: SHA-256 of the source file
+            chunker_key: Key of the chunking configuration
+
+        Returns:
+            Tuple of (chunk texts, parent sections, location of each chunk),
+            or None on a cache miss
+        """
+        loaded = self._read(self._chunks_path(content_hash, chunker_key))
+        if loaded is None or not loaded[0].get("located"):
+            return None  # written before chunk locations were kept
+        records = loaded[1]
+        chunk_records = [record for record in records if "section" not in record]
+        sections = [
+            {"start": record["section"][0], "end": record["section"][1], "text": record["text"]}
+            for record in records if "section" in record
+        ]
+        return (
+            [record["text"] for record in chunk_records],
+            sections,
+            [record.get("location", {}) for record in chunk_records]
+        )
+
+    def save_chunks(
+        self,
+        content_hash: str,
+        chunker_key: str,
+        chunks: List[str],
+        sections: Optional[List[Dict[str, Any]]] = None,
+        locations: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """Persist a chunk list, the parent sections it was split from and where each chunk is"""
+        sections = sections or []
+        locations = locations or [{} for _ in chunks]
+        self._write(
+            self._chunks_path(content_hash, chunker_key),
+            {"chunker_key": chunker_key, "count": len(chunks), "sections": len(sections), "located": True},
+            [
+                {"text": chunk, "location": location} if location else {"text": chunk}
+                for chunk, location in zip(chunks, locations)
+            ] + [
+                {"section": [section["start"], section["end"]], "text": section["text"]}
+                for section in sections
+            ]
+        )
+
+    def load_ocr(self, page_hash: str, ocr_key: str) -> Optional[str]:
+        """
+        Load the cached OCR text of a rendered page
+
+        Args:
+            page_hash: SHA-256 of the rendered page bitmap
+            ocr_key: Key of the OCR configuration
+
+        Returns:
+            Page text, or None on a cache miss
+        """
+        loaded = self._read(self._ocr_path(page_hash, ocr_key))
+        if loaded is None:
+            return None
+        return loaded[1][0]["text"] if loaded[1] else ""
+
+    def save_ocr(self, page_hash: str, ocr_key: str, text: str) -> None:
+        """Persist the OCR text of a rendered page"""
+        self._write(self._ocr_path(page_hash, ocr_key), {"ocr_key": ocr_key}, [{"text": text}])
+
+    def _dir(self, content_hash: str) -> str:
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def _pages_path(self, content_hash: str, parser_version: Union[int, str]) -> str:
+        return os.path.join(self._dir(content_hash), f"pages-v{parser_version}.jsonl.gz")
+
+    def _chunks_path(self, content_hash: str, chunker_key: str) -> str:
+        return os.path.join(self._dir(content_hash), f"chunks-{chunker_key}.jsonl.gz")
+
+    def _ocr_path(self, page_hash: str, ocr_key: str) -> str:
+        return os.path.join(self._dir(page_hash), f"ocr-{ocr_key}.jsonl.gz")
+
+    @staticmethod
+    def _read(path: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Read an artifact; unreadable files are dropped and reported as a miss"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                records = [json.loads(line) for line in f]
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning("Discarding unreadable artifact %s: %s", path, e)
+            os.remove(path)
+            return None
+        return header, records
+
+    @staticmethod
+    def _write(path: str, header: Dict[str, Any], records: List[Dict[str, Any]]) -> None:
+        """Write an artifact atomically so concurrent readers never see a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(json.dumps(header) + "\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
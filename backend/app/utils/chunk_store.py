@@ -0,0 +1,151 @@
+"""
+Memory-mapped local store of chunk texts
+"""
+from app.config import settings
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional, Tuple
+import glob
+import mmap
+import os
+import struct
+import threading
+import uuid
+
+import numpy as np
+
+MAGIC = b"ACS1"
+# Chunk count and magic at the end of every segment
+FOOTER = struct.Struct("<Q4s")
+
+
+class ChunkTextStore:
+    """
+    Chunk texts of each document in one immutable segment file.
+
+    Layout::
+
+        {CHUNK_STORE_DIR}/{doc_id[:2]}/{doc_id}-{chunker_key}.seg
+
+        [chunk texts, UTF-8, back to back]
+        [offsets: chunk_count + 1 little-endian uint64]
+        [chunk_count: uint64][b"ACS1"]
+
+    The vector store keeps only IDs, vectors and metadata for chunks
+    whose metadata has a chunker key; their texts are read from here
+    when a prompt is built. Segments are written once (atomically, via a
+    temporary file) and memory-mapped on first read, so a lookup is an
+    offset-index read and a slice of the page cache, with no network
+    round trip and no copy until the text is decoded. Up to
+    ``CHUNK_STORE_MAX_OPEN`` segments stay mapped per process.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_open: Optional[int] = None):
+        self.root = root or settings.CHUNK_STORE_DIR
+        self.max_open = settings.CHUNK_STORE_MAX_OPEN if max_open is None else max_open
+        self._open: "OrderedDict[Tuple[str, str], Tuple[mmap.mmap, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, doc_id: Hashable, chunker_key: str, chunks: List[str]) -> None:
+        """
+        Write the chunk texts of a document for one chunk layout
+
+        Args:
+            doc_id: Document UUID
+            chunker_key: Key of the chunking configuration
+            chunks: Chunk texts in chunk_index order
+        """
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+        path = self._path(str(doc_id), chunker_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            for data in encoded:
+                f.write(data)
+            f.write(offsets.tobytes())
+            f.write(FOOTER.pack(len(encoded), MAGIC))
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._open.pop((str(doc_id), chunker_key), None)
+
+    def get(self, doc_id: Hashable, chunker_key: str, chunk_index: int) -> Optional[memoryview]:
+        """
+        Zero-copy view of one chunk's UTF-8 bytes
+
+        Returns:
+            View into the mapped segment, or None if the chunk is not stored
+        """
+        segment = self._segment(str(doc_id), chunker_key)
+        if segment is None:
+            return None
+        data, offsets = segment
+        if not 0 <= chunk_index < len(offsets) - 1:
+            return None
+        return memoryview(data)[int(offsets[chunk_index]):int(offsets[chunk_index + 1])]
+
+    def text(self, doc_id: Hashable, chunker_key: str, chunk_index: int) -> Optional[str]:
+        """Text of one chunk, or None if it is not stored"""
+        view = self.get(doc_id, chunker_key, chunk_index)
+        return str(view, "utf-8") if view is not None else None
+
+    def texts(self, doc_id: Hashable, chunker_key: str) -> Optional[List[str]]:
+        """All chunk texts of a document in chunk_index order, or None if not stored"""
+        segment = self._segment(str(doc_id), chunker_key)
+        if segment is None:
+            return None
+        data, offsets = segment
+        view = memoryview(data)
+        return [
+            str(view[int(start):int(end)], "utf-8")
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def delete(self, doc_ids: Iterable[Hashable]) -> None:
+        """Remove every segment of the given documents"""
+        for doc_id in doc_ids:
+            doc_id = str(doc_id)
+            with self._lock:
+                for key in [key for key in self._open if key[0] == doc_id]:
+                    # Not closed: views handed out earlier may still point into it
+                    del self._open[key]
+            for path in glob.glob(self._path(doc_id, "*")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _path(self, doc_id: str, chunker_key: str) -> str:
+        return os.path.join(self.root, doc_id[:2], f"{doc_id}-{chunker_key}.seg")
+
+    def _segment(self, doc_id: str, chunker_key: str) -> Optional[Tuple[mmap.mmap, np.ndarray]]:
+        key = (doc_id, chunker_key)
+        with self._lock:
+            segment = self._open.get(key)
+            if segment is not None:
+                self._open.move_to_end(key)
+                return segment
+
+        try:
+            with open(self._path(doc_id, chunker_key), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None  # missing or empty
+        count, magic = FOOTER.unpack(data[-FOOTER.size:])
+        if magic != MAGIC:
+            return None
+        index_start = len(data) - FOOTER.size - 8 * (count + 1)
+        offsets = np.frombuffer(data, dtype="<u8", count=count + 1, offset=index_start)
+
+        with self._lock:
+            self._open[key] = (data, offsets)
+            self._open.move_to_end(key)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return data, offsets
+
+
+# Shared by every service in this process
+chunk_store = ChunkTextStore()
@@ -0,0 +1,255 @@
+"""
+Token-sized chunking along document structure
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the cut rules change so cached chunk lists are rebuilt
+CHUNKER_VERSION = 1
+
+# Text is tokenized in pieces of about this many characters, in one batch
+PIECE_CHARS = 16384
+
+# How good a place between two tokens is to cut (higher is better)
+INSIDE_WORD = 0
+WORD = 1
+SENTENCE = 2
+LINE = 3
+PARAGRAPH = 4
+HEADING = 5
+PAGE = 6
+
+# Cuts at or above this level are structural: sections end there, chunks
+# do not overlap across them and may be as short as a quarter of the budget
+STRUCTURAL = PARAGRAPH
+
+PAGE_PATTERN = re.compile(r"^--- Page \d+ ---$", re.MULTILINE)
+# Numbered section titles ("3.2.1 Hydraulic Pump") and short all-caps lines
+HEADING_PATTERN = re.compile(
+    r"^(?:\d+(?:\.\d+)+\.?[ \t]+[A-Z][^\n]{0,80}(?<![.:;,])"
+    r"|(?=[^\n]*[A-Z]{3})[A-Z0-9][A-Z0-9 \t\-/&,()]{3,80})$",
+    re.MULTILINE
+)
+PARAGRAPH_PATTERN = re.compile(r"\n[ \t]*\n")
+LINE_PATTERN = re.compile(r"\n")
+SENTENCE_PATTERN = re.compile(r"[.!?](?=\s)")
+
+
+class TokenChunker:
+    """
+    Splits text into sections and chunks measured in model tokens.
+
+    Character sizes only approximate what the embedding model sees: a
+    400-character chunk of part numbers and torque tables can exceed the
+    model's max sequence length, and the model silently drops the rest.
+    The text is tokenized once (``encode_batch`` over line-aligned pieces,
+    so the Rust tokenizer runs them in parallel) and chunks are cut on the
+    token offsets, so every chunk fits the model and chunk texts are exact
+    slices of the document.
+
+    Each gap between two tokens gets a cut level: page marker (from
+    ``DocumentParser.join_pages``), heading, blank line, line break,
+    sentence end, word gap. A chunk ends at the best level in the last
+    half of its budget, or anywhere after the first quarter for
+    structural (paragraph or stronger) boundaries, taking the latest
+    position on ties. Overlap starts at the best boundary within the last
+    ``overlap_tokens`` and is skipped after structural cuts. Every step
+    looks at a bounded window, so splitting is linear in the text length.
+
+    Args:
+        tokenizer: ``tokenizers.Tokenizer`` of the embedding model
+        chunk_tokens: Child chunk size
+        overlap_tokens: Tokens repeated from the end of the previous chunk
+        section_tokens: Parent section size (0 for no sections)
+        max_tokens: Max sequence length of the embedding model; chunks
+            are kept below it including the special tokens
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        chunk_tokens: int,
+        overlap_tokens: int,
+        section_tokens: int = 0,
+        max_tokens: Optional[int] = None
+    ):
+        # A copy: the embedding model keeps using its own truncation settings
+        self.tokenizer = type(tokenizer).from_str(tokenizer.to_str())
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+
+        if max_tokens:
+            limit = max_tokens - len(self.tokenizer.encode("", add_special_tokens=True).ids)
+            if chunk_tokens > limit:
+                logger.warning(
+                    "CHUNK_TOKENS=%d exceeds what the embedding model reads; using %d",
+                    chunk_tokens, limit
+                )
+                chunk_tokens = limit
+        self.chunk_tokens = max(chunk_tokens, 1)
+        self.overlap_tokens = max(min(overlap_tokens, self.chunk_tokens // 2), 0)
+        self.section_tokens = max(section_tokens, self.chunk_tokens) if section_tokens > 0 else 0
+
+    def split(self, text: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Split text into parent sections and each section into child chunks
+
+        Args:
+            text: Document text
+
+        Returns:
+            Tuple of (child chunk texts in document order, sections with
+            the range of child indexes [start, end) and text of each);
+            no sections when section_tokens is 0
+        """
+        starts, ends = self.tokenize(text)
+        if not len(starts):
+            return [], []
+        levels = self.cut_levels(text, starts, ends)
+
+        def span_text(lo: int, hi: int) -> str:
+            return text[starts[lo]:ends[hi - 1]]
+
+        if not self.section_tokens:
+            return [
+                span_text(lo, hi)
+                for lo, hi in self._spans(levels, 0, len(starts), self.chunk_tokens, self.overlap_tokens)
+            ], []
+
+        chunks, sections = [], []
+        for section_lo, section_hi in self._spans(levels, 0, len(starts), self.section_tokens, 0):
+            children = [
+                span_text(lo, hi)
+                for lo, hi in self._spans(levels, section_lo, section_hi, self.chunk_tokens, self.overlap_tokens)
+            ]
+            sections.append({
+                "start": len(chunks),
+                "end": len(chunks) + len(children),
+                "text": span_text(section_lo, section_hi)
+            })
+            chunks.extend(children)
+        return chunks, sections
+
+    def tokenize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Character offsets of the tokens of a text, without special tokens
+
+        Args:
+            text: Text to tokenize
+
+        Returns:
+            Tuple of (start offsets, end offsets), one entry per token
+        """
+        pieces: List[Tuple[int, str]] = []
+        position = 0
+        while position < len(text):
+            end = min(position + PIECE_CHARS, len(text))
+            if end < len(text):
+                # Break at whitespace so no token straddles two pieces
+                cut = text.rfind("\n", position, end)
+                if cut <= position:
+                    cut = text.rfind(" ", position, end)
+                if cut > position:
+                    end = cut
+            pieces.append((position, text[position:end]))
+            position = end
+
+        starts, ends = [], []
+        encodings = self.tokenizer.encode_batch([piece for _, piece in pieces], add_special_tokens=False)
+        for (offset, _), encoding in zip(pieces, encodings):
+            offsets = np.asarray(encoding.offsets, dtype=np.int64).reshape(-1, 2) + offset
+            starts.append(offsets[:, 0])
+            ends.append(offsets[:, 1])
+        if not starts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(starts), np.concatenate(ends)
+
+    @staticmethod
+    def cut_levels(text: str, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Cut level of every token boundary
+
+        Args:
+            text: Tokenized text
+            starts, ends: Token offsets from tokenize()
+
+        Returns:
+            int8 array of length tokens + 1; entry i rates a cut before token i
+        """
+        count = len(starts)
+        levels = np.full(count + 1, INSIDE_WORD, dtype=np.int8)
+        levels[1:count][starts[1:] > ends[:-1]] = WORD
+
+        for pattern, level, at_start in (
+            (SENTENCE_PATTERN, SENTENCE, False),
+            (LINE_PATTERN, LINE, False),
+            (PARAGRAPH_PATTERN, PARAGRAPH, False),
+            (HEADING_PATTERN, HEADING, True),
+            (PAGE_PATTERN, PAGE, True)
+        ):
+            positions = np.fromiter(
+                (match.start() if at_start else match.end() for match in pattern.finditer(text)),
+                dtype=np.int64
+            )
+            # The cut goes before the first token at or after the position
+            indexes = np.searchsorted(starts, positions)
+            levels[indexes] = np.maximum(levels[indexes], level)
+
+        levels[0] = levels[count] = PAGE
+        return levels
+
+    @staticmethod
+    def _spans(levels: np.ndarray, lo: int, hi: int, budget: int, overlap: int) -> List[Tuple[int, int]]:
+        """Token ranges [start, end) covering tokens lo..hi in chunks of at most budget"""
+        spans = []
+        start = lo
+        while start < hi:
+            if hi - start <= budget:
+                spans.append((start, hi))
+                break
+
+            end = TokenChunker._best_cut(levels, start + max(budget // 4, 1), start + budget)
+            if levels[end] < STRUCTURAL:
+                end = TokenChunker._best_cut(levels, start + max(budget // 2, 1), start + budget)
+            spans.append((start, end))
+
+            next_start = end
+            if overlap and levels[end] < STRUCTURAL:
+                first = max(end - overlap, start + 1)
+                window = levels[first:end]
+                if len(window) and window.max() >= WORD:
+                    next_start = first + int(np.argmax(window))  # earliest best: longest overlap
+            start = next_start
+        return spans
+
+    @staticmethod
+    def _best_cut(levels: np.ndarray, first: int, last: int) -> int:
+        """Latest position in [first, last] with the highest cut level"""
+        window = levels[first:last + 1]
+        return last - int(np.argmax(window[::-1]))
+
+
+def load_tokenizer(name: str, model: Any = None) -> Any:
+    """
+    Fast tokenizer for chunking
+
+    Args:
+        name: Path of a tokenizer.json file, or Hugging Face model name
+        model: Loaded SentenceTransformer whose tokenizer to reuse
+            (avoids a download; ignored when name is a file)
+
+    Returns:
+        tokenizers.Tokenizer
+    """
+    from tokenizers import Tokenizer
+    if name.endswith(".json"):
+        return Tokenizer.from_file(name)
+    backend = getattr(getattr(model, "tokenizer", None), "backend_tokenizer", None)
+    if backend is not None:
+        return backend
+    return Tokenizer.from_pretrained(name)
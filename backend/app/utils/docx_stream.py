@@ -0,0 +1,166 @@
+"""
+Streaming DOCX text extraction
+"""
+from typing import Dict, Any, Iterator, List, Optional
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+HEADING_STYLE = re.compile(r"^heading\s*(\d)$", re.IGNORECASE)
+
+
+def _read_heading_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """
+    Map paragraph style IDs to heading levels
+
+    Style IDs are localized in non-English documents (e.g. '1' or
+    'Titre1'), so levels are taken from the style name or its outline
+    level in word/styles.xml rather than from the ID.
+    """
+    levels: Dict[str, int] = {}
+    try:
+        styles = archive.read("word/styles.xml")
+    except KeyError:
+        return levels
+
+    for style in ET.fromstring(styles).iter(f"{W}style"):
+        style_id = style.get(f"{W}styleId")
+        name = style.find(f"{W}name")
+        name = name.get(f"{W}val", "") if name is not None else ""
+        outline = style.find(f"{W}pPr/{W}outlineLvl")
+
+        match = HEADING_STYLE.match(name)
+        if name.lower() == "title":
+            levels[style_id] = 0
+        elif match:
+            levels[style_id] = int(match.group(1))
+        elif outline is not None:
+            levels[style_id] = int(outline.get(f"{W}val", "9")) + 1
+    return levels
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the text blocks of a DOCX file in document order
+
+    ``word/document.xml`` is read incrementally with iterparse; every
+    finished paragraph and table is cleared and then dropped from the
+    body, so memory stays flat regardless of the document size. Nested
+    tables and text boxes are flattened into their enclosing cell or
+    paragraph.
+
+    Args:
+        file_path: Path to the DOCX file
+
+    Yields:
+        Dict with 'kind' ('heading', 'paragraph' or 'table_row'), 'text',
+        'level' (headings only) and 'section' (the heading path the block
+        belongs to)
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        heading_levels = _read_heading_styles(archive)
+
+        with archive.open("word/document.xml") as xml:
+            paragraphs: List[List[str]] = []  # stack: text boxes nest paragraphs
+            styles: List[Optional[str]] = []
+            cells: List[List[str]] = []  # paragraphs of the innermost open cell
+            row: List[str] = []
+            header: List[str] = []
+            table_depth = 0
+            row_index = 0
+            headings: List[tuple] = []  # (level, text) of the current section path
+            body = None
+
+            for event, elem in ET.iterparse(xml, events=("start", "end")):
+                tag = elem.tag
+
+                if event == "start":
+                    if tag == f"{W}body":
+                        body = elem
+                    elif tag == f"{W}p":
+                        paragraphs.append([])
+                        styles.append(None)
+                    elif tag == f"{W}tbl":
+                        table_depth += 1
+                        if table_depth == 1:
+                            header, row_index = [], 0
+                    elif tag == f"{W}tc":
+                        cells.append([])
+                    continue
+
+                if tag == f"{W}t" and paragraphs:
+                    paragraphs[-1].append(elem.text or "")
+                elif tag == f"{W}tab" and paragraphs:
+                    paragraphs[-1].append("\t")
+                elif tag in (f"{W}br", f"{W}cr") and paragraphs:
+                    paragraphs[-1].append("\n")
+                elif tag == f"{W}pStyle" and styles:
+                    styles[-1] = elem.get(f"{W}val")
+
+                elif tag == f"{W}p":
+                    text = "".join(paragraphs.pop()).strip()
+                    style = styles.pop()
+                    elem.clear()
+                    if body is not None and not paragraphs and not cells and not table_depth:
+                        body.clear()  # the cleared shell would stay in the tree otherwise
+                    if not text:
+                        continue
+                    if paragraphs:
+                        # Paragraph inside a text box: fold into the host paragraph
+                        paragraphs[-1].append(" " + text)
+                    elif cells:
+                        cells[-1].append(text)
+                    elif style in heading_levels:
+                        level = heading_levels[style]
+                        headings = [h for h in headings if h[0] < level] + [(level, text)]
+                        yield {
+                            "kind": "heading",
+                            "text": text,
+                            "level": level,
+                            "section": " > ".join(h[1] for h in headings)
+                        }
+                    else:
+                        yield {
+                            "kind": "paragraph",
+                            "text": text,
+                            "section": " > ".join(h[1] for h in headings)
+                        }
+
+                elif tag == f"{W}tc":
+                    cell_text = " ".join(cells.pop())
+                    if cells:
+                        # Nested table cell: flatten into the enclosing cell
+                        cells[-1].append(cell_text)
+                    elif table_depth == 1:
+                        row.append(cell_text)
+
+                elif tag == f"{W}tr" and table_depth == 1:
+                    if any(row):
+                        if row_index == 0:
+                            header = row
+                            text = " | ".join(row)
+                        else:
+                            # Repeat the header on every row so a chunk holding
+                            # a single row still says what each value means
+                            text = " | ".join(
+                                f"{header[i]}: {value}" if i < len(header) and header[i] else value
+                                for i, value in enumerate(row)
+                            )
+                        row_index += 1
+                        yield {
+                            "kind": "table_row",
+                            "text": text,
+                            "section": " > ".join(h[1] for h in headings)
+                        }
+                    row = []
+                    elem.clear()
+
+                elif tag == f"{W}tbl":
+                    table_depth -= 1
+                    if table_depth == 0:
+                        elem.clear()
+                        if body is not None:
+                            body.clear()
@@ -1,30 +1,52 @@
-from typing import List
-from langchain_huggingface import HuggingFaceEmbeddings
+from typing import List, Optional
 from app.config import settings
 
+import numpy as np
+
 class GeminiEmbeddings:
     """
     Wrapper for Embeddings (Validating to HuggingFace for free tier)
-    Keeping class name 'GeminiEmbeddings' to avoid refactoring all imports immediately, 
+    Keeping class name 'GeminiEmbeddings' to avoid refactoring all imports immediately,
     but strictly using local HuggingFace model.
+
+    Vectors are returned as contiguous float32 NumPy arrays (one row per
+    text for batches) and passed to the vector store as they are, instead
+    of as lists of Python floats.
     """
-    
-    def __init__(self):
+
+    def __init__(self, model_name: Optional[str] = None):
         # settings.EMBEDDING_MODEL should be 'sentence-transformers/all-MiniLM-L6-v2'
-        self.client = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        self.load(model_name or settings.EMBEDDING_MODEL)
+
+    def load(self, model_name: str) -> None:
+        """Load (or switch to) the given embedding model"""
+        # Imported here so processes that never embed do not pay for loading torch
+        from sentence_transformers import SentenceTransformer
+        if settings.EMBEDDING_THREADS > 0:
+            # Several worker processes share the cores; don't let each one use all of them
+            import torch
+            torch.set_num_threads(settings.EMBEDDING_THREADS)
+        self.client = SentenceTransformer(model_name, device='cpu')
+        self.model_name = model_name
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.client.encode(
+            # Same input cleanup as the LangChain wrapper used to do, so stored vectors stay comparable
+            [text.replace("\n", " ") for text in texts],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
         )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
 
-    def embed_text(self, text: str) -> List[float]:
+    def embed_text(self, text: str) -> np.ndarray:
         """Generate embedding for a single text"""
-        return self.client.embed_query(text)
+        return self._encode([text])[0]
 
-    def embed_query(self, text: str) -> List[float]:
+    def embed_query(self, text: str) -> np.ndarray:
         """Generate embedding for query"""
-        return self.client.embed_query(text)
+        return self._encode([text])[0]
 
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        return self.client.embed_documents(texts)
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for multiple texts (float32 matrix, one row per text)"""
+        return self._encode(texts)
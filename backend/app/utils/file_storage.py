@@ -0,0 +1,378 @@
+"""
+Tiered, content-addressed storage of uploaded originals
+"""
+from app.config import settings
+from app.utils.uploads import file_sha256
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+import gzip
+import os
+import shutil
+import uuid
+
+HOT = "hot"
+COLD = "cold"
+
+# Compressed copies are kept only when they are at least this much smaller
+MIN_COMPRESSION_SAVING = 0.1
+COMPRESSED_SUFFIX = ".gz"
+
+
+def object_key(content_hash: str, file_type: str) -> str:
+    """Storage key of a file: identical content is stored once"""
+    return f"{content_hash[:2]}/{content_hash}.{file_type}"
+
+
+def compress_if_smaller(path: str) -> Tuple[str, bool]:
+    """
+    Gzip a file when that saves at least MIN_COMPRESSION_SAVING
+
+    Args:
+        path: File to compress; replaced by the compressed copy when kept
+
+    Returns:
+        Tuple of (path of the file to store, whether it is compressed)
+    """
+    compressed_path = f"{path}{COMPRESSED_SUFFIX}"
+    with open(path, "rb") as src, gzip.open(compressed_path, "wb", compresslevel=6) as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+
+    if os.path.getsize(compressed_path) > os.path.getsize(path) * (1 - MIN_COMPRESSION_SAVING):
+        os.remove(compressed_path)
+        return path, False
+    os.remove(path)
+    return compressed_path, True
+
+
+def decompress_to(src_path: str, dest_path: str) -> None:
+    """Write the decompressed content of a gzip file to dest_path"""
+    with gzip.open(src_path, "rb") as src, open(dest_path, "wb") as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+
+
+class StorageBackend(ABC):
+    """
+    Where one storage tier keeps its objects.
+
+    Keys are relative paths such as ``ab/ab12...ef.pdf``. Objects may be
+    stored gzip-compressed (under ``key + ".gz"``); readers get the
+    original bytes either way.
+    """
+
+    @abstractmethod
+    def put(self, key: str, src_path: str) -> None:
+        """Store a local file under key (kept if it already exists); src_path is consumed"""
+
+    @abstractmethod
+    def fetch(self, key: str, dest_path: str) -> None:
+        """Write the original bytes of an object to a local file"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the object if it is an uncompressed local file, else None"""
+        return None
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether an object is stored under key, compressed or not"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an object; missing objects are ignored"""
+
+
+class LocalBackend(StorageBackend):
+    """
+    Objects as files under a local (or mounted) directory
+
+    Args:
+        root: Base directory
+        compress: Gzip objects that compress well
+    """
+
+    def __init__(self, root: str, compress: bool = False):
+        self.root = root
+        self.compress = compress
+
+    def put(self, key: str, src_path: str) -> None:
+        if self.exists(key):
+            os.remove(src_path)  # same content already stored
+            return
+        compressed = False
+        if self.compress:
+            src_path, compressed = compress_if_smaller(src_path)
+
+        dest_path = self._path(key) + (COMPRESSED_SUFFIX if compressed else "")
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        shutil.move(src_path, tmp_path)  # a copy when the root is on another device
+        os.replace(tmp_path, dest_path)
+
+    def fetch(self, key: str, dest_path: str) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            shutil.copyfile(path, dest_path)
+        elif os.path.exists(path + COMPRESSED_SUFFIX):
+            decompress_to(path + COMPRESSED_SUFFIX, dest_path)
+        else:
+            raise FileNotFoundError(f"File not found: {path}")
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def exists(self, key: str) -> bool:
+        path = self._path(key)
+        return os.path.exists(path) or os.path.exists(path + COMPRESSED_SUFFIX)
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        for candidate in (path, path + COMPRESSED_SUFFIX):
+            try:
+                os.remove(candidate)
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+
+class S3Backend(StorageBackend):
+    """
+    Objects in an S3 bucket, or any S3-compatible server (e.g. MinIO)
+
+    Credentials come from the usual AWS environment variables or config.
+    Requires ``boto3``, imported on first use.
+
+    Args:
+        bucket: Bucket name
+        prefix: Key prefix inside the bucket
+        endpoint_url: Server URL for S3-compatible servers (None for AWS)
+        compress: Gzip objects that compress well
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, compress: bool = False):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url or None
+        self.compress = compress
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("COLD_STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def put(self, key: str, src_path: str) -> None:
+        if self.exists(key):
+            os.remove(src_path)
+            return
+        compressed = False
+        if self.compress:
+            src_path, compressed = compress_if_smaller(src_path)
+        try:
+            self.client.upload_file(
+                src_path, self.bucket, self._key(key) + (COMPRESSED_SUFFIX if compressed else "")
+            )
+        finally:
+            os.remove(src_path)
+
+    def fetch(self, key: str, dest_path: str) -> None:
+        if self._head(self._key(key)):
+            self.client.download_file(self.bucket, self._key(key), dest_path)
+        elif self._head(self._key(key) + COMPRESSED_SUFFIX):
+            compressed_path = f"{dest_path}{COMPRESSED_SUFFIX}"
+            self.client.download_file(self.bucket, self._key(key) + COMPRESSED_SUFFIX, compressed_path)
+            try:
+                decompress_to(compressed_path, dest_path)
+            finally:
+                os.remove(compressed_path)
+        else:
+            raise FileNotFoundError(f"Object not found: s3://{self.bucket}/{self._key(key)}")
+
+    def exists(self, key: str) -> bool:
+        return self._head(self._key(key)) or self._head(self._key(key) + COMPRESSED_SUFFIX)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={"Objects": [{"Key": self._key(key)}, {"Key": self._key(key) + COMPRESSED_SUFFIX}]}
+        )
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _head(self, full_key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=full_key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+
+def cold_backend() -> StorageBackend:
+    """Backend of the cold tier, from COLD_STORAGE_* settings"""
+    if settings.COLD_STORAGE_BACKEND == "s3":
+        return S3Backend(
+            settings.COLD_STORAGE_S3_BUCKET,
+            settings.COLD_STORAGE_S3_PREFIX,
+            settings.COLD_STORAGE_S3_ENDPOINT_URL,
+            settings.COLD_STORAGE_COMPRESSION
+        )
+    if settings.COLD_STORAGE_BACKEND == "local":
+        return LocalBackend(settings.COLD_STORAGE_DIR, settings.COLD_STORAGE_COMPRESSION)
+    raise ValueError(f"Unknown COLD_STORAGE_BACKEND: {settings.COLD_STORAGE_BACKEND}")
+
+
+class FileStorage:
+    """
+    Uploaded originals, addressed by content and kept in tiers.
+
+    ``documents.file_path`` holds a storage URI::
+
+        hot://{hash[:2]}/{hash}.{ext}     ORIGINALS_DIR on the API/worker volume
+        cold://{hash[:2]}/{hash}.{ext}    COLD_STORAGE_BACKEND (directory or S3)
+
+    Uploads land in the hot tier. Identical files share one object, so
+    re-uploads neither collide nor duplicate. Whoever stores an upload or
+    removes an object holds ``database.advisory_lock`` on its URI until
+    the rows pointing at it are committed, so an object is never removed
+    while a new row is about to share it. An original is only read
+    again to re-parse it (reprocessing, re-indexing after a chunking
+    change), so ``python -m app.cli.storage --tier-cold`` moves processed
+    ones to the cold tier. Readers use ``local_copy``, which yields a
+    local path whatever the tier and compression. Rows from before
+    tiering hold plain file paths, which keep working.
+
+    Args:
+        hot: Backend of the hot tier (defaults to ORIGINALS_DIR)
+        cold: Backend of the cold tier (defaults to COLD_STORAGE_* settings),
+            created on first use
+    """
+
+    def __init__(self, hot: Optional[StorageBackend] = None, cold: Optional[StorageBackend] = None):
+        self.hot = hot or LocalBackend(settings.ORIGINALS_DIR, settings.ORIGINALS_COMPRESSION)
+        self._cold = cold
+        self.staging_dir = os.path.join(settings.ORIGINALS_DIR, ".staging")
+
+    @property
+    def cold(self) -> StorageBackend:
+        if self._cold is None:
+            self._cold = cold_backend()
+        return self._cold
+
+    def staging_path(self, file_type: str) -> str:
+        """Temporary local path to stream a new upload to before save()"""
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return os.path.join(self.staging_dir, f"{uuid.uuid4().hex}.{file_type}")
+
+    def uri(self, content_hash: str, file_type: str) -> str:
+        """Storage URI save() gives a file, known before storing it"""
+        return f"{HOT}://{object_key(content_hash, file_type)}"
+
+    def save(self, src_path: str, content_hash: str, file_type: str) -> str:
+        """
+        Store a staged upload in the hot tier
+
+        Callers lock ``uri()`` first (see the class docstring).
+
+        Args:
+            src_path: Staged file; consumed
+            content_hash: SHA-256 of the file
+            file_type: File extension without the dot
+
+        Returns:
+            str: Storage URI for ``documents.file_path``
+        """
+        key = object_key(content_hash, file_type)
+        self.hot.put(key, src_path)
+        return f"{HOT}://{key}"
+
+    def tier(self, uri: str) -> Optional[str]:
+        """Tier of a storage URI, or None for a plain file path"""
+        scheme, sep, _ = uri.partition("://")
+        return scheme if sep and scheme in (HOT, COLD) else None
+
+    def exists(self, uri: str) -> bool:
+        backend, key = self._resolve(uri)
+        return os.path.exists(key) if backend is None else backend.exists(key)
+
+    @contextmanager
+    def local_copy(self, uri: str) -> Iterator[str]:
+        """
+        Local file with the original bytes, for the duration of the block
+
+        Uncompressed hot objects and plain paths are used in place; other
+        objects are fetched into a temporary file that is removed after.
+        """
+        backend, key = self._resolve(uri)
+        if backend is None:
+            yield key
+            return
+        path = backend.local_path(key)
+        if path is not None:
+            yield path
+            return
+
+        tmp_path = self.staging_path(os.path.splitext(key)[1].lstrip("."))
+        try:
+            backend.fetch(key, tmp_path)
+            yield tmp_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def sha256(self, uri: str) -> str:
+        """SHA-256 of a stored original"""
+        with self.local_copy(uri) as path:
+            return file_sha256(path)
+
+    def delete(self, uri: str) -> None:
+        """Remove a stored original; missing files are ignored"""
+        backend, key = self._resolve(uri)
+        if backend is not None:
+            backend.delete(key)
+            return
+        try:
+            os.remove(key)
+        except FileNotFoundError:
+            pass
+
+    def copy_to_cold(self, uri: str) -> str:
+        """
+        Copy an original to the cold tier, leaving the source in place
+
+        Args:
+            uri: Hot URI or plain path
+
+        Returns:
+            str: Cold storage URI
+        """
+        file_type = os.path.splitext(uri)[1].lstrip(".")
+        with self.local_copy(uri) as path:
+            content_hash = file_sha256(path)  # plain paths may have been overwritten since upload
+            key = object_key(content_hash, file_type)
+            if not self.cold.exists(key):
+                tmp_path = self.staging_path(file_type)
+                shutil.copyfile(path, tmp_path)
+                self.cold.put(key, tmp_path)
+        return f"{COLD}://{key}"
+
+    def _resolve(self, uri: str) -> Tuple[Optional[StorageBackend], str]:
+        tier = self.tier(uri)
+        if tier is None:
+            return None, uri
+        key = uri.partition("://")[2]
+        return (self.hot if tier == HOT else self.cold), key
+
+
+# Shared by every service in this process
+file_storage = FileStorage()
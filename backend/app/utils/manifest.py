@@ -0,0 +1,81 @@
+"""
+Resumable manifest for bulk ingestion runs
+"""
+from typing import Dict, Any, List, Optional
+import json
+import os
+
+
+class IngestManifest:
+    """
+    JSON file recording the state of every file in a bulk ingestion run.
+
+    Each entry is keyed by the file's path relative to the ingested folder
+    or archive and moves through ``pending`` -> ``uploaded`` -> ``done``
+    (or ``failed``). Re-running an ingestion with the same manifest skips
+    entries that are already ``done``.
+    """
+
+    PENDING = "pending"
+    UPLOADED = "uploaded"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: str, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        """
+        Load a manifest from disk, or start an empty one
+
+        Args:
+            path: Manifest file path
+
+        Returns:
+            IngestManifest: Loaded or new manifest
+        """
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(path, json.load(f).get("entries", {}))
+        return cls(path)
+
+    def save(self) -> None:
+        """Write the manifest atomically so an interrupted run never corrupts it"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, key: str, size: int) -> bool:
+        """Check whether a file was already ingested and has not changed size since"""
+        entry = self.entries.get(key)
+        return bool(entry) and entry["status"] == self.DONE and entry.get("size") == size
+
+    def mark(self, key: str, status: str, **fields: Any) -> None:
+        """
+        Update the status of a file, keeping previously recorded fields
+
+        Args:
+            key: Relative file path
+            status: New status
+            **fields: Extra fields to record (size, doc_id, error, ...)
+        """
+        entry = self.entries.setdefault(key, {})
+        entry.update(fields)
+        entry["status"] = status
+        if status != self.FAILED:
+            entry.pop("error", None)
+
+    def keys_with_status(self, status: str) -> List[str]:
+        """Get all keys currently in the given status"""
+        return [key for key, entry in self.entries.items() if entry["status"] == status]
+
+    def summary(self) -> Dict[str, int]:
+        """Count entries per status"""
+        counts = {self.PENDING: 0, self.UPLOADED: 0, self.DONE: 0, self.FAILED: 0}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
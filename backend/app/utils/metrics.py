@@ -0,0 +1,204 @@
+"""
+Prometheus metrics and pipeline stage timing
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(see gunicorn.conf.py) and /metrics aggregates them; gauges declare how
+their per-process values are combined.
+"""
+from contextlib import contextmanager
+from typing import Any, Iterator
+from prometheus_client import Counter, Gauge, Histogram
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Buckets from 5ms (vector search) up to a minute (large document parses)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "aerodoc_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+STAGE_SECONDS = Histogram(
+    "aerodoc_stage_duration_seconds",
+    "Latency of individual RAG pipeline stages",
+    ["pipeline", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+LLM_TOKENS = Counter(
+    "aerodoc_llm_tokens_total",
+    "Tokens consumed by LLM calls",
+    ["model", "kind"]  # kind: prompt, completion
+)
+
+CACHE_REQUESTS = Counter(
+    "aerodoc_cache_requests_total",
+    "Cache lookups by result",
+    ["cache", "result"]  # result: hit, miss
+)
+
+INGESTED_CHUNKS = Counter(
+    "aerodoc_ingested_chunks_total",
+    "Chunks embedded and written to the vector store"
+)
+
+QUERY_ROUTES = Counter(
+    "aerodoc_query_routes_total",
+    "Chat messages by retrieval route",
+    ["route"]  # route: small_talk, follow_up, lookup
+)
+
+CONTEXT_CHUNKS = Histogram(
+    "aerodoc_context_chunks",
+    "Retrieved chunks placed in the prompt per lookup",
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    "aerodoc_llm_queue_depth",
+    "Chat requests waiting for an LLM slot",
+    multiprocess_mode="livesum"
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "aerodoc_llm_in_flight",
+    "LLM calls currently running",
+    multiprocess_mode="livesum"
+)
+
+LLM_REJECTIONS = Counter(
+    "aerodoc_llm_rejections_total",
+    "Chat requests refused by LLM admission control",
+    ["reason"]  # reason: user_rate, queue_full, queue_timeout, provider_rate_limit
+)
+
+LLM_RETRIES = Counter(
+    "aerodoc_llm_retries_total",
+    "LLM calls retried after a provider rate-limit error"
+)
+
+LLM_HEDGES = Counter(
+    "aerodoc_llm_hedges_total",
+    "Hedged LLM requests by the call that answered first",
+    ["winner"]  # winner: primary, hedge
+)
+
+LLM_FALLBACKS = Counter(
+    "aerodoc_llm_fallbacks_total",
+    "LLM requests answered by the fallback model after the primary failed"
+)
+
+MESSAGE_BUFFER_PENDING = Gauge(
+    "aerodoc_message_buffer_pending",
+    "Chat messages accepted but not yet written to the database",
+    multiprocess_mode="livesum"
+)
+
+MESSAGE_FLUSH_ROWS = Histogram(
+    "aerodoc_message_flush_rows",
+    "Chat messages written per write-behind flush",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+MESSAGE_FLUSH_FAILURES = Counter(
+    "aerodoc_message_flush_failures_total",
+    "Write-behind flushes that failed and will be retried"
+)
+
+MESSAGE_REPLAY_FAILURES = Counter(
+    "aerodoc_message_replay_failures_total",
+    "Orphaned message journals that could not be replayed and will be retried"
+)
+
+DOCUMENTS_PURGED = Counter(
+    "aerodoc_documents_purged_total",
+    "Deleted documents whose vectors, file and row were removed"
+)
+
+DOCUMENT_PURGE_FAILURES = Counter(
+    "aerodoc_document_purge_failures_total",
+    "Background document purges that failed and will be retried"
+)
+
+INGESTION_JOBS = Counter(
+    "aerodoc_ingestion_jobs_total",
+    "Ingestion queue jobs by state change",
+    ["status"]  # status: queued, done, failed
+)
+
+OCR_PAGES = Counter(
+    "aerodoc_ocr_pages_total",
+    "Scanned PDF pages sent to the OCR fallback",
+    ["result"]  # result: recognized, cached, timed_out, failed
+)
+
+CHROMA_REQUEST_SECONDS = Histogram(
+    "aerodoc_chroma_request_seconds",
+    "Vector database calls, including retries",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+CHROMA_RETRIES = Counter(
+    "aerodoc_chroma_retries_total",
+    "Vector database calls retried after a transient error",
+    ["operation"]
+)
+
+CHROMA_FAILURES = Counter(
+    "aerodoc_chroma_failures_total",
+    "Vector database calls that failed after their last retry",
+    ["operation"]
+)
+
+
+@contextmanager
+def timed(pipeline: str, stage: str) -> Iterator[None]:
+    """
+    Time a pipeline stage into the stage latency histogram
+
+    Args:
+        pipeline: Pipeline name ('chat', 'ingest')
+        stage: Stage name ('embed_query', 'vector_search', ...)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(pipeline=pipeline, stage=stage).observe(elapsed)
+        logger.debug("%s.%s took %.1fms", pipeline, stage, elapsed * 1000)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup"""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_token_usage(model: str, response: Any) -> None:
+    """
+    Count the tokens reported on a LangChain chat model response
+
+    Args:
+        model: Model name used for the call
+        response: AIMessage returned by the model
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens")
+    completion_tokens = usage.get("output_tokens")
+
+    if prompt_tokens is None:
+        # Older integrations only report provider-specific metadata
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage", {})
+        prompt_tokens = token_usage.get("prompt_tokens")
+        completion_tokens = token_usage.get("completion_tokens")
+
+    if prompt_tokens:
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
@@ -0,0 +1,204 @@
+"""
+OCR fallback for scanned PDF pages
+"""
+from app.config import settings
+from app.utils.artifacts import ArtifactCache
+from app.utils.metrics import OCR_PAGES
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever rendering or recognition changes so cached page texts are rebuilt
+OCR_VERSION = 1
+
+# PDF opened last in this OCR process; pages of one document arrive together
+_open_pdf: Tuple[Optional[str], Any] = (None, None)
+
+
+def _recognize_page(
+    file_path: str,
+    page_index: int,
+    ocr_key: str,
+    dpi: int,
+    languages: str,
+    timeout: float
+) -> Tuple[str, bool]:
+    """
+    Render one PDF page and OCR it, reusing the text of an identical page
+
+    Runs in an OCR worker process.
+
+    Returns:
+        Tuple of (page text, whether it came from the cache)
+    """
+    global _open_pdf
+    import pypdfium2
+    import pytesseract
+
+    if _open_pdf[0] != file_path:
+        _open_pdf = (file_path, pypdfium2.PdfDocument(file_path))
+    page = _open_pdf[1][page_index]
+    image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+
+    # Keyed by the pixels, so unchanged pages of a revised manual are not OCR'd again
+    page_hash = hashlib.sha256(f"{image.size}".encode() + image.tobytes()).hexdigest()
+    cache = ArtifactCache()
+    cached = cache.load_ocr(page_hash, ocr_key)
+    if cached is not None:
+        return cached, True
+
+    text = pytesseract.image_to_string(image, lang=languages, timeout=timeout).strip()
+    cache.save_ocr(page_hash, ocr_key, text)
+    return text, False
+
+
+class PageOcr:
+    """
+    Recognizes the text of PDF pages that have (almost) none.
+
+    Scanned manuals have a page image and no text layer. After the normal
+    parse, pages with fewer than ``OCR_MIN_CHARS`` characters are
+    rendered (pypdfium2) and read with Tesseract in a process pool of
+    ``OCR_WORKERS`` processes shared by everything in this process. A
+    document keeps at most that many pages in the pool at once, so a
+    long scan does not hold back other documents' pages, and gets
+    ``OCR_DOCUMENT_BUDGET_SECONDS`` in total: pages not recognized by then
+    stay empty and the parse is reported incomplete (not cached), so a
+    retry picks up where it stopped. Page texts are cached by the hash of
+    the rendered page.
+
+    Needs the ``tesseract`` binary and the ``pytesseract`` and
+    ``pypdfium2`` packages; without them OCR is skipped with a warning.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._available: Optional[bool] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether OCR is configured and its dependencies are installed"""
+        if not settings.OCR_ENABLED:
+            return False
+        if self._available is None:
+            try:
+                import pypdfium2  # noqa: F401
+                import pytesseract
+                pytesseract.get_tesseract_version()
+                self._available = True
+            except Exception as e:
+                logger.warning("OCR fallback disabled, dependencies missing: %s", e)
+                self._available = False
+        return self._available
+
+    @property
+    def key(self) -> str:
+        """Key of the OCR configuration, for cache keys"""
+        return ArtifactCache.make_key(
+            ocr_version=OCR_VERSION,
+            languages=settings.OCR_LANGUAGES,
+            dpi=settings.OCR_DPI,
+            min_chars=settings.OCR_MIN_CHARS
+        )
+
+    def recognize(
+        self,
+        file_path: str,
+        pages: List[Dict[str, Any]],
+        page_count: int
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Fill in the text of low-text pages
+
+        Args:
+            file_path: Local path of the PDF
+            pages: Pages from DocumentParser.parse_pdf_pages
+            page_count: Number of pages in the PDF
+
+        Returns:
+            Tuple of (pages in page order, whether every page was handled
+            within the time budget)
+        """
+        texts = {page["page_number"]: page["text"] for page in pages}
+        todo = [
+            number for number in range(1, page_count + 1)
+            if len(texts.get(number, "").strip()) < settings.OCR_MIN_CHARS
+        ]
+        if not todo:
+            return pages, True
+
+        deadline = time.monotonic() + settings.OCR_DOCUMENT_BUDGET_SECONDS
+        running: Dict[Future, int] = {}
+        complete = True
+        try:
+            while todo or running:
+                while todo and len(running) < settings.OCR_WORKERS:
+                    number = todo.pop(0)
+                    running[self._submit(file_path, number - 1)] = number
+
+                remaining = deadline - time.monotonic()
+                done, _ = wait(running, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    OCR_PAGES.labels(result="timed_out").inc(len(running) + len(todo))
+                    logger.warning(
+                        "OCR budget used up for %s; %d pages left without text",
+                        file_path, len(running) + len(todo)
+                    )
+                    complete = False
+                    break
+
+                for future in done:
+                    number = running.pop(future)
+                    try:
+                        text, cached = future.result()
+                    except Exception as e:
+                        OCR_PAGES.labels(result="failed").inc()
+                        logger.warning("OCR failed for page %d of %s: %s", number, file_path, e)
+                        complete = False
+                        continue
+                    OCR_PAGES.labels(result="cached" if cached else "recognized").inc()
+                    if len(text) > len(texts.get(number, "").strip()):
+                        texts[number] = text
+        finally:
+            for future in running:
+                future.cancel()
+
+        return [
+            {"page_number": number, "text": text}
+            for number, text in sorted(texts.items()) if text.strip()
+        ], complete
+
+    def _submit(self, file_path: str, page_index: int) -> Future:
+        args = (
+            _recognize_page, file_path, page_index, self.key,
+            settings.OCR_DPI, settings.OCR_LANGUAGES, settings.OCR_PAGE_TIMEOUT_SECONDS
+        )
+        try:
+            return self._executor().submit(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool
+            with self._lock:
+                self._pool = None
+            return self._executor().submit(*args)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the parent runs threads and holds model state
+                self._pool = ProcessPoolExecutor(
+                    max_workers=settings.OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+
+# Shared by every service in this process
+page_ocr = PageOcr()
@@ -0,0 +1,115 @@
+"""
+Local store of parent sections for small-to-big retrieval
+"""
+from app.config import settings
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+import os
+import sqlite3
+import threading
+
+# (doc_id, chunker_key, chunk_index) of a matched child chunk
+ChildKey = Tuple[str, str, int]
+
+
+class ParentStore:
+    """
+    Parent sections of documents, keyed by document and child chunk range.
+
+    Documents are split into large sections and each section into the
+    small chunks that are embedded. A section covers the child chunk
+    indexes ``[start, end)`` of its document; retrieval matches children
+    and looks up the section of each hit here to build the prompt.
+
+    Rows are also keyed by the chunker key, so a re-index that changes
+    the chunk layout does not mix up sections with the collection still
+    serving queries. The store is a SQLite file in WAL mode on local
+    disk: one indexed range lookup per hit, shared by every worker
+    process on the host, with one connection per thread.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.PARENT_STORE_PATH
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def put(self, doc_id: Hashable, chunker_key: str, sections: Sequence[Dict[str, Any]]) -> None:
+        """
+        Replace the sections of a document for one chunk layout
+
+        Args:
+            doc_id: Document UUID
+            chunker_key: Key of the chunking configuration
+            sections: Dicts with start, end (child chunk indexes) and text
+        """
+        db = self._connection()
+        with db:
+            db.execute(
+                "DELETE FROM sections WHERE doc_id = ? AND chunker = ?",
+                (str(doc_id), chunker_key)
+            )
+            db.executemany(
+                "INSERT INTO sections (doc_id, chunker, start, end, text) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (str(doc_id), chunker_key, section["start"], section["end"], section["text"])
+                    for section in sections
+                ]
+            )
+
+    def get_many(self, keys: Iterable[ChildKey]) -> List[Optional[Tuple[int, str]]]:
+        """
+        Find the section containing each child chunk
+
+        Args:
+            keys: (doc_id, chunker_key, chunk_index) of each child
+
+        Returns:
+            (section start, section text) per key, in order, or None when
+            the child has no stored section
+        """
+        db = self._connection()
+        found = []
+        for doc_id, chunker_key, chunk_index in keys:
+            row = db.execute(
+                "SELECT start, end, text FROM sections "
+                "WHERE doc_id = ? AND chunker = ? AND start <= ? "
+                "ORDER BY start DESC LIMIT 1",
+                (str(doc_id), chunker_key, chunk_index)
+            ).fetchone()
+            found.append((row[0], row[2]) if row and chunk_index < row[1] else None)
+        return found
+
+    def delete(self, doc_ids: Iterable[Hashable]) -> None:
+        """Drop every section of the given documents"""
+        db = self._connection()
+        with db:
+            db.executemany(
+                "DELETE FROM sections WHERE doc_id = ?",
+                [(str(doc_id),) for doc_id in doc_ids]
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    with db:
+                        db.execute(
+                            "CREATE TABLE IF NOT EXISTS sections ("
+                            "doc_id TEXT NOT NULL, chunker TEXT NOT NULL, "
+                            "start INTEGER NOT NULL, end INTEGER NOT NULL, text TEXT NOT NULL, "
+                            "PRIMARY KEY (doc_id, chunker, start))"
+                        )
+                    self._initialized = True
+            self._local.db = db
+        return db
+
+
+# Shared by every service in this process
+parent_store = ParentStore()
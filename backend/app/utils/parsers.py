@@ -2,26 +2,30 @@
 Document parsers for PDF and Word files
 """
 import PyPDF2
-from docx import Document
-from typing import List, Tuple
+from app.utils.docx_stream import iter_docx_blocks
+from typing import List, Tuple, Dict, Any
 import os
 
 
 class DocumentParser:
     """Parser for PDF and Word documents"""
     
+    # Bump whenever extraction output changes so cached artifacts are rebuilt
+    PARSER_VERSION = 2
+    
     @staticmethod
-    def parse_pdf(file_path: str) -> Tuple[str, int]:
+    def parse_pdf_pages(file_path: str) -> Tuple[List[Dict[str, Any]], int]:
         """
-        Parse PDF file and extract text
+        Parse PDF file and extract text page by page
         
         Args:
             file_path: Path to PDF file
             
         Returns:
-            Tuple of (extracted_text, page_count)
+            Tuple of (pages, page_count); each page is a dict with
+            'page_number' and 'text', pages without text are skipped
         """
-        text = ""
+        pages = []
         page_count = 0
         
         try:
@@ -32,59 +36,165 @@ class DocumentParser:
                 for page_num, page in enumerate(pdf_reader.pages):
                     page_text = page.extract_text()
                     if page_text:
-                        text += f"\n--- Page {page_num + 1} ---\n"
-                        text += page_text
+                        pages.append({"page_number": page_num + 1, "text": page_text})
                         
         except Exception as e:
             raise Exception(f"Error parsing PDF: {str(e)}")
         
-        return text.strip(), page_count
+        return pages, page_count
     
     @staticmethod
-    def parse_docx(file_path: str) -> Tuple[str, int]:
+    def parse_docx_pages(file_path: str) -> Tuple[List[Dict[str, Any]], int]:
         """
-        Parse Word document and extract text
+        Parse Word document and extract text, including tables
+        
+        Word files have no fixed pages, so text is grouped into one record
+        per heading section instead, with the heading path in 'section'.
         
         Args:
             file_path: Path to Word file
             
         Returns:
-            Tuple of (extracted_text, paragraph_count)
+            Tuple of (sections, paragraph_count)
         """
-        text = ""
+        sections = []
+        lines: List[str] = []
+        section = None
         paragraph_count = 0
         
         try:
-            doc = Document(file_path)
-            paragraph_count = len(doc.paragraphs)
-            
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text += para.text + "\n"
-                    
+            for block in iter_docx_blocks(file_path):
+                if block["kind"] == "heading" and lines:
+                    sections.append({"page_number": None, "section": section, "text": "\n".join(lines)})
+                    lines = []
+                if not lines:
+                    section = block["section"] or None
+                if block["kind"] != "table_row":
+                    paragraph_count += 1
+                lines.append(block["text"])
+                
         except Exception as e:
             raise Exception(f"Error parsing DOCX: {str(e)}")
         
-        return text.strip(), paragraph_count
+        if lines:
+            sections.append({"page_number": None, "section": section, "text": "\n".join(lines)})
+        
+        return sections, paragraph_count
     
     @staticmethod
-    def parse_document(file_path: str, file_type: str) -> Tuple[str, int]:
+    def join_pages(pages: List[Dict[str, Any]]) -> str:
         """
-        Parse document based on file type
+        Join extracted pages into a single text, marking PDF page boundaries
+        
+        Args:
+            pages: Pages as returned by the parse_*_pages methods
+            
+        Returns:
+            Full document text
+        """
+        return DocumentParser.join_pages_located(pages)[0]
+    
+    @staticmethod
+    def join_pages_located(pages: List[Dict[str, Any]]) -> Tuple[str, List[Tuple[int, Dict[str, Any]]]]:
+        """
+        Join extracted pages like join_pages, keeping where each one starts
+        
+        Args:
+            pages: Pages as returned by the parse_*_pages methods
+            
+        Returns:
+            Tuple of (full document text, (offset, location) of each page in
+            text order); a location holds the page's 'page_number' (PDF) or
+            heading path 'section' (Word), whichever it has
+        """
+        parts = []
+        offsets = []
+        length = 0
+        for page in pages:
+            offsets.append(length)
+            if page["page_number"] is not None:
+                separator = f"\n--- Page {page['page_number']} ---\n"
+            elif parts:
+                separator = "\n\n"  # section boundary
+            else:
+                separator = ""
+            parts.append(separator)
+            parts.append(page["text"])
+            length += len(separator) + len(page["text"])
+        raw = "".join(parts)
+        text = raw.strip()
+        leading = len(raw) - len(raw.lstrip())
+        
+        locations = []
+        for offset, page in zip(offsets, pages):
+            location = {
+                key: page[key] for key in ("page_number", "section")
+                if page.get(key) is not None
+            }
+            locations.append((max(offset - leading, 0), location))
+        return text, locations
+    
+    @staticmethod
+    def parse_pdf(file_path: str) -> Tuple[str, int]:
+        """
+        Parse PDF file and extract text
+        
+        Args:
+            file_path: Path to PDF file
+            
+        Returns:
+            Tuple of (extracted_text, page_count)
+        """
+        pages, page_count = DocumentParser.parse_pdf_pages(file_path)
+        return DocumentParser.join_pages(pages), page_count
+    
+    @staticmethod
+    def parse_docx(file_path: str) -> Tuple[str, int]:
+        """
+        Parse Word document and extract text
+        
+        Args:
+            file_path: Path to Word file
+            
+        Returns:
+            Tuple of (extracted_text, paragraph_count)
+        """
+        pages, paragraph_count = DocumentParser.parse_docx_pages(file_path)
+        return DocumentParser.join_pages(pages), paragraph_count
+    
+    @staticmethod
+    def parse_document_pages(file_path: str, file_type: str) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Parse document into pages based on file type
         
         Args:
             file_path: Path to file
             file_type: File extension ('pdf' or 'docx')
             
         Returns:
-            Tuple of (extracted_text, page_or_paragraph_count)
+            Tuple of (pages, page_or_paragraph_count)
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
         if file_type.lower() == 'pdf':
-            return DocumentParser.parse_pdf(file_path)
+            return DocumentParser.parse_pdf_pages(file_path)
         elif file_type.lower() in ['docx', 'doc']:
-            return DocumentParser.parse_docx(file_path)
+            return DocumentParser.parse_docx_pages(file_path)
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
+    
+    @staticmethod
+    def parse_document(file_path: str, file_type: str) -> Tuple[str, int]:
+        """
+        Parse document based on file type
+        
+        Args:
+            file_path: Path to file
+            file_type: File extension ('pdf' or 'docx')
+            
+        Returns:
+            Tuple of (extracted_text, page_or_paragraph_count)
+        """
+        pages, count = DocumentParser.parse_document_pages(file_path, file_type)
+        return DocumentParser.join_pages(pages), count
@@ -0,0 +1,168 @@
+"""
+Compact int8 / binary codes for normalized embedding vectors
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+NONE = "none"
+INT8 = "int8"      # 4x smaller than float32, scores within ~1% of exact
+BINARY = "binary"  # 32x smaller, coarse: rank candidates, then rescore
+METHODS = (NONE, INT8, BINARY)
+
+# Set bits in each byte value, for Hamming distances over packed codes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def as_float32(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """Contiguous float32 matrix (or vector) without copying when already one"""
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows (or a single vector); zero vectors are left as they are"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class QuantizedVectors:
+    """
+    Normalized vectors stored as int8 or packed sign-bit codes.
+
+    Scoring is asymmetric: the query stays float32 and only the stored
+    side is quantized, which keeps int8 scores close enough to exact
+    cosine similarity to use directly. Binary scores are an estimate from
+    the Hamming distance and should only pick candidates for rescoring.
+
+    Args:
+        method: NONE, INT8 or BINARY
+        dimension: Vector dimension
+    """
+
+    def __init__(self, method: str, dimension: int):
+        if method not in METHODS:
+            raise ValueError(f"Unknown quantization method: {method}")
+        self.method = method
+        self.dimension = dimension
+        if method == INT8:
+            self.codes = np.empty((0, dimension), dtype=np.int8)
+        elif method == BINARY:
+            self.codes = np.empty((0, (dimension + 7) // 8), dtype=np.uint8)
+        else:
+            self.codes = np.empty((0, dimension), dtype=np.float32)
+        self.scales = np.empty(0, dtype=np.float32)
+
+    @classmethod
+    def encode(cls, vectors: Sequence[Sequence[float]], method: str) -> "QuantizedVectors":
+        """
+        Quantize a matrix of vectors
+
+        Args:
+            vectors: Vectors, one per row; normalized here
+            method: NONE, INT8 or BINARY
+
+        Returns:
+            QuantizedVectors holding the codes
+        """
+        matrix = as_float32(vectors)
+        if matrix.ndim != 2:
+            raise ValueError("Expected a matrix with one vector per row")
+        matrix = normalize(matrix)
+        encoded = cls(method, matrix.shape[1])
+        if method == INT8:
+            scales = np.abs(matrix).max(axis=1) / 127
+            scales[scales == 0] = 1
+            encoded.codes = np.round(matrix / scales[:, None]).astype(np.int8)
+            encoded.scales = scales.astype(np.float32)
+        elif method == BINARY:
+            encoded.codes = np.packbits(matrix > 0, axis=1)
+        else:
+            encoded.codes = matrix
+        return encoded
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def take(self, indices: Sequence[int]) -> "QuantizedVectors":
+        """Subset of rows, in the given order"""
+        subset = QuantizedVectors(self.method, self.dimension)
+        subset.codes = self.codes[list(indices)]
+        if self.method == INT8:
+            subset.scales = self.scales[list(indices)]
+        return subset
+
+    def concat(self, other: "QuantizedVectors") -> "QuantizedVectors":
+        """Rows of this set followed by the rows of another with the same method"""
+        combined = QuantizedVectors(self.method, self.dimension)
+        combined.codes = np.concatenate([self.codes, other.codes])
+        if self.method == INT8:
+            combined.scales = np.concatenate([self.scales, other.scales])
+        return combined
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        """
+        Estimated cosine similarity of every stored vector to a query
+
+        Args:
+            query: Query vector; normalized here
+
+        Returns:
+            float32 array with one score per stored vector
+        """
+        query = normalize(as_float32(query))
+        if self.method == INT8:
+            return (self.codes @ query) * self.scales
+        if self.method == BINARY:
+            query_bits = np.packbits(query > 0)
+            hamming = _POPCOUNT[np.bitwise_xor(self.codes, query_bits)].sum(axis=1)
+            # Sign agreement of random-hyperplane bits estimates the angle
+            return np.cos(np.pi * hamming / self.dimension).astype(np.float32)
+        return self.codes @ query
+
+
+def top_indices(scores: np.ndarray, count: int) -> np.ndarray:
+    """Indices of the ``count`` highest scores, best first"""
+    count = min(count, len(scores))
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, count - 1)[:count]
+    return top[np.argsort(-scores[top])]
+
+
+def search(
+    quantized: QuantizedVectors,
+    query: Sequence[float],
+    top_k: int,
+    full_vectors: Optional[np.ndarray] = None,
+    oversample: int = 4
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nearest neighbours over quantized codes, with optional rescoring
+
+    With ``full_vectors`` the best ``top_k * oversample`` candidates by
+    quantized score are rescored at full precision. Only those rows are
+    read, so ``full_vectors`` may be a memory-mapped file.
+
+    Args:
+        quantized: Codes to scan
+        query: Query vector
+        top_k: Number of results
+        full_vectors: float32 rows matching the codes, for rescoring
+        oversample: Candidates rescored per result
+
+    Returns:
+        Tuple of (indices, similarities), best first
+    """
+    scores = quantized.scores(query)
+    if full_vectors is None or quantized.method == NONE:
+        top = top_indices(scores, top_k)
+        return top, scores[top]
+
+    candidates = top_indices(scores, top_k * max(1, oversample))
+    exact = normalize(as_float32(full_vectors[np.sort(candidates)])) @ normalize(as_float32(query))
+    order = top_indices(exact, top_k)
+    return np.sort(candidates)[order], exact[order]
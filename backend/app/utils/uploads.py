@@ -0,0 +1,127 @@
+"""
+Single-pass upload streaming: size limit, hashing and type sniffing
+"""
+from typing import BinaryIO, NamedTuple, Optional
+import hashlib
+import os
+import uuid
+
+
+# Leading bytes of each supported container format
+FILE_SIGNATURES = {
+    "pdf": [b"%PDF-"],
+    "docx": [b"PK\x03\x04"],  # OOXML is a ZIP container
+    "doc": [b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", b"PK\x03\x04"],  # legacy OLE2 or mislabelled .docx
+}
+SNIFF_BYTES = 8
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as a stream crosses the size limit"""
+
+
+class UnexpectedFileType(Exception):
+    """Raised when the file content does not match its extension"""
+
+
+class StoredUpload(NamedTuple):
+    """Result of streaming an upload to disk"""
+    size: int
+    sha256: str
+
+
+def sniff_matches(head: bytes, file_type: str) -> bool:
+    """
+    Check the leading bytes of a file against the signatures for its type
+
+    Args:
+        head: First bytes of the file
+        file_type: File extension without the dot
+
+    Returns:
+        bool: True if the content looks like the declared type
+    """
+    return any(head.startswith(signature) for signature in FILE_SIGNATURES.get(file_type, []))
+
+
+def stream_to_disk(
+    source: BinaryIO,
+    dest_path: str,
+    max_size: int,
+    file_type: Optional[str] = None,
+    chunk_size: int = 1024 * 1024
+) -> StoredUpload:
+    """
+    Copy a stream to its final location in fixed-size chunks
+
+    The size limit, SHA-256 and type sniffing are all applied on the same
+    pass. Data goes to a temporary sibling file that is renamed into place
+    only after the whole stream validated, so a rejected upload leaves
+    nothing behind.
+
+    Args:
+        source: Readable binary stream
+        dest_path: Final file path
+        max_size: Maximum number of bytes accepted
+        file_type: Declared type to sniff for (skipped when None)
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        StoredUpload: Size and content hash of the stored file
+
+    Raises:
+        UploadTooLarge: If the stream exceeds max_size
+        UnexpectedFileType: If the leading bytes do not match file_type
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+
+    try:
+        with open(tmp_path, "wb") as out:
+            head = b""
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"File too large. Max size: {max_size} bytes")
+
+                if file_type is not None and len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES and not sniff_matches(head, file_type):
+                        raise UnexpectedFileType(f"File content is not a valid {file_type.upper()} file")
+
+                digest.update(chunk)
+                out.write(chunk)
+
+        if file_type is not None and not sniff_matches(head, file_type):
+            raise UnexpectedFileType(f"File content is not a valid {file_type.upper()} file")
+
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return StoredUpload(size=size, sha256=digest.hexdigest())
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a stored file in fixed-size chunks
+
+    Args:
+        file_path: Path to the file
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the ingestion and chat hot paths
+"""
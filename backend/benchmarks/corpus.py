@@ -0,0 +1,208 @@
+"""
+Synthetic PDF/DOCX corpus generation
+"""
+from typing import List, Tuple
+import os
+import random
+import zipfile
+
+
+VOCABULARY = (
+    "aircraft hydraulic pump actuator landing gear torque wrench inspection interval "
+    "fuel filter bypass valve pressure limit maintenance manual service bulletin "
+    "airworthiness directive engine nacelle fan blade borescope corrosion fastener "
+    "rivet panel access door wiring harness connector avionics bay sensor calibration "
+    "brake wear pin tire pressure nitrogen servicing oil quantity temperature cycle "
+    "replacement procedure caution warning note figure table chapter section task"
+).split()
+
+QUESTION_TEMPLATES = [
+    "What is the {a} {b} limit?",
+    "How often should the {a} be inspected?",
+    "Describe the {a} {b} replacement procedure.",
+    "What torque is required for the {a} {b}?",
+    "Which caution applies to the {a} {b}?",
+]
+
+
+def random_sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def random_paragraph(rng: random.Random, sentences: int = 5) -> str:
+    return " ".join(random_sentence(rng) for _ in range(sentences))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """
+    Write a minimal text-only PDF that PyPDF2 can extract
+
+    Args:
+        path: Output path
+        pages: Lines of text for each page
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        stream = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in lines
+        ) + " ET"
+        stream_bytes = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream_bytes), stream_bytes))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/></Relationships>'
+)
+_DOCX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/></w:style>'
+    '</w:styles>'
+)
+
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _docx_paragraph(text: str, style: str = None) -> str:
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{props}<w:r><w:t xml:space="preserve">{_xml_escape(text)}</w:t></w:r></w:p>'
+
+
+def write_docx(path: str, sections: List[Tuple[str, List[str], List[List[str]]]]) -> None:
+    """
+    Write a minimal DOCX with headings, paragraphs and tables
+
+    Args:
+        path: Output path
+        sections: (heading, paragraphs, table rows) for each section
+    """
+    body = []
+    for heading, paragraphs, rows in sections:
+        body.append(_docx_paragraph(heading, "Heading1"))
+        body.extend(_docx_paragraph(text) for text in paragraphs)
+        if rows:
+            body.append("<w:tbl>")
+            for row in rows:
+                cells = "".join(f"<w:tc>{_docx_paragraph(cell)}</w:tc>" for cell in row)
+                body.append(f"<w:tr>{cells}</w:tr>")
+            body.append("</w:tbl>")
+
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _DOCX_RELS)
+        archive.writestr("word/styles.xml", _DOCX_STYLES)
+        archive.writestr("word/document.xml", document)
+
+
+def generate_corpus(
+    out_dir: str,
+    pdf_count: int,
+    docx_count: int,
+    pages: int,
+    seed: int = 42
+) -> List[Tuple[str, str]]:
+    """
+    Generate a reproducible corpus of PDF and DOCX files
+
+    Args:
+        out_dir: Directory to write files into
+        pdf_count: Number of PDF files
+        docx_count: Number of DOCX files
+        pages: Pages per PDF (and sections per DOCX)
+        seed: Random seed
+
+    Returns:
+        List of (file_path, file_type)
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+
+    for i in range(pdf_count):
+        path = os.path.join(out_dir, f"manual_{i:04d}.pdf")
+        write_pdf(path, [
+            [random_sentence(rng) for _ in range(40)]
+            for _ in range(pages)
+        ])
+        files.append((path, "pdf"))
+
+    for i in range(docx_count):
+        path = os.path.join(out_dir, f"spec_{i:04d}.docx")
+        write_docx(path, [
+            (
+                f"Section {s + 1} {rng.choice(VOCABULARY).title()}",
+                [random_paragraph(rng) for _ in range(6)],
+                [["Item", "Limit", "Torque"]] + [
+                    [rng.choice(VOCABULARY), f"{rng.randint(1, 500)} psi", f"{rng.randint(5, 300)} Nm"]
+                    for _ in range(8)
+                ]
+            )
+            for s in range(pages)
+        ])
+        files.append((path, "docx"))
+
+    return files
+
+
+def generate_questions(count: int, seed: int = 7) -> List[str]:
+    """Generate reproducible questions drawn from the corpus vocabulary"""
+    rng = random.Random(seed)
+    return [
+        rng.choice(QUESTION_TEMPLATES).format(a=rng.choice(VOCABULARY), b=rng.choice(VOCABULARY))
+        for _ in range(count)
+    ]
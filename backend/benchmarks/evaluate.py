@@ -0,0 +1,377 @@
+"""
+Offline retrieval quality and latency evaluation
+
+Usage:
+    python -m benchmarks.evaluate --chunk-sizes 500,1000 --chunk-overlaps 100,200 --output eval.json
+    python -m benchmarks.evaluate --corpus ./manuals --labels labels.jsonl \\
+        --embedding-models sentence-transformers/all-MiniLM-L6-v2,BAAI/bge-small-en-v1.5
+
+Every combination of embedding model, chunk size and chunk overlap is
+ingested into its own on-disk Chroma collection and queried through
+VectorStore.search. Recall@k, MRR, index size, ingest time and query
+latency are reported side by side, along with the recall of an exact
+scan over int8 / binary quantized copies of the same vectors.
+
+Labels are JSONL, one question per line:
+
+    {"question": "...", "source": "manual.pdf", "evidence": "text the answer is in"}
+
+Labels name a file and a piece of its text instead of chunk IDs, so one
+label set works for every chunking. A retrieved chunk is relevant when it
+comes from ``source`` and contains the whole ``evidence`` string
+(case and whitespace are ignored); keep evidence shorter than the smallest
+overlap so that some chunk always holds it in full. Questions whose
+evidence no chunk contains are counted as ``unlocatable`` and left out of
+the scores.
+
+Without --corpus/--labels a synthetic corpus and label set are generated
+and the hashing stub embeddings are used ("stub" model), which exercises
+the harness but says nothing about real retrieval quality.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="aerodoc-eval-")
+
+# Configure settings before anything imports app.config
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORK_DIR, 'eval.db')}")
+os.environ.setdefault("SECRET_KEY", "evaluation")
+os.environ.setdefault("GROQ_API_KEY", "evaluation")
+# Originals, artifacts, chunk stores and the message journal all default to places under it
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORK_DIR, "uploads"))
+
+from benchmarks.corpus import generate_corpus  # noqa: E402
+from benchmarks.run import git_commit  # noqa: E402
+from benchmarks.stats import latency_summary  # noqa: E402
+from benchmarks.stubs import StubEmbeddings  # noqa: E402
+
+STUB_MODEL = "stub"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def load_corpus(directory: str) -> List[Tuple[str, str]]:
+    """List the PDF/DOCX files of a directory as (path, file_type)"""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            ext = os.path.splitext(name)[1].lower().lstrip(".")
+            if ext in ("pdf", "docx", "doc"):
+                files.append((os.path.join(root, name), ext))
+    return files
+
+
+def load_labels(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        labels = [json.loads(line) for line in f if line.strip()]
+    for number, label in enumerate(labels, start=1):
+        missing = {"question", "source", "evidence"} - set(label)
+        if missing:
+            raise ValueError(f"Label {number} is missing {', '.join(sorted(missing))}")
+    return labels
+
+
+def generate_labels(texts: Dict[str, str], count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Make questions from sentences of the parsed corpus
+
+    Each question is a handful of words sampled from one sentence, and
+    that sentence is its evidence.
+    """
+    rng = random.Random(seed)
+    sentences = [
+        (source, sentence.strip())
+        for source, text in sorted(texts.items())
+        for sentence in text.replace("\n", " ").split(". ")
+        if 60 <= len(sentence.strip()) <= 150
+    ]
+    labels = []
+    for source, sentence in rng.sample(sentences, min(count, len(sentences))):
+        words = sentence.rstrip(".").split()
+        labels.append({
+            "question": "What does the manual say about " + " ".join(rng.sample(words, min(6, len(words)))) + "?",
+            "source": source,
+            "evidence": sentence.rstrip(".")
+        })
+    return labels
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return total
+
+
+def evaluate_config(
+    embeddings: Any,
+    model_name: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    texts: Dict[str, str],
+    labels: List[Dict[str, Any]],
+    top_ks: List[int],
+    quantizations: List[str]
+) -> Dict[str, Any]:
+    """Ingest the corpus with one configuration and score the labels against it"""
+    import chromadb
+    import numpy as np
+    from chromadb.config import Settings
+    from app.config import settings
+    from app.services.document_service import DocumentService
+    from app.services.query_router import QueryRouter
+    from app.services.vector_store import VectorStore
+    from app.utils import quantization
+
+    # The sweep is over character sizes
+    settings.CHUNK_UNIT = "characters"
+    settings.CHUNK_SIZE = chunk_size
+    settings.CHUNK_OVERLAP = chunk_overlap
+    index_dir = tempfile.mkdtemp(prefix="index-", dir=WORK_DIR)
+    vector_store = VectorStore(
+        client=chromadb.PersistentClient(path=index_dir, settings=Settings(anonymized_telemetry=False))
+    )
+    # Same splitter as production ingestion, built from the patched settings
+    splitter = DocumentService(embeddings=embeddings, vector_store=vector_store).text_splitter
+
+    started = time.perf_counter()
+    embed_seconds = 0.0
+    chunk_count = 0
+    chunk_texts: Dict[str, List[str]] = {}
+    all_vectors, all_chunks = [], []
+    for i, (source, text) in enumerate(sorted(texts.items())):
+        chunks = splitter.split_text(text)
+        t0 = time.perf_counter()
+        vectors = embeddings.embed_batch(chunks)
+        embed_seconds += time.perf_counter() - t0
+        doc_id = f"eval-{i:04d}"
+        vector_store.add_documents(
+            doc_id, chunks, vectors, DocumentService.build_metadatas(doc_id, source, "eval", len(chunks))
+        )
+        chunk_texts[source] = [normalize(chunk) for chunk in chunks]
+        chunk_count += len(chunks)
+        all_vectors.append(vectors)
+        all_chunks.extend((source, text) for text in chunk_texts[source])
+    ingest_seconds = time.perf_counter() - started
+    vectors = np.concatenate(all_vectors) if all_vectors else np.empty((0, 0), dtype=np.float32)
+    dimension = vectors.shape[1]
+
+    max_k = max(top_ks)
+    hits = {k: 0 for k in top_ks}
+    reciprocal_ranks = []
+    adaptive_hits = 0
+    adaptive_depths = []
+    unlocatable = 0
+    embed_latencies = []
+    search_latencies = []
+    scored_queries = []
+
+    for label in labels:
+        evidence = normalize(label["evidence"])
+        t0 = time.perf_counter()
+        query_vector = embeddings.embed_query(label["question"])
+        t1 = time.perf_counter()
+        results = vector_store.search(query_embedding=query_vector, top_k=max_k)
+        t2 = time.perf_counter()
+        embed_latencies.append(t1 - t0)
+        search_latencies.append(t2 - t1)
+
+        if not any(evidence in chunk for chunk in chunk_texts.get(label["source"], [])):
+            unlocatable += 1
+            continue
+        scored_queries.append((label, evidence, query_vector))
+
+        rank = None
+        for position, (document, meta) in enumerate(zip(results["documents"], results["metadatas"]), start=1):
+            if meta.get("filename") == label["source"] and evidence in normalize(document):
+                rank = position
+                break
+        for k in top_ks:
+            hits[k] += 1 if rank is not None and rank <= k else 0
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        depth = QueryRouter.select_depth(results["distances"])
+        adaptive_depths.append(depth)
+        adaptive_hits += 1 if rank is not None and rank <= depth else 0
+
+    scored = len(reciprocal_ranks)
+
+    # Exact scan over quantized codes, binary rescored at full precision, vs the same labels
+    quantized_results = {}
+    for method in quantizations:
+        codes = quantization.QuantizedVectors.encode(vectors, method)
+        ranks = []
+        for label, evidence, query_vector in scored_queries:
+            top, _ = quantization.search(
+                codes, query_vector, max_k,
+                full_vectors=vectors if method == quantization.BINARY else None
+            )
+            rank = next(
+                (
+                    position for position, index in enumerate(top, start=1)
+                    if all_chunks[index][0] == label["source"] and evidence in all_chunks[index][1]
+                ),
+                None
+            )
+            ranks.append(rank)
+        quantized_results[method] = {
+            "vector_mb": round(codes.nbytes / (1024 * 1024), 2),
+            "recall": round(sum(1 for rank in ranks if rank) / scored, 4) if scored else 0.0,
+            "mrr": round(sum(1 / rank for rank in ranks if rank) / scored, 4) if scored else 0.0
+        }
+
+    index_bytes = directory_size(index_dir)
+    shutil.rmtree(index_dir, ignore_errors=True)
+
+    return {
+        "embedding_model": model_name,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": chunk_count,
+        "dimension": dimension,
+        "index_mb": round(index_bytes / (1024 * 1024), 2),
+        "vector_mb": round(chunk_count * dimension * 4 / (1024 * 1024), 2),
+        "ingest_seconds": round(ingest_seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "questions": len(labels),
+        "unlocatable": unlocatable,
+        "recall": {str(k): round(hits[k] / scored, 4) if scored else 0.0 for k in top_ks},
+        "mrr": round(sum(reciprocal_ranks) / scored, 4) if scored else 0.0,
+        "adaptive_recall": round(adaptive_hits / scored, 4) if scored else 0.0,
+        "adaptive_mean_depth": round(sum(adaptive_depths) / scored, 2) if scored else 0.0,
+        "embed_query_latency": latency_summary(embed_latencies),
+        "search_latency": latency_summary(search_latencies),
+        "quantized": quantized_results
+    }
+
+
+def print_table(rows: List[Dict[str, Any]], top_ks: List[int]) -> None:
+    recall_headers = "".join(f"{'R@' + str(k):>7}" for k in top_ks)
+    print(
+        f"\n{'model':<28}{'size':>6}{'ovl':>5}{'chunks':>8}{'idx MB':>8}{'ingest s':>10}"
+        f"{'search p50':>12}{'p95 ms':>8}{recall_headers}{'MRR':>7}{'R@adapt':>9}{'depth':>7}"
+    )
+    for row in rows:
+        recalls = "".join(f"{row['recall'][str(k)]:>7.3f}" for k in top_ks)
+        print(
+            f"{row['embedding_model'][-28:]:<28}{row['chunk_size']:>6}{row['chunk_overlap']:>5}"
+            f"{row['chunks']:>8}{row['index_mb']:>8.2f}{row['ingest_seconds']:>10.2f}"
+            f"{row['search_latency']['p50_ms']:>12.2f}{row['search_latency']['p95_ms']:>8.2f}"
+            f"{recalls}{row['mrr']:>7.3f}{row['adaptive_recall']:>9.3f}{row['adaptive_mean_depth']:>7.2f}"
+        )
+    methods = list(rows[0]["quantized"]) if rows else []
+    if methods:
+        print(f"\nQuantized exact scan, R@{top_ks[-1]} / MRR / vector MB (binary rescored at full precision):")
+        for row in rows:
+            cells = "  ".join(
+                f"{method} {row['quantized'][method]['recall']:.3f}/{row['quantized'][method]['mrr']:.3f}/"
+                f"{row['quantized'][method]['vector_mb']:.2f}"
+                for method in methods
+            )
+            print(f"{row['embedding_model'][-28:]:<28}{row['chunk_size']:>6}{row['chunk_overlap']:>5}  {cells}")
+
+    unlocatable = max((row["unlocatable"] for row in rows), default=0)
+    if unlocatable:
+        print(f"\n{unlocatable} question(s) had evidence split across chunks in some configuration; see 'unlocatable'")
+
+
+def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare retrieval quality and latency across configurations")
+    parser.add_argument("--corpus", help="Directory of PDF/DOCX files (default: synthetic corpus)")
+    parser.add_argument("--labels", help="Labeled questions JSONL (default: generated from the corpus)")
+    parser.add_argument("--questions", type=int, default=200, help="Questions to generate without --labels")
+    parser.add_argument("--write-labels", help="Save the generated labels to this file")
+    parser.add_argument("--pdfs", type=int, default=10, help="Synthetic PDF files")
+    parser.add_argument("--docx", type=int, default=5, help="Synthetic DOCX files")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per synthetic PDF / sections per DOCX")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus and label random seed")
+    parser.add_argument("--chunk-sizes", type=int_list, default=None, help="Comma-separated (default CHUNK_SIZE)")
+    parser.add_argument("--chunk-overlaps", type=int_list, default=None, help="Comma-separated (default CHUNK_OVERLAP)")
+    parser.add_argument("--top-k", type=int_list, default=[1, 3, 5, 10], help="Comma-separated recall cut-offs")
+    parser.add_argument(
+        "--embedding-models",
+        help=f"Comma-separated model names; '{STUB_MODEL}' is the hashing stub "
+             f"(default: EMBEDDING_MODEL with --corpus, otherwise {STUB_MODEL})"
+    )
+    parser.add_argument(
+        "--quantization", default="none,int8,binary",
+        help="Comma-separated vector quantizations to compare by exact scan; '' to skip"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    from app.config import settings
+    from app.utils.parsers import DocumentParser
+
+    if args.corpus:
+        files = load_corpus(args.corpus)
+    else:
+        files = generate_corpus(os.path.join(WORK_DIR, "corpus"), args.pdfs, args.docx, args.pages, seed=args.seed)
+    # Parsing does not depend on the configurations under test, so it is done once and not timed
+    texts = {
+        os.path.basename(path): DocumentParser.join_pages(DocumentParser.parse_document_pages(path, file_type)[0])
+        for path, file_type in files
+    }
+
+    labels = load_labels(args.labels) if args.labels else generate_labels(texts, args.questions, args.seed)
+    if args.write_labels:
+        with open(args.write_labels, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(label, ensure_ascii=False) + "\n" for label in labels)
+
+    models = (args.embedding_models or (settings.EMBEDDING_MODEL if args.corpus else STUB_MODEL)).split(",")
+    chunk_sizes = args.chunk_sizes or [settings.CHUNK_SIZE]
+    chunk_overlaps = args.chunk_overlaps or [settings.CHUNK_OVERLAP]
+    top_ks = sorted(set(args.top_k))
+    quantizations = [method for method in args.quantization.split(",") if method]
+
+    rows = []
+    for model_name in models:
+        if model_name == STUB_MODEL:
+            embeddings = StubEmbeddings(model_name=settings.EMBEDDING_MODEL)
+        else:
+            from app.utils.embeddings import GeminiEmbeddings
+            embeddings = GeminiEmbeddings(model_name)
+        for chunk_size in chunk_sizes:
+            for chunk_overlap in chunk_overlaps:
+                if chunk_overlap >= chunk_size:
+                    continue
+                row = evaluate_config(
+                    embeddings, model_name, chunk_size, chunk_overlap, texts, labels, top_ks, quantizations
+                )
+                print(
+                    f"{model_name} size={chunk_size} overlap={chunk_overlap}: "
+                    f"R@{top_ks[-1]} {row['recall'][str(top_ks[-1])]:.3f}, MRR {row['mrr']:.3f}"
+                )
+                rows.append(row)
+
+    print_table(rows, top_ks)
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "corpus": args.corpus or "synthetic",
+            "files": len(files),
+            "labels": args.labels or "generated",
+            "top_k": top_ks,
+            "results": rows
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
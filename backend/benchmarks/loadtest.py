@@ -0,0 +1,243 @@
+"""
+Concurrent user-session load test
+
+Start the API in load-test mode (fake LLM, in-process ChromaDB), then
+replay sessions against it at increasing concurrency:
+
+    LOAD_TEST_MODE=true uvicorn app.main:app --port 8000
+    python -m benchmarks.loadtest --url http://localhost:8000 --concurrency 1,5,10,25 --output load.json
+
+With --in-process the app is driven through ASGI in this process,
+against a throwaway SQLite database, without starting a server.
+
+Every virtual user registers, logs in, uploads a synthetic manual,
+opens a chat session and sends --turns messages, then starts over as a
+new user until the level's --duration runs out.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.corpus import generate_questions, random_sentence, write_pdf
+from benchmarks.stats import latency_summary
+
+PASSWORD = "loadtest-password"
+
+
+class StepFailed(Exception):
+    """A request in a user flow failed; the flow is abandoned"""
+
+
+class LevelStats:
+    """Latencies and errors of every request made at one concurrency level"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.flows = 0
+        self.failed_flows = 0
+
+    async def step(self, name: str, request: Any) -> httpx.Response:
+        """
+        Await a request and record its latency under the step name
+
+        Raises:
+            StepFailed: On a transport error or an error status
+        """
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError as e:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            raise StepFailed(f"{name}: {e!r}")
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            raise StepFailed(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+        return response
+
+    def report(self, concurrency: int, elapsed: float) -> Dict[str, Any]:
+        requests = sum(len(v) for v in self.latencies.values())
+        errors = sum(self.errors.values())
+        chat = self.latencies.get("chat", [])
+        return {
+            "concurrency": concurrency,
+            "seconds": round(elapsed, 2),
+            "flows": self.flows,
+            "failed_flows": self.failed_flows,
+            "requests": requests,
+            "errors": errors,
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+            "chat_throughput": round(len(chat) / elapsed, 2) if elapsed else 0.0,
+            "steps": {
+                name: {
+                    "count": len(values),
+                    "errors": self.errors.get(name, 0),
+                    **latency_summary(values)
+                }
+                for name, values in sorted(self.latencies.items())
+            }
+        }
+
+
+async def user_flow(
+    client: httpx.AsyncClient,
+    stats: LevelStats,
+    manual: bytes,
+    questions: List[str],
+    turns: int
+) -> None:
+    """Run one register → login → upload → multi-turn chat session"""
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    await stats.step("register", client.post(
+        "/api/auth/register", json={"email": email, "password": PASSWORD, "full_name": "Load Test"}
+    ))
+    login = await stats.step("login", client.post(
+        "/api/auth/login", json={"email": email, "password": PASSWORD}
+    ))
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    await stats.step("upload", client.post(
+        "/api/documents/upload",
+        files={"file": ("manual.pdf", manual, "application/pdf")},
+        headers=headers
+    ))
+    session = await stats.step("create_session", client.post(
+        "/api/chat/sessions", json={"title": "Load test"}, headers=headers
+    ))
+    session_id = session.json()["id"]
+
+    for question in random.sample(questions, min(turns, len(questions))):
+        await stats.step("chat", client.post(
+            f"/api/chat/sessions/{session_id}/messages",
+            json={"session_id": session_id, "content": question},
+            headers=headers
+        ))
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    concurrency: int,
+    duration: float,
+    manual: bytes,
+    questions: List[str],
+    turns: int
+) -> Dict[str, Any]:
+    """Keep `concurrency` users busy for `duration` seconds"""
+    stats = LevelStats()
+    deadline = time.monotonic() + duration
+
+    async def virtual_user() -> None:
+        while time.monotonic() < deadline:
+            try:
+                await user_flow(client, stats, manual, questions, turns)
+                stats.flows += 1
+            except StepFailed as e:
+                stats.failed_flows += 1
+                print(f"  flow failed: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    return stats.report(concurrency, time.perf_counter() - started)
+
+
+def build_manual(pages: int) -> bytes:
+    """Render the synthetic manual every virtual user uploads"""
+    rng = random.Random(42)
+    path = os.path.join(tempfile.mkdtemp(prefix="aerodoc-load-"), "manual.pdf")
+    write_pdf(path, [[random_sentence(rng) for _ in range(40)] for _ in range(pages)])
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def in_process_transport() -> httpx.AsyncBaseTransport:
+    """Serve the app through ASGI in this process, in load-test mode"""
+    work_dir = tempfile.mkdtemp(prefix="aerodoc-load-")
+    os.environ.setdefault("LOAD_TEST_MODE", "true")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(work_dir, 'load.db')}")
+    os.environ.setdefault("SECRET_KEY", "loadtest")
+    os.environ.setdefault("GROQ_API_KEY", "loadtest")
+    # Originals, artifacts, chunk stores and the message journal all default to places under it
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(work_dir, "uploads"))
+
+    from app.database import Base, engine
+    from app.main import app
+
+    # ASGITransport does not send lifespan events, so create the schema here
+    Base.metadata.create_all(bind=engine)
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+    return httpx.ASGITransport(app=app)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    manual = build_manual(args.pages)
+    questions = generate_questions(200)
+
+    transport = in_process_transport() if args.in_process else None
+    base_url = "http://loadtest" if args.in_process else args.url
+    client = httpx.AsyncClient(
+        base_url=base_url,
+        transport=transport,
+        timeout=httpx.Timeout(args.timeout),
+        limits=httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    )
+
+    results = []
+    async with client:
+        for concurrency in levels:
+            result = await run_level(client, concurrency, args.duration, manual, questions, args.turns)
+            chat = result["steps"].get("chat", {})
+            print(
+                f"c={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  "
+                f"{result['chat_throughput']:>7.1f} chat/s  "
+                f"chat p50 {chat.get('p50_ms', 0):>8.1f}ms  p95 {chat.get('p95_ms', 0):>8.1f}ms  "
+                f"p99 {chat.get('p99_ms', 0):>8.1f}ms  errors {result['errors']}"
+            )
+            results.append(result)
+
+    return {
+        "target": "in-process" if args.in_process else args.url,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "duration": args.duration,
+            "turns": args.turns,
+            "pages": args.pages
+        },
+        "levels": results
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay concurrent user sessions against the API")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--in-process", action="store_true", help="Drive the app in this process")
+    parser.add_argument("--concurrency", default="1,5,10,25", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds per concurrency level")
+    parser.add_argument("--turns", type=int, default=5, help="Chat messages per session")
+    parser.add_argument("--pages", type=int, default=5, help="Pages in the uploaded manual")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    # One INFO line per request would drown the results
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Ingestion and chat throughput benchmarks
+
+Usage:
+    python -m benchmarks.run --pdfs 20 --docx 10 --pages 10 --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+
+Runs against a throwaway SQLite database, an in-process Chroma client,
+hashing embeddings and a stub LLM unless --real-embeddings is given, so
+numbers are comparable across commits on the same machine.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="aerodoc-bench-")
+
+# Configure settings before anything imports app.config
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+# Originals, artifacts, chunk stores and the message journal all default to places under it
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORK_DIR, "uploads"))
+# Measure the pipeline, not the admission control in front of the provider
+os.environ.setdefault("LLM_USER_RATE", "0")
+os.environ.setdefault("LLM_GLOBAL_RATE", "0")
+
+from benchmarks.corpus import generate_corpus, generate_questions  # noqa: E402
+from benchmarks.stats import latency_summary  # noqa: E402
+from benchmarks.stubs import StubChatModel, StubEmbeddings  # noqa: E402
+
+
+class PeakRSS:
+    """Sample resident memory in a background thread while a benchmark runs"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def current() -> int:
+        """Current RSS in bytes (falls back to the process high-water mark)"""
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakRSS":
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def measure(
+    name: str,
+    items: Iterable[Any],
+    fn: Callable[[Any], Any],
+    units: Callable[[Any, Any], int] = lambda item, result: 1,
+    unit_name: str = "ops"
+) -> Dict[str, Any]:
+    """
+    Time fn over every item
+
+    Args:
+        name: Benchmark name
+        items: Inputs, one call each
+        fn: Function under test
+        units: Work units done by a call (pages, chunks, ...), for throughput
+        unit_name: Label of the work unit
+
+    Returns:
+        Dict with call count, throughput, latency percentiles and peak RSS
+    """
+    latencies = []
+    total_units = 0
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for item in items:
+            t0 = time.perf_counter()
+            result = fn(item)
+            latencies.append(time.perf_counter() - t0)
+            total_units += units(item, result)
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "calls": len(latencies),
+        "units": total_units,
+        "unit": unit_name,
+        "seconds": round(elapsed, 4),
+        "throughput": round(total_units / elapsed, 2) if elapsed else 0.0,
+        **latency_summary(latencies),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1)
+    }
+    print(
+        f"{name:<14} {result['throughput']:>10.1f} {unit_name}/s  "
+        f"p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+        f"p99 {result['p99_ms']:>9.2f}ms  rss {result['peak_rss_mb']:>7.1f}MB"
+    )
+    return result
+
+
+def batched(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import chromadb
+    from app.config import settings
+    from app.database import Base, SessionLocal, engine
+    from app.models import ChatSession, Document, User
+    from app.services.chat_service import ChatService
+    from app.services.document_service import DocumentService
+    from app.services.vector_store import VectorStore
+    from app.utils.parsers import DocumentParser
+
+    if args.real_embeddings:
+        from app.utils.embeddings import GeminiEmbeddings
+        embeddings = GeminiEmbeddings()
+    else:
+        # Carry the configured model name so the index registry does not try to swap models
+        embeddings = StubEmbeddings(model_name=settings.EMBEDDING_MODEL)
+
+    vector_store = VectorStore(client=chromadb.EphemeralClient())
+    document_service = DocumentService(embeddings=embeddings, vector_store=vector_store)
+
+    files = generate_corpus(
+        os.path.join(WORK_DIR, "corpus"), args.pdfs, args.docx, args.pages, seed=args.seed
+    )
+    results: Dict[str, Any] = {}
+
+    pdfs = [path for path, file_type in files if file_type == "pdf"]
+    docxs = [path for path, file_type in files if file_type == "docx"]
+    if pdfs:
+        results["parse_pdf"] = measure(
+            "parse_pdf", pdfs, DocumentParser.parse_pdf_pages,
+            units=lambda item, result: result[1], unit_name="pages"
+        )
+    if docxs:
+        results["parse_docx"] = measure(
+            "parse_docx", docxs, DocumentParser.parse_docx_pages,
+            units=lambda item, result: len(result[0]), unit_name="sections"
+        )
+
+    texts = [
+        DocumentParser.join_pages(DocumentParser.parse_document_pages(path, file_type)[0])
+        for path, file_type in files
+    ]
+    results["split"] = measure(
+        "split", texts, document_service.split_text,
+        units=lambda item, result: len(result[0]), unit_name="chunks"
+    )
+
+    doc_chunks = [document_service.split_text(text)[0] for text in texts]
+    all_chunks = [chunk for chunks in doc_chunks for chunk in chunks]
+    results["embed_batch"] = measure(
+        "embed_batch", batched(all_chunks, args.embed_batch_size), embeddings.embed_batch,
+        units=lambda item, result: len(item), unit_name="chunks"
+    )
+
+    # Real rows: chat checks that the documents it serves from a session's working set still exist
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email=f"bench-{os.getpid()}@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    rows = [
+        Document(
+            user_id=user_id, filename=f"bench-{i:04d}", file_type="pdf",
+            file_path=f"bench-{i:04d}", file_size=0, processed=True
+        )
+        for i in range(len(doc_chunks))
+    ]
+    db.add_all(rows)
+    db.commit()
+
+    docs = []
+    for row, chunks in zip(rows, doc_chunks):
+        docs.append((row.id, row.filename, chunks, embeddings.embed_batch(chunks)))
+
+    def add(doc):
+        doc_id, filename, chunks, vectors = doc
+        vector_store.add_documents(
+            doc_id, chunks, vectors, DocumentService.build_metadatas(doc_id, filename, user_id, len(chunks))
+        )
+    results["vector_add"] = measure(
+        "vector_add", docs, add,
+        units=lambda item, result: len(item[2]), unit_name="chunks"
+    )
+
+    questions = generate_questions(args.queries, seed=args.seed)
+    query_vectors = [embeddings.embed_query(q) for q in questions]
+    results["vector_search"] = measure(
+        "vector_search", query_vectors,
+        lambda vector: vector_store.search(query_embedding=vector, top_k=5),
+        unit_name="queries"
+    )
+
+    chat_service = ChatService(
+        vector_store=vector_store,
+        embeddings=embeddings,
+        llm=StubChatModel(latency=args.llm_latency)
+    )
+    try:
+        chat_session = ChatSession(user_id=user_id)
+        db.add(chat_session)
+        db.commit()
+
+        loop = asyncio.new_event_loop()
+        results["send_message"] = measure(
+            "send_message", questions,
+            lambda q: loop.run_until_complete(
+                chat_service.send_message(db, user_id, chat_session.id, q)
+            ),
+            unit_name="messages"
+        )
+        loop.close()
+    finally:
+        db.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {
+            "pdfs": args.pdfs,
+            "docx": args.docx,
+            "pages": args.pages,
+            "queries": args.queries,
+            "seed": args.seed,
+            "embed_batch_size": args.embed_batch_size,
+            "llm_latency": args.llm_latency,
+            "embeddings": settings.EMBEDDING_MODEL if args.real_embeddings else "stub",
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+            "chunker": document_service.chunker_key
+        },
+        "results": results
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print throughput and p95 changes against a baseline report"""
+    print(f"\nvs {baseline.get('commit') or 'baseline'}:")
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        throughput = (result["throughput"] / old["throughput"] - 1) * 100 if old["throughput"] else 0.0
+        p95 = (result["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+        print(f"{name:<14} throughput {throughput:+7.1f}%   p95 {p95:+7.1f}%")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and chat hot paths")
+    parser.add_argument("--pdfs", type=int, default=10, help="Synthetic PDF files")
+    parser.add_argument("--docx", type=int, default=10, help="Synthetic DOCX files")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per PDF / sections per DOCX")
+    parser.add_argument("--queries", type=int, default=100, help="Chat questions to send")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus random seed")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Texts per embed_batch call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub LLM sleeps")
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding model")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
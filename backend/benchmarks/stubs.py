@@ -0,0 +1,86 @@
+"""
+Deterministic stand-ins for the embedding model and the LLM
+"""
+from typing import Any, List, Optional
+from langchain_core.messages import AIMessage
+import asyncio
+import hashlib
+import re
+import time
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class StubEmbeddings:
+    """
+    Feature-hashing embeddings with the GeminiEmbeddings interface.
+
+    Vectors are normalized, so texts sharing words still land near each
+    other and vector search returns meaningful neighbours without loading
+    a model.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, dimension: int = 384):
+        self.dimension = dimension
+        self.load(model_name or "stub-hashing-384")
+
+    def load(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self._vector(text)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._vector(text)
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack([self._vector(text) for text in texts])
+
+
+class StubChatModel:
+    """
+    Chat model returning a canned answer after a fixed delay
+
+    Args:
+        latency: Seconds to sleep per call, simulating provider latency
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def invoke(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(messages)
+
+    async def ainvoke(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(messages)
+
+    @staticmethod
+    def _answer(messages: List[Any]) -> AIMessage:
+        prompt_tokens = sum(len(str(getattr(m, "content", m)).split()) for m in messages)
+        answer = "According to the provided manual excerpts, follow the referenced procedure."
+        return AIMessage(
+            content=answer,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": len(answer.split()),
+                "total_tokens": prompt_tokens + len(answer.split())
+            }
+        )
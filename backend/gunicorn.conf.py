@@ -0,0 +1,61 @@
+"""
+Gunicorn configuration for the production API
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every worker is a separate process with its own copy of the services
+(embedding model, caches, LLM gateway), so the app is not preloaded: the
+master stays small and torch is never initialized before a fork. Shared
+state lives in PostgreSQL (documents, sessions, index versions, the
+ingestion queue) and in UPLOAD_DIR, which must be a volume every API and
+ingestion worker mounts.
+"""
+import multiprocessing
+import os
+import shutil
+
+from app.config import settings
+
+workers = settings.WEB_WORKERS or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"{settings.BACKEND_HOST}:{settings.BACKEND_PORT}"
+timeout = settings.WEB_TIMEOUT
+graceful_timeout = 30  # lets workers flush buffered chat messages on shutdown
+keepalive = 5
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = max(1, settings.WEB_MAX_REQUESTS // 10) if settings.WEB_MAX_REQUESTS else 0
+preload_app = False
+accesslog = None  # requests are logged by RequestContextMiddleware
+
+# Workers are forked from this process after app.config was imported
+# here, so they inherit this settings object; environment variables set
+# now would not reach them. Values configured explicitly are kept.
+if "LLM_RATE_SHARDS" not in settings.model_fields_set:
+    settings.LLM_RATE_SHARDS = workers
+if "EMBEDDING_THREADS" not in settings.model_fields_set:
+    settings.EMBEDDING_THREADS = max(1, multiprocessing.cpu_count() // workers)
+# Read by prometheus_client when the workers import it
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/aerodoc-prometheus")
+
+
+def on_starting(server):
+    """Create tables once and reset the metrics directory before any worker starts"""
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    if settings.CREATE_TABLES_ON_STARTUP:
+        from app.database import Base, engine
+        import app.models  # noqa: F401
+        Base.metadata.create_all(bind=engine)
+        # Workers inherit the engine; they must not share its pooled connection
+        engine.dispose()
+    # Workers must not race each other creating the same tables
+    settings.CREATE_TABLES_ON_STARTUP = False
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauge values from /metrics"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,67 @@
+"""
+Retries of ChromaDB gateway errors, against a mock HTTP transport
+"""
+import os
+
+os.environ.setdefault("CHROMA_MAX_RETRIES", "2")
+
+from types import SimpleNamespace  # noqa: E402
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from chromadb.api.fastapi import FastAPI  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from tenacity import wait_none  # noqa: E402
+
+from app.services import chroma_client  # noqa: E402
+from app.services.chroma_client import ChromaConnection, pooled_session  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(chroma_client, "wait_random_exponential", lambda **kwargs: wait_none())
+
+
+def server(statuses):
+    """chromadb's HTTP request path over a transport answering with the given statuses, then 200"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        code = statuses[len(calls) - 1] if len(calls) <= len(statuses) else 200
+        if code != 200:
+            return httpx.Response(code, text="<html>Bad Gateway</html>")
+        return httpx.Response(200, json={"nanosecond heartbeat": 1})
+
+    api = SimpleNamespace(
+        _api_url="http://chroma:8000/api/v1",
+        _session=pooled_session(transport=httpx.MockTransport(handler))
+    )
+    return (lambda: FastAPI._make_request(api, "get", "/heartbeat")), calls
+
+
+def test_gateway_errors_are_retried():
+    heartbeat, calls = server([502, 503])
+
+    assert ChromaConnection(client=object()).call("heartbeat", heartbeat) == {"nanosecond heartbeat": 1}
+    assert len(calls) == 3
+
+
+def test_persistent_gateway_errors_become_503():
+    heartbeat, calls = server([504] * 10)
+
+    with pytest.raises(HTTPException) as error:
+        ChromaConnection(client=object()).call("heartbeat", heartbeat)
+
+    assert error.value.status_code == 503
+    assert len(calls) == 3  # first attempt and CHROMA_MAX_RETRIES retries
+
+
+def test_other_errors_are_not_retried():
+    heartbeat, calls = server([500])
+
+    with pytest.raises(Exception) as error:
+        ChromaConnection(client=object()).call("heartbeat", heartbeat)
+
+    assert not isinstance(error.value, HTTPException)
+    assert len(calls) == 1
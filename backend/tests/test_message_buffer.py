@@ -0,0 +1,65 @@
+"""
+Replay of orphaned message journals while the database is unavailable
+"""
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.chat import ChatMessage
+from app.services.message_buffer import MessageWriteBuffer
+
+
+def orphaned_journal(journal_dir):
+    """A journal left behind by a dead process, holding one message"""
+    path = os.path.join(journal_dir, "messages-1-dead.jsonl")
+    message = {
+        "id": str(uuid.uuid4()),
+        "session_id": str(uuid.uuid4()),
+        "role": "user",
+        "content": "Torque for the main gear axle nut?",
+        "sources": None,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    with open(path, "w", encoding="utf-8") as journal:
+        journal.write(json.dumps({"messages": [message], "session": None}) + "\n")
+    return path
+
+
+def test_failed_replay_does_not_abort_startup(tmp_path):
+    path = orphaned_journal(str(tmp_path))
+    calls = []
+
+    def database_down():
+        calls.append(1)
+        raise ConnectionError("database is down")
+
+    buffer = MessageWriteBuffer(session_factory=database_down, journal_dir=str(tmp_path), flush_interval=0.05)
+    buffer.start()
+    try:
+        assert os.path.exists(path)
+
+        # Retried from the background writer, with backoff
+        deadline = time.monotonic() + 5
+        while len(calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(calls) >= 2
+        assert os.path.exists(path)
+
+        # Replayed and removed once the database is back
+        engine = create_engine(f"sqlite:///{tmp_path}/chat.db")
+        Base.metadata.create_all(bind=engine)
+        buffer.session_factory = sessionmaker(bind=engine)
+        deadline = time.monotonic() + 10
+        while os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not os.path.exists(path)
+        with buffer.session_factory() as db:
+            assert db.query(ChatMessage).count() == 1
+    finally:
+        buffer.stop()